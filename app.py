@@ -4,15 +4,13 @@ from config.config import DATABASE_CONNECTION_URI, SECRET_KEY, WEATHER_API_KEY
 
 from models.db import db
 
-from models.paso_models import Paso
-
 from models.users_models import User
 
 from models.messages_models import Message
 
 from routes.about import about
 
-from routes.tomar_paso_routes import pasos, actualizar_estado
+from routes.tomar_paso_routes import pasos, actualizar_estado, paso_principal
 
 from routes.users_routes import auth_bp
 
@@ -20,7 +18,13 @@ from routes.clima_routes import clima_bp
 
 from routes.profile_user_routes import profile_bp
 
-from routes.messages_routes import messages_bp
+from routes.messages_routes import messages_bp, publish_message_event
+
+from routes.monitoring_routes import monitoring_bp
+
+from routes.poi_routes import poi_bp
+
+from routes.status_routes import status_bp
 
 from flask_migrate import Migrate
 
@@ -32,7 +36,13 @@ from logging.handlers import RotatingFileHandler
 
 from config.constantes import token_required
 
-from werkzeug.utils import secure_filename
+from utils.principals import get_principal
+
+from utils.uploads import UploadRequest, DEFAULT_PHOTO_MAX_BYTES
+
+from utils.poi_expiry import DEFAULT_ALERT_TTL_HOURS
+
+from werkzeug.exceptions import HTTPException, RequestEntityTooLarge, UnsupportedMediaType
 
 import os
 
@@ -50,6 +60,10 @@ from flask_login import LoginManager, UserMixin, current_user
 
 app = Flask(__name__)
 
+# Las fotos de /api/report se escriben a disco por bloques, con hash y límite de tamaño (el resto usa el stream por defecto)
+
+app.request_class = UploadRequest
+
 app.secret_key = "clave_secreta"
 
 
@@ -78,6 +92,16 @@ UPLOAD_DIR = 'static/uploads/incident_photos'
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_DIR
 
+# Tamaño máximo de la foto de un reporte y del cuerpo completo (foto + campos del formulario)
+
+app.config['INCIDENT_PHOTO_MAX_BYTES'] = DEFAULT_PHOTO_MAX_BYTES
+
+app.config['MAX_CONTENT_LENGTH'] = DEFAULT_PHOTO_MAX_BYTES + 1024 * 1024
+
+# Vigencia por defecto (horas) de los puntos de alerta en el mapa
+
+app.config['POI_ALERT_TTL_HOURS'] = DEFAULT_ALERT_TTL_HOURS
+
 
 
 db.init_app(app)
@@ -212,9 +236,9 @@ app.logger.info(' Aplicación iniciada y sistema de logging rotativo configurado
 
 def load_user(user_id):
 
-    # Usa el método .get() de SQLAlchemy para buscar por clave primaria
+    # Usa la caché de principals compartida con token_required (evita un SELECT por request)
 
-    return db.session.get(User, user_id)
+    return get_principal(user_id)
 
 
 
@@ -236,6 +260,12 @@ app.register_blueprint(profile_bp)
 
 app.register_blueprint(messages_bp)
 
+app.register_blueprint(monitoring_bp)
+
+app.register_blueprint(poi_bp)
+
+app.register_blueprint(status_bp)
+
 
 
 
@@ -260,7 +290,7 @@ def index():
 
 def clima_page():
 
-    paso_data = Paso.query.first()
+    paso_data = paso_principal()
 
     return render_template('clima.html', paso=paso_data)
 
@@ -287,6 +317,26 @@ def report_incident():
 
 
 
+# Errores de subida (se lanzan mientras llega el cuerpo, antes de leerlo completo)
+
+@app.errorhandler(RequestEntityTooLarge)
+
+@app.errorhandler(UnsupportedMediaType)
+
+def handle_upload_error(error):
+
+    """Responde en JSON (formato {"msg": ...} que usa report_incident.html) para las rutas /api."""
+
+    if not request.path.startswith('/api/'):
+
+        return error
+
+    return jsonify({"msg": error.description}), error.code
+
+
+
+
+
 # =======================================================
 
 # 2. RUTA API POST (Recibe el reporte) - CON DECORADOR
@@ -323,27 +373,27 @@ def handle_report_submission(current_user):
 
        
 
-        # 🔑 CORRECCIÓN 2: Asegurar la creación del directorio
-
-        upload_dir = app.config['UPLOAD_FOLDER']
-
-        os.makedirs(upload_dir, exist_ok=True)
+        # La foto ya llegó a disco por bloques (UploadRequest): con hash SHA-256, tamaño
 
-       
+        # acotado (413) y formato verificado por magic bytes (415). Aquí solo se mueve a su
 
-        filename = secure_filename(incident_photo.filename)
+        # ruta por contenido: dos fotos iguales comparten archivo y nombres repetidos no se pisan.
 
-        save_path = os.path.join(upload_dir, filename)
+        upload_dir = app.config['UPLOAD_FOLDER']
 
        
 
         try:
 
-            incident_photo.save(save_path) # Intenta guardar
+            relative_path, duplicate = incident_photo.stream.store(upload_dir)
 
             # La ruta pública que se guardará en la DB
 
-            photo_path = os.path.join('uploads/incident_photos', filename)
+            photo_path = f"uploads/incident_photos/{relative_path}"
+
+        except HTTPException:
+
+            raise
 
         except Exception as e:
 
@@ -365,13 +415,13 @@ def handle_report_submission(current_user):
 
 
 
-    # 3. BUSCAR TODOS los administradores
+    # 3. Verificar que exista al menos un administrador (EXISTS, sin cargar la lista)
 
-    admin_users = User.query.filter_by(role='admin').all()
+    admin_exists = db.session.query(User.query.filter_by(role='admin').exists()).scalar()
 
    
 
-    if not admin_users:
+    if not admin_exists:
 
         # Esto es un error crítico si no hay nadie para recibir el reporte
 
@@ -379,31 +429,29 @@ def handle_report_submission(current_user):
 
 
 
-    # 4. ITERAR y crear un mensaje para CADA administrador
-
-    messages_sent = 0
+    # 4. Guardar el reporte UNA sola vez, dirigido al grupo de administradores.
 
-    for admin_user in admin_users:
+    # Cada admin lo ve en su buzón y su lectura se registra en message_reads.
 
-        new_report_message = Message(
+    new_report_message = Message(
 
-            sender_id=current_user.id,
+        sender_id=current_user.id,
 
-            recipient_id=admin_user.id,
+        recipient_id=None,
 
-            subject=subject,
+        recipient_group='admins',
 
-            body=message_body,
+        subject=subject,
 
-            message_type='support',
+        body=message_body,
 
-            is_read_by_recipient=False
+        message_type='support',
 
-        )
+        is_read_by_recipient=False
 
-        db.session.add(new_report_message)
+    )
 
-        messages_sent += 1
+    db.session.add(new_report_message)
 
    
 
@@ -411,15 +459,19 @@ def handle_report_submission(current_user):
 
         db.session.commit()
 
-        return jsonify({"msg": f"Reporte enviado y registrado para {messages_sent} administradores."}), 201
+        # Un solo evento SSE para el grupo de administradores
+
+        publish_message_event(new_report_message)
+
+        return jsonify({"msg": "Reporte enviado y registrado para los administradores."}), 201
 
     except Exception as e:
 
         db.session.rollback()
 
-        app.logger.error(f"Error al guardar los reportes en la DB: {e}")
+        app.logger.error(f"Error al guardar el reporte en la DB: {e}")
 
-        return jsonify({"msg": "Error al guardar los reportes. Detalles logueados en el servidor."}), 500
+        return jsonify({"msg": "Error al guardar el reporte. Detalles logueados en el servidor."}), 500
 
 
 
@@ -455,6 +507,36 @@ def job_actualizar_clima():
 
 
 
+def job_compactar_puntos():
+
+    """Compacta el store de puntos del mapa (regenera puntos_interes.json de forma atómica)"""
+
+    from utils.poi_store import get_poi_store
+
+    with app.app_context():
+
+        if get_poi_store().compact():
+
+            app.logger.info("🗺️ Store de puntos compactado.")
+
+
+
+def job_barrer_puntos_vencidos():
+
+    """Retira del mapa las alertas temporales vencidas y compacta el store"""
+
+    from utils.poi_expiry import sweep_expired_points
+
+    with app.app_context():
+
+        removed = sweep_expired_points()
+
+        if removed:
+
+            app.logger.info(f"🧹 {len(removed)} puntos de alerta vencidos retirados del mapa.")
+
+
+
 # ---------------------------------------------------
 
 # Main
@@ -511,6 +593,34 @@ if __name__ == "__main__":
 
 
 
+    # Programa la tarea: compactar el store de puntos del mapa cada minuto (solo si hubo cambios)
+
+    scheduler.add_job(
+
+        id="compactar_puntos",
+
+        func=job_compactar_puntos,
+
+        trigger="interval",
+
+        minutes=1
+
+    )
+
+    # Programa la tarea: retirar puntos de alerta vencidos cada minuto
+
+    scheduler.add_job(
+
+        id="barrer_puntos_vencidos",
+
+        func=job_barrer_puntos_vencidos,
+
+        trigger="interval",
+
+        minutes=1
+
+    )
+
     scheduler.start()
 
     app.run(debug=True, use_reloader=False)
\ No newline at end of file
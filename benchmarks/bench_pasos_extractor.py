@@ -0,0 +1,75 @@
+"""
+Benchmark: extracción del estado de un paso con el tokenizer en streaming (utils.pasos_extractor)
+vs el árbol completo de BeautifulSoup (implementación original).
+
+Uso:
+    python benchmarks/bench_pasos_extractor.py                # fixtures de tests/fixtures/pasos
+    python benchmarks/bench_pasos_extractor.py --repeat 50
+
+Para cada página mide la mediana del tiempo de parseo y el pico de memoria (tracemalloc),
+y verifica que ambos extractores devuelvan lo mismo.
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.pasos_extractor import extraer_estado, extraer_estado_bs4
+
+FIXTURES = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'tests', 'fixtures', 'pasos'))
+
+
+def mediana_ms(fn, html, repeat):
+    tiempos = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(html)
+        tiempos.append(time.perf_counter() - t0)
+    tiempos.sort()
+    return tiempos[len(tiempos) // 2] * 1000
+
+
+def pico_kb(fn, html):
+    tracemalloc.start()
+    try:
+        fn(html)
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fixtures", default=FIXTURES)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    paginas = sorted(glob.glob(os.path.join(args.fixtures, '*.html')))
+    if not paginas:
+        sys.exit(f"No hay páginas en {args.fixtures}")
+
+    print(f"{'página':<24} {'KB':>6} {'bs4':>9} {'stream':>9} {'x':>6} {'mem bs4':>10} {'mem stream':>11}")
+    totales = [0.0, 0.0]
+    for path in paginas:
+        with open(path, encoding='utf-8') as f:
+            html = f.read()
+        assert extraer_estado(html) == extraer_estado_bs4(html), f"Resultados distintos en {path}"
+
+        ms_bs4 = mediana_ms(extraer_estado_bs4, html, args.repeat)
+        ms_stream = mediana_ms(extraer_estado, html, args.repeat)
+        totales[0] += ms_bs4
+        totales[1] += ms_stream
+        print(f"{os.path.basename(path):<24} {len(html) / 1024:>6.1f} {ms_bs4:>7.2f}ms {ms_stream:>7.2f}ms "
+              f"{ms_bs4 / ms_stream:>5.1f}x {pico_kb(extraer_estado_bs4, html):>8.0f}KB "
+              f"{pico_kb(extraer_estado, html):>9.0f}KB")
+
+    print(f"\nBarrido completo ({len(paginas)} páginas): bs4 {totales[0]:.1f}ms, stream {totales[1]:.1f}ms "
+          f"({totales[0] / totales[1]:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmark: consulta de puntos de interés por bbox con la grilla (utils.poi_index) vs recorrido lineal.
+
+Uso:
+    python benchmarks/bench_poi_index.py                 # 100k puntos
+    python benchmarks/bench_poi_index.py --points 500000 --cell 0.005
+
+Genera puntos alrededor del paso (más densos sobre la ruta) y mide la mediana de latencia
+para viewports de distintos tamaños (zoom de calle, de valle y regional).
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.poi_index import GridIndex, point_type
+
+CENTRO = (-70.089, -32.825)  # (lng, lat) del Paso Cristo Redentor
+TIPOS = ('hotel', 'restaurante', 'estacionamiento', 'monumento', 'incidente')
+
+VIEWPORTS = (
+    ("zoom 16 (~0.02°)", 0.02),
+    ("zoom 13 (~0.15°)", 0.15),
+    ("zoom 10 (~1.2°)", 1.2),
+)
+
+
+def generar_puntos(n, rnd):
+    puntos = []
+    for i in range(n):
+        if rnd.random() < 0.7:
+            # Sobre la ruta: dispersión chica alrededor del centro
+            lng, lat = rnd.gauss(CENTRO[0], 0.3), rnd.gauss(CENTRO[1], 0.1)
+        else:
+            lng, lat = rnd.uniform(-72, -68), rnd.uniform(-35, -31)
+        puntos.append({"id_map": i + 1, "name": f"P{i}", "lng": lng, "lat": lat,
+                       "iconType": rnd.choice(TIPOS)})
+    return puntos
+
+
+def lineal(puntos, min_lng, min_lat, max_lng, max_lat, types=None):
+    return [p for p in puntos
+            if min_lng <= p['lng'] <= max_lng and min_lat <= p['lat'] <= max_lat
+            and (types is None or point_type(p) in types)]
+
+
+def medir(fn, bboxes):
+    tiempos = []
+    for bbox in bboxes:
+        t0 = time.perf_counter()
+        fn(*bbox)
+        tiempos.append(time.perf_counter() - t0)
+    tiempos.sort()
+    return tiempos[len(tiempos) // 2] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--points", type=int, default=100_000)
+    parser.add_argument("--cell", type=float, default=0.01)
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args()
+
+    rnd = random.Random(11)
+    puntos = generar_puntos(args.points, rnd)
+
+    index = GridIndex(args.cell)
+    t0 = time.perf_counter()
+    index.reset(puntos)
+    print(f"{args.points} puntos, celda {args.cell}°: construcción del índice {time.perf_counter() - t0:.2f}s, "
+          f"{len(index._cells)} celdas ocupadas")
+
+    t0 = time.perf_counter()
+    for i in range(1000):
+        index.insert(args.points + i + 1, {"id_map": args.points + i + 1, "lng": CENTRO[0], "lat": CENTRO[1],
+                                           "iconType": "incidente"})
+    print(f"Alta incremental: {(time.perf_counter() - t0) * 1000:.3f} ms por 1000 puntos")
+
+    print(f"\n{'viewport':<20} {'resultados':>10} {'lineal':>10} {'grilla':>10} {'x':>7}")
+    for nombre, ancho in VIEWPORTS:
+        bboxes = []
+        for _ in range(args.queries):
+            lng = rnd.gauss(CENTRO[0], 0.2)
+            lat = rnd.gauss(CENTRO[1], 0.05)
+            bboxes.append((lng - ancho / 2, lat - ancho / 4, lng + ancho / 2, lat + ancho / 4))
+
+        esperado = sorted(p['id_map'] for p in lineal(puntos, *bboxes[0]))
+        obtenido = sorted(p['id_map'] for p in index.query(*bboxes[0]) if p['id_map'] <= args.points)
+        assert esperado == obtenido, "La grilla no devuelve los mismos puntos que el recorrido lineal"
+
+        ms_lineal = medir(lambda *b: lineal(puntos, *b), bboxes)
+        ms_grilla = medir(index.query, bboxes)
+        print(f"{nombre:<20} {len(esperado):>10} {ms_lineal:>8.2f}ms {ms_grilla:>8.2f}ms "
+              f"{ms_lineal / ms_grilla:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Benchmark: resumen diario de pronósticos 5 días / 3 horas en lote con NumPy (utils.pronostico_lote)
+vs el bucle por respuesta (_procesar_datos_pronostico).
+
+Uso:
+    python benchmarks/bench_pronostico_lote.py                    # 100, 500 y 2000 ubicaciones
+    python benchmarks/bench_pronostico_lote.py --locations 100 300
+
+Genera respuestas con la forma de la API (40 mediciones por ubicación, franjas de 3 h alineadas),
+verifica que ambos caminos den el mismo resultado y mide la mediana de varias corridas.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from routes.clima_routes import _procesar_datos_pronostico
+from utils.pronostico_lote import resumir_pronosticos
+
+DESCRIPCIONES = ('cielo claro', 'algo de nubes', 'nubes dispersas', 'muy nuboso', 'lluvia ligera', 'nevada ligera')
+
+
+def generar_payloads(n, rnd, mediciones=40):
+    inicio = (int(time.time()) // 10800 + 1) * 10800
+    payloads = []
+    for _ in range(n):
+        base_temp = rnd.uniform(-15, 25)
+        payloads.append({"list": [
+            {"dt": inicio + i * 10800,
+             "main": {"temp": round(base_temp + rnd.gauss(0, 4), 2)},
+             "wind": {"speed": round(abs(rnd.gauss(6, 4)), 2)},
+             "weather": [{"description": rnd.choice(DESCRIPCIONES)}]}
+            for i in range(mediciones)
+        ]})
+    return payloads
+
+
+def mediana_ms(fn, repeat):
+    tiempos = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        tiempos.append(time.perf_counter() - t0)
+    tiempos.sort()
+    return tiempos[len(tiempos) // 2] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--locations", type=int, nargs='+', default=[100, 500, 2000])
+    parser.add_argument("--repeat", type=int, default=15)
+    args = parser.parse_args()
+
+    rnd = random.Random(5)
+    print(f"{'ubicaciones':>11} {'bucle':>10} {'lote':>10} {'x':>7}")
+    for n in args.locations:
+        payloads = generar_payloads(n, rnd)
+        assert resumir_pronosticos(payloads) == [_procesar_datos_pronostico(p) for p in payloads], \
+            "El lote no devuelve lo mismo que el procesamiento por respuesta"
+
+        ms_bucle = mediana_ms(lambda: [_procesar_datos_pronostico(p) for p in payloads], args.repeat)
+        ms_lote = mediana_ms(lambda: resumir_pronosticos(payloads), args.repeat)
+        print(f"{n:>11} {ms_bucle:>8.2f}ms {ms_lote:>8.2f}ms {ms_bucle / ms_lote:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
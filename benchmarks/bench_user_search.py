@@ -0,0 +1,120 @@
+"""
+Benchmark: búsqueda de usuarios con ILIKE '%term%' (escaneo completo) vs índice de trigramas.
+La columna "+ranking" es la consulta indexada ordenada por relevancia (lo que hace /api/users).
+Los términos muy comunes no usan el índice (ver POSTING_CAP en utils/user_search.py).
+
+Uso:
+    python benchmarks/bench_user_search.py --users 100000
+
+Crea una base SQLite temporal, carga N usuarios (con sus trigramas) y mide ambas consultas
+para varios términos. No toca la base de datos configurada en .env.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from flask import Flask
+from sqlalchemy import insert, text
+from models.db import db
+from models.users_models import User
+from models.user_search_models import UserSearchGram
+from utils.user_search import search_condition, relevance_order, user_grams
+
+NOMBRES = ["ana", "bruno", "carla", "diego", "elena", "facundo", "gabriela", "hector",
+           "ines", "julian", "karina", "lucas", "martina", "nicolas", "olga", "pablo",
+           "quimey", "romina", "simon", "tomas", "valentina", "walter", "ximena", "yamila"]
+DOMINIOS = ["gmail.com", "hotmail.com", "yahoo.com.ar", "mendoza.gov.ar", "outlook.com"]
+
+
+def crear_app(db_path):
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{db_path}"
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    db.init_app(app)
+    return app
+
+
+def cargar_usuarios(n, batch=5000):
+    rnd = random.Random(42)
+    for start in range(0, n, batch):
+        users, grams = [], []
+        for i in range(start, min(start + batch, n)):
+            username = f"{rnd.choice(NOMBRES)}_{i:06d}"
+            email = f"{username}.{rnd.choice(NOMBRES)}@{rnd.choice(DOMINIOS)}"
+            user_id = f"{i:08d}-0000-0000-0000-000000000000"
+            users.append({"id": user_id, "username": username, "email": email,
+                          "password": "x", "role": "user", "is_active": True,
+                          "notifications_enabled": True})
+            grams.extend({"gram": g, "user_id": user_id} for g in user_grams(username, email))
+        db.session.execute(insert(User), users)
+        db.session.execute(insert(UserSearchGram), grams)
+    db.session.commit()
+
+
+def medir(fn, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        resultado = fn()
+        tiempos.append(time.perf_counter() - t0)
+    tiempos.sort()
+    return tiempos[len(tiempos) // 2], resultado
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = crear_app(os.path.join(tmp, "bench.sqlite"))
+        with app.app_context():
+            db.create_all()
+            t0 = time.perf_counter()
+            cargar_usuarios(args.users)
+            print(f"Carga de {args.users} usuarios + trigramas: {time.perf_counter() - t0:.1f}s "
+                  f"({UserSearchGram.query.count()} filas de índice)\n")
+
+            terminos = ["quimey_0421", "_04242", "martina_09", "yahoo", "zq", "ximena_0000", "tomas_0"]
+            print(f"{'término':<14} {'ILIKE (ms)':>11} {'trigramas (ms)':>15} {'speedup':>8} "
+                  f"{'+ranking (ms)':>14} {'filas':>6}")
+            for term in terminos:
+                # ILIKE '%term%' (con '_' y '%' escapados, igual que la verificación del índice)
+                escaneo = db.or_(User.username.icontains(term, autoescape=True),
+                                 User.email.icontains(term, autoescape=True))
+
+                def legacy():
+                    return User.query.filter(escaneo).order_by(User.username).limit(10).all()
+
+                def indexado():
+                    return User.query.filter(search_condition(term)) \
+                        .order_by(User.username).limit(10).all()
+
+                def indexado_ranking():
+                    return User.query.filter(search_condition(term)) \
+                        .order_by(relevance_order(term), User.username).limit(10).all()
+
+                t_legacy, r_legacy = medir(legacy, args.repeat)
+                t_index, r_index = medir(indexado, args.repeat)
+                t_rank, _ = medir(indexado_ranking, args.repeat)
+                # Ambas consultas deben devolver exactamente el mismo conjunto de usuarios
+                esperado = {u.id for u in User.query.filter(escaneo).all()}
+                assert esperado == {u.id for u in User.query.filter(search_condition(term)).all()}, term
+                print(f"{term:<14} {t_legacy * 1000:>11.2f} {t_index * 1000:>15.2f} "
+                      f"{t_legacy / t_index:>7.1f}x {t_rank * 1000:>14.2f} {len(r_index):>6}")
+
+            print("\nPlan de la consulta indexada ('quimey_0421'):")
+            stmt = User.query.filter(search_condition("quimey_0421")).statement
+            compiled = stmt.compile(db.engine, compile_kwargs={"literal_binds": True})
+            for row in db.session.execute(text(f"EXPLAIN QUERY PLAN {compiled}")):
+                print("   ", row[-1])
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,26 @@
 from flask import Blueprint, request, jsonify, render_template, current_app
-from models.users_models import User
 from models.db import db
 from werkzeug.security import generate_password_hash, check_password_hash
 import jwt
 from functools import wraps #sirve para decorar funciones
 from datetime import datetime, timedelta
+from utils.principals import get_principal
 #Constantes para actualizar el estado del paso
 ARCHIVO = "estado.json"
 URL = "https://www.argentina.gob.ar/seguridad/pasosinternacionales/detalle/ruta/29/Cristo-Redentor"
 
+# Registro de pasos a seguir: nombre (único en la tabla pasos), página de detalle y coordenadas.
+# Se amplía agregando entradas acá o con app.config["PASOS"] (misma estructura).
+# El primero es el paso principal que muestra la portada.
+PASOS = [
+    {
+        "nombre": "Cristo Redentor",
+        "url": URL,
+        "lat": -32.8322,
+        "lon": -70.0450,
+    },
+]
+
 IMAGE_FILENAMES = [
     "paso_verano_1.png",
     "paso_nieve_2.png",
@@ -34,7 +46,8 @@ def _token_required_impl(f, role=None):
             token = token.split()[1]
             # Usar current_app.config de forma segura
             data = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=["HS256"]) 
-            current_user = User.query.get(data['id'])
+            # Usuario desde la caché de principals (evita un SELECT por request)
+            current_user = get_principal(data['id'])
             
             if not current_user:
                 return jsonify({'message': 'User not found'}), 404
@@ -27,6 +27,9 @@ class PronosticoDiario(db.Model):
     
     # Fecha de actualización del registro (cuándo se guardó en la DB)
     fecha_creacion = db.Column(db.DateTime, server_default=db.func.now())
+
+    # Última vez que el job reescribió los valores del día (Last-Modified de /api/clima/pronostico)
+    fecha_actualizacion = db.Column(db.DateTime, server_default=db.func.now(), onupdate=db.func.now())
     
     # Restricción para asegurar que solo haya un pronóstico por día para cada paso
     __table_args__ = (db.UniqueConstraint('paso_id', 'fecha_pronostico', name='_paso_fecha_uc'),)
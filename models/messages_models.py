@@ -1,7 +1,7 @@
 import uuid
 from models.db import db
 from datetime import datetime
-from sqlalchemy import or_
+from sqlalchemy import or_, event, select
 
 class Message(db.Model):
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
@@ -23,6 +23,10 @@ class Message(db.Model):
     )
     # Nota: Tu relación usa backref='received_messages', lo cual simplifica el User model.
     recipient = db.relationship('User', foreign_keys=[recipient_id], backref=db.backref('received_messages', lazy=True))
+
+    # 3. Grupo destinatario (ej: 'admins'): el mensaje se guarda UNA vez para todo el grupo.
+    # La lectura de cada miembro va en message_reads (no en is_read_by_recipient).
+    recipient_group = db.Column(db.String(20), nullable=True)
     
     # ... (el resto de las columnas y el método to_dict se mantienen igual) ...
     
@@ -31,6 +35,22 @@ class Message(db.Model):
     message_type = db.Column(db.String(20), default='support', nullable=False) 
     is_read_by_recipient = db.Column(db.Boolean, default=False, nullable=False)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    # Número de secuencia de las alertas masivas (1, 2, 3... sin huecos, asignado al insertar).
+    # El estado de lectura por usuario se guarda como una secuencia: contar no leídas es una resta.
+    alert_seq = db.Column(db.Integer, nullable=True)
+
+    # Índices para los accesos del buzón (ordenados por timestamp DESC, id DESC):
+    # - alertas masivas: message_type = 'alert'
+    # - mensajes privados: recipient_id = :usuario
+    # - reportes al grupo de administradores: recipient_group = 'admins'
+    # - borrado/listado por remitente: sender_id = :usuario
+    __table_args__ = (
+        db.Index('ix_message_recipient_timestamp', 'recipient_id', 'timestamp', 'id'),
+        db.Index('ix_message_type_timestamp', 'message_type', 'timestamp', 'id'),
+        db.Index('ix_message_sender_timestamp', 'sender_id', 'timestamp'),
+        db.Index('ix_message_group_timestamp', 'recipient_group', 'timestamp', 'id'),
+        db.Index('ix_message_alert_seq', 'alert_seq', unique=True),
+    )
 
     def to_dict(self):
         return {
@@ -38,9 +58,92 @@ class Message(db.Model):
             'sender_id': self.sender_id,
             'sender_username': self.sender.username if self.sender else 'Sistema',
             'recipient_id': self.recipient_id,
+            'recipient_group': self.recipient_group,
             'subject': self.subject,
             'body': self.body,
             'message_type': self.message_type,
             'is_read_by_recipient': self.is_read_by_recipient,
             'timestamp': self.timestamp.isoformat()
-        }
\ No newline at end of file
+        }
+
+class AlertSequence(db.Model):
+    """
+    Contador de la secuencia de alertas (una sola fila, id=1). Se incrementa en la misma transacción
+    que inserta la alerta: el UPDATE bloquea la fila, así dos alertas nunca reciben el mismo número.
+    deleted_version cambia cada vez que se borran mensajes que ven varios usuarios (alertas, mensajes
+    de un usuario eliminado): entra en el ETag del buzón de todos.
+    """
+    __tablename__ = 'alert_sequence'
+
+    id = db.Column(db.Integer, primary_key=True)
+    last_seq = db.Column(db.Integer, nullable=False, default=0)
+    deleted_version = db.Column(db.Integer, nullable=False, default=0)
+
+
+class AlertTombstone(db.Model):
+    """Secuencias de alertas borradas: se descuentan de las no leídas de quien no las había visto."""
+    __tablename__ = 'alert_tombstones'
+
+    seq = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    deleted_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+
+class AlertReadState(db.Model):
+    """
+    Marca de agua de lectura de alertas masivas por usuario.
+    Todas las alertas con alert_seq <= last_seen_seq se consideran leídas, así "marcar todo como leído"
+    es una sola fila sin importar cuántas alertas o usuarios haya. last_seen_timestamp / last_seen_id
+    identifican esa alerta para la API. alert_exceptions lleva la cantidad de alertas leídas
+    "fuera de orden" (filas de message_reads posteriores a la marca). read_version cambia con cada
+    lectura o borrado en el buzón del usuario (entra en su ETag).
+    """
+    __tablename__ = 'alert_read_state'
+
+    user_id = db.Column(db.String(36), db.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True)
+    last_seen_seq = db.Column(db.Integer, nullable=False, default=0)
+    alert_exceptions = db.Column(db.Integer, nullable=False, default=0)
+    read_version = db.Column(db.Integer, nullable=False, default=0)
+    last_seen_timestamp = db.Column(db.DateTime, nullable=True)
+    last_seen_id = db.Column(db.String(36), nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+
+def next_alert_seq(connection):
+    """Reserva el próximo número de la secuencia de alertas dentro de la transacción de `connection`."""
+    table = AlertSequence.__table__
+    updated = connection.execute(table.update().where(table.c.id == 1).values(last_seq=table.c.last_seq + 1))
+    if updated.rowcount == 0:
+        connection.execute(table.insert().values(id=1, last_seq=1))
+    return connection.execute(select(table.c.last_seq).where(table.c.id == 1)).scalar_one()
+
+
+@event.listens_for(Message, 'before_insert')
+def _assign_alert_seq(mapper, connection, target):
+    if target.message_type == 'alert' and target.alert_seq is None:
+        target.alert_seq = next_alert_seq(connection)
+
+
+class MessageRead(db.Model):
+    """
+    Lecturas puntuales (tabla angosta usuario-mensaje).
+    - Mensajes a un grupo (reportes a 'admins'): una fila por miembro que lo leyó.
+    - Alertas: solo las leídas "fuera de orden" (más nuevas que la marca de agua);
+      al avanzar la marca de agua esas filas se eliminan.
+    """
+    __tablename__ = 'message_reads'
+
+    user_id = db.Column(db.String(36), db.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True)
+    message_id = db.Column(db.String(36), db.ForeignKey('message.id', ondelete='CASCADE'), primary_key=True, index=True)
+    read_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+
+class MessageHidden(db.Model):
+    """
+    Mensajes de grupo que un miembro borró de su buzón (tabla angosta usuario-mensaje).
+    El reporte es una sola fila para todos los administradores: borrarlo solo lo oculta para quien lo borra.
+    """
+    __tablename__ = 'message_hidden'
+
+    user_id = db.Column(db.String(36), db.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True)
+    message_id = db.Column(db.String(36), db.ForeignKey('message.id', ondelete='CASCADE'), primary_key=True, index=True)
+    hidden_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
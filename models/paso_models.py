@@ -1,4 +1,5 @@
 import uuid
+from datetime import datetime
 from models.db import db
 
 class Paso(db.Model):
@@ -10,6 +11,14 @@ class Paso(db.Model):
     horario_atencion = db.Column(db.Text, nullable=True)
     actualizado = db.Column(db.Text, nullable=True)  # texto de fecha que trae la web
     fuente = db.Column(db.String(200), nullable=True)
+    # Coordenadas del paso (del registro PASOS): las usa el pronóstico
+    latitud = db.Column(db.Float, nullable=True)
+    longitud = db.Column(db.Float, nullable=True)
+    # Validadores de la última descarga de la página oficial (pedido condicional del scraper)
+    http_etag = db.Column(db.String(200), nullable=True)
+    http_last_modified = db.Column(db.String(64), nullable=True)
+    # SHA-256 del estado extraído (estado, actualizado, horario): la página se parsea siempre, pero si no cambió no se escribe
+    content_hash = db.Column(db.String(64), nullable=True)
     timestamp = db.Column(db.DateTime, server_default=db.func.now())
 
     def to_dict(self):
@@ -20,6 +29,36 @@ class Paso(db.Model):
             "horario_atencion": self.horario_atencion,
             "actualizado": self.actualizado,
             "fuente": self.fuente,
+            "latitud": self.latitud,
+            "longitud": self.longitud,
             "timestamp": self.timestamp.isoformat() if self.timestamp else None
         }
 
+
+
+class PasoHistorial(db.Model):
+    """
+    Historial de transiciones de un paso: una fila solo cuando cambia el estado o el horario de atención
+    (no una por corrida del scraper). El estado rige desde `timestamp` hasta la transición siguiente.
+    """
+    __tablename__ = "pasos_historial"
+
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    paso_id = db.Column(db.String(36), db.ForeignKey("pasos.id", ondelete='CASCADE'), nullable=False)
+    estado = db.Column(db.String(50), nullable=True)
+    horario_atencion = db.Column(db.Text, nullable=True)
+    actualizado = db.Column(db.Text, nullable=True)  # texto de la web al momento del cambio
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)  # UTC
+
+    # Consultas por rango de un paso (y "la última transición antes de X")
+    __table_args__ = (db.Index('ix_pasos_historial_paso_timestamp', 'paso_id', 'timestamp'),)
+
+    paso = db.relationship("Paso")
+
+    def to_dict(self):
+        return {
+            "estado": self.estado,
+            "horario_atencion": self.horario_atencion,
+            "actualizado": self.actualizado,
+            "timestamp": self.timestamp.isoformat() if self.timestamp else None
+        }
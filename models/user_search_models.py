@@ -0,0 +1,23 @@
+from models.db import db
+from sqlalchemy.dialects import mysql
+
+# En MySQL los trigramas se guardan con colación binaria: con la colación por defecto
+# (insensible a acentos) 'ña' y 'na' chocarían en la clave primaria.
+GRAM_TYPE = db.String(3).with_variant(mysql.VARCHAR(3, collation='utf8mb4_bin'), 'mysql')
+
+
+class UserSearchGram(db.Model):
+    """
+    Índice invertido de trigramas para buscar usuarios por subcadena.
+    Una fila por (trigrama, usuario) tomada de username y email en minúsculas.
+    La clave primaria (gram, user_id) es el índice que resuelve las búsquedas.
+    """
+    __tablename__ = "user_search_grams"
+
+    gram = db.Column(GRAM_TYPE, primary_key=True)
+    user_id = db.Column(
+        db.String(36),
+        db.ForeignKey('user.id', ondelete='CASCADE'),
+        primary_key=True,
+        index=True
+    )
@@ -28,6 +28,12 @@ class User(db.Model):
 
 
 
+    # Índice para la paginación por cursor ordenada por rol: (role, id)
+
+    __table_args__ = (db.Index('ix_user_role_id', 'role', 'id'),)
+
+
+
     # 🔐 MÉTODOS DE SEGURIDAD DE CONTRASEÑA (NUEVO)
 
 
@@ -1,22 +1,46 @@
-from flask import Blueprint, jsonify, current_app
+from flask import Blueprint, jsonify, current_app, url_for
 from models.db import db
 # 💡 Importamos el nuevo modelo que soporta Pronósticos Diarios
 from models.clima_models import PronosticoDiario 
 from models.paso_models import Paso
-import requests
 from routes.users_routes import token_required
+from utils.http_cache import response_cache, cached_json_response
+from utils.bulk import upsert
+from utils.pronostico_lote import resumir_pronosticos
+from utils.weather_cache import get_weather_cache
+from utils.refresh_jobs import get_refresh_jobs
+from utils.weather_client import (
+    fetch_forecasts, grid_cell, WEATHER_GRID_DEG, WEATHER_MAX_WORKERS, WEATHER_TIMEOUT
+)
 from datetime import datetime, date
 from collections import defaultdict
 import math
+import time
+import uuid
 
 clima_bp = Blueprint("clima", __name__, url_prefix="/api/clima")
 
 # --- Rutas Públicas (para uso del frontend) ---
 
+def pronostico_cache_key(paso_id):
+    """Clave de /api/clima/pronostico/<paso_id> en la caché de respuestas."""
+    return f"pronostico:{paso_id}"
+
+
 # Obtener los 4 últimos pronósticos registrados para un paso
 @clima_bp.route("/pronostico/<paso_id>", methods=["GET"])
 def get_pronostico(paso_id):
-    """Devuelve los últimos 4 pronósticos diarios para un paso específico."""
+    """
+    Devuelve los últimos 4 pronósticos diarios para un paso específico.
+    Se sirve desde la caché en memoria (se invalida cuando el job guarda el pronóstico del paso),
+    con ETag / Last-Modified para que el navegador revalide con un 304.
+    """
+    entry = response_cache.get_or_build(pronostico_cache_key(paso_id), lambda: _build_pronostico(paso_id))
+    return cached_json_response(entry)
+
+
+def ultimos_pronosticos(paso_id):
+    """Los 4 pronósticos más recientes de un paso, del día más cercano al más lejano."""
 
     # 💡 Cambio Clave: Usar .filter() en lugar de .filter_by() para una comparación explícita
     # y ordenar por fecha_pronostico DESCENDENTE para obtener los "últimos" días primero,
@@ -28,15 +52,27 @@ def get_pronostico(paso_id):
                                         .limit(4) \
                                         .all()
 
-    if not pronosticos:
-        # Si no encuentra nada, devuelve 404
-        return jsonify({"message": "No hay pronósticos registrados para este paso"}), 404
-
     # 2. Reversar la lista para que el día más cercano aparezca primero (Hoy, Mañana,...)
     pronosticos.reverse()
+    return pronosticos
 
-    # 3. Devolver la respuesta (Status 200 OK)
-    return jsonify([p.to_dict() for p in pronosticos])
+
+def ultima_escritura(pronosticos):
+    """Escritura más reciente entre las filas (para Last-Modified); None si no hay fechas."""
+    fechas = [p.fecha_actualizacion or p.fecha_creacion for p in pronosticos]
+    fechas = [f for f in fechas if f is not None]
+    return max(fechas) if fechas else None
+
+
+def _build_pronostico(paso_id):
+    """Payload, status y Last-Modified (última escritura de las filas) de /api/clima/pronostico."""
+    pronosticos = ultimos_pronosticos(paso_id)
+
+    if not pronosticos:
+        # Si no encuentra nada, devuelve 404
+        return {"message": "No hay pronósticos registrados para este paso"}, 404, None
+
+    return [p.to_dict() for p in pronosticos], 200, ultima_escritura(pronosticos)
 
 
 # --- Rutas de Actualización (con autenticación o scheduler) ---
@@ -45,19 +81,44 @@ def get_pronostico(paso_id):
 @clima_bp.route("/actualizar/<paso_id>", methods=["POST"])
 @token_required()
 def actualizar(current_user, paso_id):
-    # Ahora llamamos a la función con el nombre del modelo actualizado
-    return _actualizar_pronostico(paso_id)
+    """
+    Encola el refresco del pronóstico del paso y responde 202 al instante con el id del job.
+    Si ya hay un refresco pendiente o en curso para el paso, se devuelve ese mismo job
+    (una sola llamada al proveedor aunque varios admins pidan el refresco a la vez).
+    """
+    if db.session.get(Paso, paso_id) is None:
+        return jsonify({"error": "Paso no encontrado"}), 404
+
+    job, nuevo = get_refresh_jobs().submit(paso_id, _actualizar_pronostico)
+    status_url = url_for('clima.estado_actualizacion', job_id=job['id'])
+    response = jsonify(dict(job, nuevo=nuevo, status_url=status_url))
+    response.status_code = 202
+    response.headers['Location'] = status_url
+    return response
+
+
+@clima_bp.route("/actualizar/jobs/<job_id>", methods=["GET"])
+@token_required()
+def estado_actualizacion(current_user, job_id):
+    """Estado de un refresco (pendiente, en_curso, completado o error), con tiempos y resultado al terminar."""
+    job = get_refresh_jobs().get(job_id)
+    if job is None:
+        return jsonify({"error": "Job no encontrado"}), 404
+    return jsonify(job), 200
 
 # Función para el scheduler (sin login)
 def actualizar_automatico():
-    """Actualiza el pronóstico automáticamente para el primer Paso registrado en la BD."""
-    paso = Paso.query.first()
-    if not paso:
-        print(" No hay pasos registrados en la base de datos. No se pudo actualizar el clima.")
+    """
+    Actualiza el pronóstico de todos los pasos con coordenadas registradas.
+    Los pasos que caen en la misma celda de la grilla del proveedor comparten una sola llamada.
+    """
+    pasos = Paso.query.filter(Paso.latitud.isnot(None), Paso.longitud.isnot(None)).all()
+    if not pasos:
+        print(" No hay pasos con coordenadas en la base de datos. No se pudo actualizar el clima.")
         return None
-    
-    # Ahora llamamos a la función con el nombre del modelo actualizado
-    return _actualizar_pronostico(paso.id)
+
+    # El job descarga siempre (la caché solo cubre una falla del proveedor): cada corrida guarda datos nuevos
+    return _actualizar_pronosticos(pasos, refresh=True)
 
 
 # --- Funciones Auxiliares para el Fetch y Procesamiento ---
@@ -66,6 +127,8 @@ def _procesar_datos_pronostico(data):
     """
     Procesa el JSON de la API de 5 Day / 3 Hour Forecast
     y calcula el Min/Max diario y la descripción principal.
+    Implementación de referencia (una respuesta por vez): el job usa resumir_pronosticos,
+    que procesa todas las celdas juntas y devuelve lo mismo.
     """
     pronostico_por_dia = defaultdict(lambda: {
         'temp_min': float('inf'), # Inicializamos con infinito para encontrar el mínimo
@@ -138,66 +201,113 @@ def _procesar_datos_pronostico(data):
 
 
 def _actualizar_pronostico(paso_id):
-    """Consulta la API de OpenWeatherMap, procesa el pronóstico y lo guarda en la BD."""
-    api_key = current_app.config["WEATHER_API_KEY"]
-    lat, lon = -32.8322, -70.0450  # Coordenadas del paso Cristo Redentor
+    """Consulta la API de OpenWeatherMap, procesa el pronóstico de un paso y lo guarda en la BD."""
+    paso = db.session.get(Paso, paso_id)
+    if paso is None:
+        return {"error": "Paso no encontrado"}
+    if paso.latitud is None or paso.longitud is None:
+        return {"error": "El paso no tiene coordenadas registradas"}
 
-    # 🔑 Cambiamos el endpoint de '/weather' a '/forecast'
-    url = f"http://api.openweathermap.org/data/2.5/forecast?lat={lat}&lon={lon}&appid={api_key}&units=metric&lang=es"
-    
-    try:
-        resp = requests.get(url, timeout=10)
-        resp.raise_for_status() # Lanza un error para códigos de estado 4xx/5xx
-        data = resp.json()
-    except requests.exceptions.RequestException as e:
-        print(f"Error al conectar con OpenWeatherMap: {e}")
-        return {"error": "Error de conexión con el proveedor de clima"}
-    
-    if "list" not in data:
-        return {"error": "Respuesta inválida de la API", "respuesta": data}
+    return _actualizar_pronosticos([paso])[paso.id]
 
-    # 1. Procesar los datos para obtener el resumen diario (Min/Max, Descripción)
-    pronosticos_diarios = _procesar_datos_pronostico(data)
-    
-    if not pronosticos_diarios:
-        return {"error": "No se pudieron procesar los datos de pronóstico"}
 
-    # 2. Guardar o actualizar cada día del pronóstico en la base de datos
-    dias_guardados = []
-    
-    for pronostico_data in pronosticos_diarios:
-        
-        # Intentar encontrar un pronóstico existente para este paso y fecha
-        pronostico_existente = PronosticoDiario.query.filter_by(
-            paso_id=paso_id,
-            fecha_pronostico=pronostico_data['fecha_pronostico']
-        ).first()
-
-        if pronostico_existente:
-            # Si existe, actualizamos los campos
-            pronostico_existente.temp_min = pronostico_data['temp_min']
-            pronostico_existente.temp_max = pronostico_data['temp_max']
-            pronostico_existente.descripcion = pronostico_data['descripcion']
-            pronostico_existente.viento_velocidad_kmh = pronostico_data['viento_velocidad_kmh']
-            pronostico_existente.viento_direccion = pronostico_data['viento_direccion']
-            pronostico_existente.visibilidad_metros = pronostico_data['visibilidad_metros']
-            dias_guardados.append(pronostico_existente.to_dict())
+def _actualizar_pronosticos(pasos, refresh=False):
+    """
+    Descarga en paralelo (sesión keep-alive compartida, pool acotado) el pronóstico de cada celda
+    de la grilla que contiene algún paso (o lo toma de la caché de respuestas), lo procesa una vez por celda
+    y lo guarda para cada paso en un solo commit. Con refresh=True (job programado) se descarga aunque haya
+    copia vigente. Devuelve {paso_id: resultado} con el mismo formato que antes por paso.
+    """
+    api_key = current_app.config["WEATHER_API_KEY"]
+    grid_deg = current_app.config.get('WEATHER_GRID_DEG', WEATHER_GRID_DEG)
+
+    por_celda = defaultdict(list)
+    for paso in pasos:
+        por_celda[grid_cell(paso.latitud, paso.longitud, grid_deg)].append(paso)
+
+    inicio = time.perf_counter()
+    descargas = fetch_forecasts(
+        por_celda, api_key,
+        max_workers=current_app.config.get('WEATHER_MAX_WORKERS', WEATHER_MAX_WORKERS),
+        timeout=current_app.config.get('WEATHER_TIMEOUT', WEATHER_TIMEOUT),
+        cache=get_weather_cache(),
+        refresh=refresh,
+    )
+
+    # 1. Procesar los datos para obtener el resumen diario (Min/Max, Descripción): todas las celdas en un lote
+    validas = [celda for celda in por_celda if not descargas[celda][1] and "list" in descargas[celda][0]]
+    resumenes = dict(zip(validas, resumir_pronosticos(descargas[celda][0] for celda in validas)))
+
+    resultados = {}
+    actualizados = []
+    filas = []
+    for celda, pasos_celda in por_celda.items():
+        data, error, _ms = descargas[celda]
+        if error:
+            print(f"Error al conectar con OpenWeatherMap: {error}")
+            resultado = {"error": "Error de conexión con el proveedor de clima"}
+        elif "list" not in data:
+            resultado = {"error": "Respuesta inválida de la API", "respuesta": data}
         else:
-            # Si no existe, creamos un nuevo registro
-            nuevo_pronostico = PronosticoDiario(
-                paso_id=paso_id,
-                **pronostico_data # Desempaquetamos el diccionario
-            )
-            db.session.add(nuevo_pronostico)
-            dias_guardados.append(nuevo_pronostico.to_dict())
-
+            pronosticos_diarios = resumenes[celda]
+            resultado = None if pronosticos_diarios else {"error": "No se pudieron procesar los datos de pronóstico"}
+
+        for paso in pasos_celda:
+            if resultado is not None:
+                resultados[paso.id] = resultado
+                continue
+            filas_paso = [dict(pronostico_data, paso_id=paso.id) for pronostico_data in pronosticos_diarios]
+            filas.extend(filas_paso)
+            resultados[paso.id] = {
+                "message": f"Pronóstico actualizado para {len(filas_paso)} días.",
+                "dias_actualizados": [
+                    dict(fila, fecha_pronostico=fila['fecha_pronostico'].isoformat()) for fila in filas_paso
+                ]
+            }
+            actualizados.append(paso.id)
+
+    if not actualizados:
+        return resultados
+
+    # 2. Guardar o actualizar todos los días de todos los pasos: un upsert por lote (no un SELECT por día)
     try:
+        _guardar_pronosticos(filas)
         db.session.commit()
-        return {"message": f"Pronóstico actualizado para {len(dias_guardados)} días.", "dias_actualizados": dias_guardados}
     except Exception as e:
         db.session.rollback()
         print(f"Error al guardar pronósticos en BD: {e}")
-        return {"error": "Error al guardar los datos en la base de datos"}
+        return {paso.id: {"error": "Error al guardar los datos en la base de datos"} for paso in pasos}
+
+    response_cache.invalidate(*(pronostico_cache_key(paso_id) for paso_id in actualizados))
+    from routes.status_routes import refresh_status_snapshot
+    refresh_status_snapshot()
+
+    current_app.logger.info(
+        f"🌦️ Pronóstico actualizado para {len(actualizados)} pasos con {len(por_celda)} llamadas al proveedor "
+        f"en {(time.perf_counter() - inicio) * 1000:.0f} ms."
+    )
+    return resultados
+
+
+# Columnas que reescribe cada actualización (la clave es la restricción _paso_fecha_uc)
+COLUMNAS_PRONOSTICO = (
+    'temp_min', 'temp_max', 'descripcion', 'viento_velocidad_kmh', 'viento_direccion', 'visibilidad_metros'
+)
+
+
+def _guardar_pronosticos(filas):
+    """
+    Inserta o actualiza los días de pronóstico (dicts con paso_id y fecha_pronostico) con un upsert
+    nativo por lote sobre (paso_id, fecha_pronostico). fecha_actualizacion solo cambia si cambió algún valor.
+    No hace commit.
+    """
+    return upsert(
+        PronosticoDiario,
+        [dict(fila, id=str(uuid.uuid4())) for fila in filas],
+        key_columns=['paso_id', 'fecha_pronostico'],
+        update_columns=COLUMNAS_PRONOSTICO,
+        touched_column='fecha_actualizacion',
+    )
 
 # Las rutas get_all y get_last (del modelo antiguo) DEBERÍAN SER ELIMINADAS O ACTUALIZADAS
 # para usar el nuevo modelo PronosticoDiario si ya no usas el modelo Clima.
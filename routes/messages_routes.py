@@ -1,60 +1,50 @@
 import json
-import os
 from flask import Blueprint, request, jsonify, current_app
 from models.db import db
-from models.messages_models import Message
+from models.messages_models import Message, MessageRead, MessageHidden
 from models.users_models import User
-from utils.auth import token_required 
-from sqlalchemy import or_ 
-from datetime import datetime
+from utils.auth import token_required, stream_token_required, issue_stream_token
+from sqlalchemy import and_, select, union_all, exists
+from datetime import datetime, timezone
 from sqlalchemy.orm import joinedload
+from utils.pagination import encode_cursor, decode_cursor, keyset_after, InvalidCursor
+from utils.events import get_event_hub, event_visible_for
+from utils.poi_store import get_poi_store
+from utils.poi_expiry import expiry_timestamp, DEFAULT_ALERT_TTL_HOURS
+from utils.read_state import (
+    get_watermark, is_alert_read, read_message_ids, unread_alert_count,
+    mark_alert_read, mark_group_message_read, advance_watermark, forget_alerts,
+    inbox_versions, bump_read_version
+)
+import hashlib
+import time
 
 messages_bp = Blueprint("messages", __name__)
 
-# ----------------- Funciones de Utilidad para JSON -----------------
+# Tamaño de página del buzón (GET /api/messages)
+INBOX_DEFAULT_LIMIT = 50
+INBOX_MAX_LIMIT = 200
 
-def get_json_filepath():
-    """Construye y devuelve la ruta absoluta del archivo puntos_interes.json."""
-    return os.path.join(current_app.root_path, 'static', 'data', 'puntos_interes.json')
+# Stream SSE: intervalo de heartbeat y duración máxima de cada conexión (el cliente reconecta solo)
+SSE_HEARTBEAT_SECONDS = 15
+SSE_MAX_CONNECTION_SECONDS = 300
 
-def load_points_from_json():
-    """Carga la lista de puntos de interés y alertas desde el archivo JSON."""
-    json_path = get_json_filepath()
-    if not os.path.exists(json_path):
-        # Si el archivo no existe, devuelve una lista vacía para evitar errores
-        return []
-    try:
-        with open(json_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except json.JSONDecodeError:
-        print(f"Advertencia: Archivo {json_path} vacío o mal formado. Devolviendo lista vacía.")
-        return []
-    except Exception as e:
-        print(f"Error al leer el JSON: {e}")
-        return []
-
-def save_points_to_json(data):
-    """Guarda la lista completa de puntos de interés y alertas en el archivo JSON."""
-    json_path = get_json_filepath()
-    with open(json_path, 'w', encoding='utf-8') as f:
-        # Usa ensure_ascii=False para guardar caracteres especiales como tildes
-        json.dump(data, f, indent=4, ensure_ascii=False)
+# ----------------- Puntos del mapa (utils.poi_store) -----------------
 
 # FUNCIONALIDAD MODIFICADA: Eliminado el argumento photo_url
-def add_point_to_json(subject, body, latitude, longitude):
+def add_point_to_json(subject, body, latitude, longitude, ttl_hours=None):
     """
     Transfor ma la alerta en un punto de interés de tipo 'incidente' 
-    y lo guarda en el JSON. Asume que latitude y longitude son válidos.
+    y lo guarda en el store de puntos (una línea en el log, sin reescribir el JSON).
+    Asume que latitude y longitude son válidos.
+    El punto vence a las ttl_hours horas (por defecto POI_ALERT_TTL_HOURS) y lo retira el job de barrido.
     """
+    if ttl_hours is None:
+        ttl_hours = current_app.config.get('POI_ALERT_TTL_HOURS', DEFAULT_ALERT_TTL_HOURS)
     
-    all_data = load_points_from_json()
-    
-    # Asigna un ID único basado en el tamaño actual de la lista.
-    new_id = len(all_data) + 1 
-    
-    # Creamos la estructura específica para el mapa (sin photo_url)
+    # Creamos la estructura específica para el mapa (sin photo_url).
+    # El id_map lo asigna el store bajo lock (monótono entre workers).
     alert_point = {
-        "id_map": new_id, 
         "name": subject, # Usamos el asunto como nombre del punto
         "body_alert": body, # Agregamos el cuerpo de la alerta para el popup del mapa
         "lat": latitude,
@@ -67,14 +57,12 @@ def add_point_to_json(subject, body, latitude, longitude):
         
         "color": "#FF4136", # Rojo para incidentes
         "is_temporary_alert": True, # Bandera de alerta
+        "expires_at": expiry_timestamp(ttl_hours), # Vencimiento (UTC) del punto en el mapa
         "address": f"Lat: {latitude}, Lng: {longitude}",
         # ¡CAMBIO CLAVE: photo_url ELIMINADO de aquí!
     }
     
-    all_data.append(alert_point)
-    save_points_to_json(all_data)
-    
-    return new_id # Devuelve el ID generado en el JSON
+    return get_poi_store().add(alert_point) # Devuelve el ID generado en el store
 
 # ----------------- Rutas de Envío (POST) -----------------
 
@@ -95,6 +83,7 @@ def send_global_alert(current_user):
     # *** CAMPOS QUE AHORA SON OPCIONALES ***
     latitude = data.get('latitude') # Puede ser None
     longitude = data.get('longitude') # Puede ser None
+    expires_in_hours = data.get('expires_in_hours') # Vigencia del punto en el mapa (opcional)
     # ¡CAMBIO CLAVE: photo_url ELIMINADO de la recepción de datos!
     # photo_url = data.get('photo_url') 
     
@@ -104,6 +93,14 @@ def send_global_alert(current_user):
             "message": "El cuerpo del mensaje de la alerta es requerido."
         }), 400
 
+    if expires_in_hours is not None:
+        try:
+            expires_in_hours = float(expires_in_hours)
+        except (TypeError, ValueError):
+            expires_in_hours = -1
+        if not 0 < expires_in_hours <= 24 * 365:
+            return jsonify({"message": "expires_in_hours debe ser un número de horas entre 0 y 8760."}), 400
+
     point_id = None
     alert_type = 'Aviso General'
     
@@ -119,7 +116,8 @@ def send_global_alert(current_user):
                 subject=subject, 
                 body=body,
                 latitude=lat, 
-                longitude=lng
+                longitude=lng,
+                ttl_hours=expires_in_hours
             )
             alert_type = 'Incidente Geolocalizado'
 
@@ -144,6 +142,7 @@ def send_global_alert(current_user):
     try:
         db.session.add(new_alert)
         db.session.commit()
+        publish_message_event(new_alert)
         
         return jsonify({
             "message": f"Alerta de {alert_type} enviada a la DB y procesada con éxito.",
@@ -186,46 +185,157 @@ def send_private_message(current_user, user_id):
     try:
         db.session.add(new_message)
         db.session.commit()
+        publish_message_event(new_message)
         return jsonify({"message": f"Mensaje enviado a {user_to_send.username}."}), 201
     except Exception as e:
         db.session.rollback()
         return jsonify({"message": "Error interno al guardar el mensaje.", "error": str(e)}), 500
 
 
+def publish_message_event(message):
+    """
+    Avisa a los clientes SSE que hay un mensaje nuevo (después del commit).
+    Los mensajes a un grupo generan un único evento para todo el grupo.
+    """
+    try:
+        get_event_hub().publish(
+            message.message_type,
+            {
+                "id": message.id,
+                "subject": message.subject,
+                "message_type": message.message_type,
+                "timestamp": message.timestamp.isoformat()
+            },
+            recipient_id=message.recipient_id,
+            recipient_group=message.recipient_group
+        )
+    except Exception as e:
+        # El mensaje ya está guardado: si falla la notificación, el cliente lo verá en el próximo fetch
+        current_app.logger.error(f"Error al publicar evento de mensaje {message.id}: {e}")
+
+
 # ----------------- Rutas de LECTURA/ESTADO (GET/PATCH/DELETE) -----------------
 
+@messages_bp.route("/api/messages/stream/token", methods=["POST"])
+@token_required
+def create_stream_token(current_user):
+    """
+    Token de corta duración para abrir el stream SSE (EventSource no envía headers y el token va en la URL:
+    así el JWT de login nunca queda en logs ni en el historial).
+    """
+    token, expires_in = issue_stream_token(current_user.id)
+    return jsonify({"token": token, "expires_in": expires_in}), 200
+
+
+@messages_bp.route("/api/messages/stream", methods=["GET"])
+@stream_token_required
+def stream_messages(current_user):
+    """
+    Server-Sent Events con los mensajes nuevos del usuario (alertas, privados y reportes si es admin).
+    Se abre con ?token= de POST /api/messages/stream/token.
+    Reanuda desde el header Last-Event-ID (o ?last_event_id=); envía un heartbeat cada SSE_HEARTBEAT_SECONDS.
+    Cada evento trae solo el resumen: el cliente pide el detalle con GET /api/messages?since=...
+    """
+    hub = get_event_hub()
+    # Se copian los datos del usuario: el generador corre fuera de la sesión de la BD
+    user_id = current_user.id
+    role = current_user.role
+    notifications_enabled = bool(current_user.notifications_enabled)
+    heartbeat = current_app.config.get('SSE_HEARTBEAT_SECONDS', SSE_HEARTBEAT_SECONDS)
+    max_seconds = current_app.config.get('SSE_MAX_CONNECTION_SECONDS', SSE_MAX_CONNECTION_SECONDS)
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id') or hub.latest_id()
+
+    def generate():
+        cursor = last_event_id
+        deadline = time.monotonic() + max_seconds
+        yield "retry: 5000\n\n"
+        while time.monotonic() < deadline:
+            events, cursor = hub.read(cursor, timeout=min(heartbeat, max(deadline - time.monotonic(), 0)))
+            sent = False
+            for event in events:
+                if event_visible_for(event, user_id, role, notifications_enabled):
+                    yield f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event['data'])}\n\n"
+                    sent = True
+            if not sent:
+                # Heartbeat (comentario SSE) y avance del cursor aunque los eventos no fueran para este usuario
+                yield f": ping {cursor}\n\n"
+
+    return current_app.response_class(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+
 @messages_bp.route("/api/messages", methods=["GET"])
 @token_required
 def get_user_messages(current_user):
     """
-    Obtiene el buzón de mensajes del usuario logueado.
+    Obtiene el buzón de mensajes del usuario logueado, acotado e incremental.
+    Parámetros opcionales:
+      - limit: cantidad máxima de mensajes (por defecto 50, máximo 200).
+      - cursor: valor de X-Next-Cursor de la respuesta anterior (página siguiente, más antigua).
+      - since: valor de X-Latest-Cursor (o una fecha ISO); devuelve solo mensajes más nuevos.
+    Responde 304 si el ETag enviado en If-None-Match sigue siendo válido. El ETag solo se calcula
+    para la cabecera del buzón (sin cursor ni since): esas páginas las define el cursor y no se revalidan.
     Optimizado con joinedload para evitar consultas N+1.
     """
     
-    # 1. Configuración de filtros 
-    filters = (Message.message_type == 'alert') 
-    
-    if hasattr(current_user, 'notifications_enabled') and current_user.notifications_enabled:
-        filters = or_(
-            (Message.message_type == 'alert'), 
-            (Message.recipient_id == current_user.id) 
-        )
-    else:
-        # Si las notificaciones están desactivadas, solo se muestran las alertas masivas.
-        filters = Message.message_type == 'alert'
-    
-    
-    # 2. Consulta de Mensajes OPTIMIZADA (uso de joinedload)
-    messages = Message.query.options(joinedload(Message.sender)).filter(filters).order_by(
-        Message.timestamp.desc()
-    ).all()
+    # 1. Configuración de filtros (ramas disjuntas, cada una servida por su propio índice)
+    branches = _inbox_branches(current_user)
+
+    limit = max(1, min(request.args.get('limit', INBOX_DEFAULT_LIMIT, type=int), INBOX_MAX_LIMIT))
+
+    # 2. ETag con búsquedas acotadas por índice (sin hidratar objetos ORM)
+    watermark = get_watermark(current_user.id)
+    etag = None
+    if not request.args.get('cursor') and not request.args.get('since'):
+        etag = _inbox_etag(branches, current_user, watermark)
+    if etag is not None and request.if_none_match.contains(etag):
+        not_modified = current_app.response_class(status=304)
+        not_modified.set_etag(etag)
+        not_modified.headers['Cache-Control'] = 'private, no-cache'
+        return not_modified
+
+    # 3. Consulta acotada por cursor (timestamp, id)
+    try:
+        if request.args.get('since'):
+            # Mensajes más nuevos que 'since', del más antiguo al más nuevo para no saltear ninguno
+            since_ts, since_id = _parse_inbox_position(request.args['since'])
+            position = keyset_after(Message.timestamp, Message.id, since_ts, since_id)
+            descending = False
+        else:
+            position = None
+            if request.args.get('cursor'):
+                cursor_ts, cursor_id = _parse_inbox_position(request.args['cursor'])
+                position = keyset_after(Message.timestamp, Message.id, cursor_ts, cursor_id,
+                                        descending=True)
+            descending = True
+    except InvalidCursor as e:
+        return jsonify({"message": "Cursor inválido.", "error": str(e)}), 400
+
+    messages = _inbox_page(branches, position, descending, limit + 1)
+    has_more = len(messages) > limit
+    messages = messages[:limit]
+    if not descending:
+        messages.reverse() # La respuesta siempre va del más nuevo al más antiguo
     
-    # 3. Construcción del output
+    # 4. Construcción del output
+    # Lecturas por usuario (alertas y mensajes de grupo) solo para los ids de la página (una consulta)
+    user_reads = read_message_ids(
+        current_user.id,
+        [msg.id for msg in messages if msg.message_type == 'alert' or msg.recipient_group]
+    )
     output = []
     for msg in messages:
         sender_username = msg.sender.username if msg.sender else "Sistema"
-        # Las alertas globales no tienen estatus "leído" para un destinatario específico (es broadcast)
-        is_read_status = msg.is_read_by_recipient if msg.recipient_id else False 
+        # Las alertas globales (broadcast) usan la marca de agua del usuario + excepciones
+        if msg.message_type == 'alert':
+            is_read_status = is_alert_read(msg, watermark, user_reads)
+        elif msg.recipient_group:
+            # Mensaje de grupo: leído si este miembro tiene su fila en message_reads
+            is_read_status = msg.id in user_reads
+        else:
+            is_read_status = msg.is_read_by_recipient
         
         output.append({
             "id": msg.id,
@@ -236,23 +346,187 @@ def get_user_messages(current_user):
             "is_read_by_recipient": is_read_status, 
             "timestamp": msg.timestamp.isoformat() 
         })
-            
-    return jsonify(output), 200
+
+    response = jsonify(output)
+    if etag is not None:
+        response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    if messages:
+        response.headers['X-Latest-Cursor'] = _inbox_cursor(messages[0])
+        if has_more and not request.args.get('since'):
+            response.headers['X-Next-Cursor'] = _inbox_cursor(messages[-1])
+    if has_more:
+        response.headers['X-Has-More'] = 'true'
+    return response, 200
+
+
+def _inbox_cursor(msg):
+    return encode_cursor({'ts': msg.timestamp.isoformat(), 'id': msg.id})
+
+
+def _parse_inbox_position(value):
+    """Acepta un cursor opaco del buzón o una fecha ISO. Devuelve (timestamp, id)."""
+    try:
+        data = decode_cursor(value)
+        return datetime.fromisoformat(data['ts']), data['id']
+    except (InvalidCursor, KeyError, TypeError, ValueError):
+        pass
+    try:
+        since = datetime.fromisoformat(value)
+    except ValueError:
+        raise InvalidCursor("Se esperaba un cursor del buzón o una fecha ISO")
+    if since.tzinfo is not None:
+        # Los timestamps se guardan en UTC sin zona horaria
+        since = since.astimezone(timezone.utc).replace(tzinfo=None)
+    # Fecha ISO sola: el id vacío hace que entren todos los mensajes de ese mismo instante
+    return since, ''
+
+
+def _inbox_branches(current_user):
+    """
+    Filtros del buzón como ramas disjuntas. En lugar de un único OR (que obliga a recorrer
+    la tabla y ordenar), cada rama es un rango sobre un índice compuesto (..., timestamp, id).
+    """
+    # Alertas masivas: ix_message_type_timestamp
+    branches = [Message.message_type == 'alert']
+    if getattr(current_user, 'notifications_enabled', False):
+        # Mensajes directos: ix_message_recipient_timestamp.
+        # Si las notificaciones están desactivadas, solo se muestran las alertas masivas.
+        branches.append(and_(Message.recipient_id == current_user.id, Message.message_type != 'alert'))
+        if (getattr(current_user, 'role', None) or '').lower() == 'admin':
+            # Reportes al grupo de administradores (una sola fila por reporte): ix_message_group_timestamp,
+            # sin los que este admin borró de su buzón (búsqueda por clave primaria en message_hidden)
+            hidden = exists().where(MessageHidden.user_id == current_user.id, MessageHidden.message_id == Message.id)
+            branches.append(and_(Message.recipient_group == 'admins', Message.message_type != 'alert', ~hidden))
+    return branches
+
+
+def _inbox_page_ids_stmt(branches, position, descending, limit):
+    """
+    SELECT de los ids de una página del buzón: UNION ALL de un rango indexado por rama
+    (cada una con su propio ORDER BY/LIMIT) y luego orden y recorte del resultado combinado.
+    """
+    if descending:
+        order = (Message.timestamp.desc(), Message.id.desc())
+    else:
+        order = (Message.timestamp.asc(), Message.id.asc())
+
+    parts = []
+    for branch in branches:
+        stmt = select(Message.id, Message.timestamp).where(branch)
+        if position is not None:
+            stmt = stmt.where(position)
+        sub = stmt.order_by(*order).limit(limit).subquery()
+        parts.append(select(sub.c.id, sub.c.timestamp))
+
+    combined = union_all(*parts).subquery()
+    if descending:
+        combined_order = (combined.c.timestamp.desc(), combined.c.id.desc())
+    else:
+        combined_order = (combined.c.timestamp.asc(), combined.c.id.asc())
+    return select(combined.c.id).order_by(*combined_order).limit(limit)
+
+
+def _inbox_page(branches, position, descending, limit):
+    """Página del buzón: primero los ids por índice y solo esas filas se hidratan."""
+    page_ids = db.session.execute(
+        _inbox_page_ids_stmt(branches, position, descending, limit)
+    ).scalars().all()
+    if not page_ids:
+        return []
+
+    by_id = {
+        msg.id: msg
+        for msg in Message.query.options(joinedload(Message.sender)).filter(Message.id.in_(page_ids))
+    }
+    return [by_id[message_id] for message_id in page_ids if message_id in by_id]
+
+
+def _inbox_etag(branches, current_user, watermark):
+    """
+    Huella del buzón, sin recorrer ninguna rama entera:
+    - el mensaje más reciente (timestamp, id) de cada rama: ORDER BY ... DESC LIMIT 1 sobre su índice
+      (cambia con cada alta);
+    - la marca de agua de alertas;
+    - read_version del usuario (cambia con cada lectura o borrado en su buzón) y deleted_version
+      global (borrado de alertas o de los mensajes de un usuario eliminado): lecturas por clave primaria.
+    Incluye los parámetros de la consulta.
+    """
+    parts = []
+    for branch in branches:
+        parts.append(db.session.execute(
+            select(Message.timestamp, Message.id).where(branch)
+            .order_by(Message.timestamp.desc(), Message.id.desc()).limit(1)
+        ).first())
+    read_version, deleted_version = inbox_versions(current_user.id)
+    fingerprint = "|".join(str(part) for part in (
+        current_user.id, current_user.notifications_enabled, [tuple(p) if p else None for p in parts],
+        watermark, read_version, deleted_version, request.query_string.decode('utf-8')
+    ))
+    return hashlib.sha1(fingerprint.encode('utf-8')).hexdigest()
+
+@messages_bp.route("/api/messages/alerts/read", methods=["PATCH"])
+@token_required
+def mark_alerts_as_read(current_user):
+    """
+    Marca como leídas todas las alertas masivas avanzando la marca de agua del usuario.
+    Body opcional: {"up_to": "<id de alerta>"} para marcar solo hasta esa alerta (inclusive).
+    """
+    data = request.get_json(silent=True) or {}
+    up_to = None
+    if data.get('up_to'):
+        up_to = db.session.get(Message, data['up_to'])
+        if up_to is None or up_to.message_type != 'alert':
+            return jsonify({"message": "Alerta no encontrada"}), 404
+
+    try:
+        ts, last_id = advance_watermark(current_user.id, up_to)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"message": "Error al actualizar las alertas.", "error": str(e)}), 500
+
+    return jsonify({
+        "message": "Alertas marcadas como leídas.",
+        "last_seen_alert_id": last_id,
+        "last_seen_timestamp": ts.isoformat() if ts else None,
+        "unread_alerts": unread_alert_count(current_user.id)
+    }), 200
+
+
+@messages_bp.route("/api/messages/alerts/unread_count", methods=["GET"])
+@token_required
+def get_unread_alert_count(current_user):
+    """Cantidad de alertas masivas sin leer del usuario actual."""
+    return jsonify({"unread_alerts": unread_alert_count(current_user.id)}), 200
+
 
 @messages_bp.route("/api/messages/<string:message_id>/read", methods=["PATCH"])
 @token_required
 def mark_message_as_read(current_user, message_id):
-    """Marca un mensaje como leído (solo si el usuario actual es el destinatario)."""
+    """
+    Marca un mensaje como leído: destinatario directo, miembro del grupo destinatario
+    o cualquier usuario si es una alerta masiva.
+    """
     message = Message.query.get(message_id)
 
     if not message:
         return jsonify({"message": "Mensaje no encontrado"}), 404
 
+    if message.message_type == 'alert':
+        # Broadcast: lectura por usuario (marca de agua + excepción), no en la fila del mensaje
+        mark_alert_read(current_user.id, message)
+    elif message.recipient_group:
+        # Mensaje de grupo: la lectura de cada miembro es una fila en message_reads
+        if message.recipient_group != 'admins' or (current_user.role or '').lower() != 'admin':
+            return jsonify({"message": "Acceso denegado. No eres el destinatario."}), 403
+        mark_group_message_read(current_user.id, message)
     # Solo el destinatario DIRECTO puede marcarlo como leído.
-    if message.recipient_id != current_user.id:
+    elif message.recipient_id != current_user.id:
         return jsonify({"message": "Acceso denegado. No eres el destinatario."}), 403
-
-    message.is_read_by_recipient = True
+    elif not message.is_read_by_recipient:
+        message.is_read_by_recipient = True
+        bump_read_version(current_user.id)
     
     try:
         db.session.commit()
@@ -264,7 +538,10 @@ def mark_message_as_read(current_user, message_id):
 @messages_bp.route("/api/messages/<string:message_id>", methods=["DELETE"])
 @token_required
 def delete_message(current_user, message_id):
-    """Permite al destinatario directo de un mensaje (privado) o al Admin borrar cualquier mensaje."""
+    """
+    Permite al destinatario directo de un mensaje (privado) o al Admin borrar cualquier mensaje.
+    Un reporte al grupo de administradores solo desaparece del buzón del admin que lo borra.
+    """
     
     message = Message.query.get(message_id)
 
@@ -292,8 +569,29 @@ def delete_message(current_user, message_id):
         error_msg = "Acceso denegado. Solo el destinatario directo puede borrar mensajes privados, y solo los administradores pueden borrar alertas."
         return jsonify({"message": error_msg}), 403
 
+    # Mensaje de grupo (reporte a 'admins'): la fila es compartida, así que solo se oculta para este admin
+    if message.recipient_group:
+        if message.recipient_group != 'admins' or user_role != 'admin':
+            return jsonify({"message": "Acceso denegado. No eres el destinatario."}), 403
+        try:
+            if db.session.get(MessageHidden, (current_user.id, message.id)) is None:
+                db.session.add(MessageHidden(user_id=current_user.id, message_id=message.id))
+                bump_read_version(current_user.id)
+            db.session.commit()
+            return jsonify({"message": "Mensaje eliminado con éxito."}), 200
+        except Exception as e:
+            db.session.rollback()
+            return jsonify({"message": "Error al eliminar el mensaje.", "error": str(e)}), 500
+
     # --- EJECUTAR BORRADO ---
     try:
+        # Una alerta borrada deja su secuencia para el conteo de no leídas (e invalida el ETag de todos);
+        # un mensaje privado invalida el del destinatario
+        forget_alerts([message.id])
+        if message.recipient_id:
+            bump_read_version(message.recipient_id)
+        MessageHidden.query.filter_by(message_id=message.id).delete(synchronize_session=False)
+        MessageRead.query.filter_by(message_id=message.id).delete(synchronize_session=False)
         db.session.delete(message)
         db.session.commit()
         return jsonify({"message": "Mensaje eliminado con éxito."}), 200
@@ -0,0 +1,65 @@
+from flask import Blueprint, jsonify
+from config.constantes import token_required
+from utils.principals import principal_cache
+from utils.http_cache import response_cache
+from utils.pasos_scraper import ultimo_barrido, contadores
+from utils.weather_cache import get_weather_cache
+from utils.circuit_breaker import breakers
+from utils.refresh_jobs import get_refresh_jobs
+
+# Blueprint con métricas internas (solo administradores)
+monitoring_bp = Blueprint("monitoring", __name__, url_prefix="/api/monitoring")
+
+
+@monitoring_bp.route("/principal_cache", methods=["GET"])
+@token_required("admin")
+def principal_cache_stats(current_user):
+    """Aciertos/fallos de la caché de usuarios autenticados (cada acierto es un SELECT ahorrado)."""
+    stats = principal_cache.stats()
+    stats["queries_saved"] = stats["hits"]
+    return jsonify(stats), 200
+
+
+@monitoring_bp.route("/response_cache", methods=["GET"])
+@token_required("admin")
+def response_cache_stats(current_user):
+    """Uso de la caché de los endpoints públicos de estado (builds = consultas a la BD realizadas)."""
+    return jsonify(response_cache.stats()), 200
+
+
+@monitoring_bp.route("/scraper", methods=["GET"])
+@token_required("admin")
+def scraper_stats(current_user):
+    """
+    Tiempos del último barrido de pasos (total y por paso, incluida la espera por el límite de cada host)
+    y contadores acumulados: no_modificado (304), sin_cambios (hash igual), parseado, error,
+    circuito_abierto (host con el circuito abierto, no se pidió) y escritos.
+    """
+    return jsonify(dict(ultimo_barrido, contadores=dict(contadores))), 200
+
+
+@monitoring_bp.route("/weather_cache", methods=["GET"])
+@token_required("admin")
+def weather_cache_stats(current_user):
+    """
+    Uso de la caché de respuestas del proveedor de clima: aciertos en memoria y en disco, copias viejas
+    servidas (revalidando o por error) y llamadas al proveedor ahorradas (cuota).
+    """
+    return jsonify(get_weather_cache().stats()), 200
+
+
+@monitoring_bp.route("/circuit_breakers", methods=["GET"])
+@token_required("admin")
+def circuit_breaker_stats(current_user):
+    """
+    Estado del circuito de cada proveedor (openweather y cada host scrapeado): closed / open / half_open,
+    fallos seguidos, segundos hasta la próxima prueba y llamadas rechazadas sin tocar la red.
+    """
+    return jsonify(breakers.stats()), 200
+
+
+@monitoring_bp.route("/refresh_jobs", methods=["GET"])
+@token_required("admin")
+def refresh_jobs_stats(current_user):
+    """Refrescos manuales de pronóstico: jobs en vuelo, conservados por estado y pedidos sumados a un job existente."""
+    return jsonify(get_refresh_jobs().stats()), 200
@@ -0,0 +1,98 @@
+import math
+from flask import Blueprint, request, jsonify
+from utils.poi_index import get_poi_index, point_type
+from utils.poi_store import get_poi_store
+from utils.poi_clusters import get_cluster_index, tile_bbox
+
+# Puntos de interés del mapa consultados por zona visible (reemplaza la descarga del JSON completo)
+poi_bp = Blueprint("poi", __name__, url_prefix="/api/poi")
+
+
+def parse_bbox(value):
+    """
+    'minLng,minLat,maxLng,maxLat' (formato de L.LatLngBounds.toBBoxString) -> tupla de floats.
+    Rechaza nan/inf y recorta a longitudes [-180, 180] y latitudes [-90, 90]
+    (Leaflet puede enviar longitudes fuera de rango al desplazar el mapa).
+    """
+    try:
+        coords = [float(v) for v in value.split(',')]
+        min_lng, min_lat, max_lng, max_lat = coords
+    except (AttributeError, ValueError):
+        raise ValueError("bbox debe ser minLng,minLat,maxLng,maxLat")
+    if not all(math.isfinite(c) for c in coords):
+        raise ValueError("bbox con valores no finitos")
+    if min_lng > max_lng or min_lat > max_lat:
+        raise ValueError("bbox con mínimos mayores que los máximos")
+    return _clamp(min_lng, 180), _clamp(min_lat, 90), _clamp(max_lng, 180), _clamp(max_lat, 90)
+
+
+def _clamp(value, limit):
+    return max(-limit, min(limit, value))
+
+
+def parse_types(value):
+    """'hotel,incidente' -> {'hotel', 'incidente'}; None si no se filtra por tipo."""
+    if not value:
+        return None
+    return {t.strip().lower() for t in value.split(',') if t.strip()}
+
+
+@poi_bp.route("", methods=["GET"])
+def get_points():
+    """
+    Puntos de interés dentro de un bbox (público, como el mapa).
+    Parámetros:
+      - bbox: minLng,minLat,maxLng,maxLat (sin bbox se devuelven todos).
+      - types: lista separada por comas de tipos (iconType), ej: hotel,incidente.
+    """
+    types = parse_types(request.args.get('types'))
+    if not request.args.get('bbox'):
+        points = get_poi_store().points()
+        if types is not None:
+            points = [p for p in points if point_type(p) in types]
+        return jsonify(points), 200
+
+    try:
+        bbox = parse_bbox(request.args['bbox'])
+    except ValueError as e:
+        return jsonify({"message": "Parámetro bbox inválido.", "error": str(e)}), 400
+
+    return jsonify(get_poi_index().query(*bbox, types=types)), 200
+
+
+@poi_bp.route("/clusters", methods=["GET"])
+def get_clusters():
+    """
+    Clusters precalculados de puntos para un nivel de zoom.
+    Parámetros:
+      - z: nivel de zoom de Leaflet (obligatorio).
+      - x, y: tile XYZ, o bien bbox=minLng,minLat,maxLng,maxLat (una sola consulta por viewport).
+      - types: igual que en GET /api/poi.
+    Por encima del zoom máximo de clustering cada punto se devuelve como un cluster de 1.
+    """
+    z = request.args.get('z', type=int)
+    if z is None or z < 0:
+        return jsonify({"message": "Parámetro z (zoom) requerido."}), 400
+    types = parse_types(request.args.get('types'))
+
+    try:
+        if request.args.get('bbox'):
+            bbox = parse_bbox(request.args['bbox'])
+        else:
+            x, y = request.args.get('x', type=int), request.args.get('y', type=int)
+            if x is None or y is None or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+                raise ValueError("se requiere bbox o un tile x, y válido para el zoom")
+            bbox = tile_bbox(z, x, y)
+    except ValueError as e:
+        return jsonify({"message": "Parámetros de área inválidos.", "error": str(e)}), 400
+
+    clusters = get_cluster_index()
+    if z > clusters.max_zoom:
+        points = get_poi_index().query(*bbox, types=types)
+        return jsonify([
+            {"zoom": z, "count": 1, "lng": float(p['lng']), "lat": float(p['lat']),
+             "type": point_type(p), "color": p.get('color'), "point": p}
+            for p in points
+        ]), 200
+
+    return jsonify(clusters.clusters(z, *bbox, types=types)), 200
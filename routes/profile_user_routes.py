@@ -7,6 +7,8 @@ from models.users_models import User
 from models.db import db
 from config.constantes import token_required # Asumo que esta es la ubicación correcta
 from flask import current_app
+from utils.principals import invalidate_principal
+from utils.user_search import index_user, unindex_user
 
 # Crea la nueva Blueprint para el perfil
 profile_bp = Blueprint('profile', __name__) 
@@ -43,6 +45,7 @@ def update_profile(current_user):
         if User.query.filter_by(username=data['username']).first():
             return jsonify({'message': 'El nombre de usuario ya está en uso.'}), 400
         current_user.username = data['username']
+        index_user(current_user) # Mantener actualizado el índice de búsqueda
         changes_made = True 
 
     # --- Actualizar número de teléfono ---
@@ -73,6 +76,7 @@ def update_profile(current_user):
 
     try:
         db.session.commit()
+        invalidate_principal(current_user.id)
         
         # Generar un nuevo token con los datos actualizados
         new_token_payload = {
@@ -125,6 +129,7 @@ def manage_account(current_user):
             action_name = "Activada" if data['is_active'] else "Suspendida"
             try:
                 db.session.commit()
+                invalidate_principal(current_user.id)
                 # Devolver un mensaje más específico si es solo una actualización de estado
                 return jsonify({'message': f'Cuenta {action_name} con éxito. Se requiere relogear.'}), 200
             except Exception as e:
@@ -135,9 +140,12 @@ def manage_account(current_user):
 
     elif action == "DELETE":
         # Eliminar cuenta
+        user_id = current_user.id
         try:
+            unindex_user(user_id)
             db.session.delete(current_user)
             db.session.commit()
+            invalidate_principal(user_id)
             return jsonify({'message': 'Cuenta eliminada con éxito.'}), 200
         except Exception as e:
             db.session.rollback()
@@ -165,6 +173,7 @@ def toggle_notifications(current_user):
     
     try:
         db.session.commit()
+        invalidate_principal(current_user.id)
         return jsonify({
             "message": "Preferencias de notificación actualizadas.",
             "new_state": new_state
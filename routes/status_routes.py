@@ -0,0 +1,51 @@
+from flask import Blueprint
+from config.constantes import IMAGE_FILENAMES
+from routes.clima_routes import ultimos_pronosticos, ultima_escritura
+from routes.tomar_paso_routes import paso_principal
+from utils.http_cache import response_cache, cached_json_response
+
+# Estado combinado para la portada: paso + horario + pronóstico + imágenes en una sola respuesta
+status_bp = Blueprint("status", __name__, url_prefix="/api")
+
+STATUS_CACHE_KEY = 'status:snapshot'
+
+# Los jobs republican el snapshot en cada commit (el de estado corre cada 30 minutos):
+# el TTL es mayor a ese intervalo para que los pedidos nunca vayan a la BD en el proceso del scheduler.
+# En un worker sin scheduler el snapshot se reconstruye como mucho una vez por TTL.
+STATUS_SNAPSHOT_TTL = 45 * 60
+
+
+def build_status_snapshot():
+    """Payload, status y Last-Modified del estado combinado (consulta la BD)."""
+    paso = paso_principal()
+    if paso is None:
+        return {
+            "paso": {"id": None, "estado": "desconocido", "horario": "0000 HS A 0000 HS"},
+            "pronostico": [],
+            "images": IMAGE_FILENAMES,
+        }, 200, None
+
+    pronosticos = ultimos_pronosticos(paso.id)
+    fechas = [f for f in (paso.timestamp, ultima_escritura(pronosticos)) if f is not None]
+    return {
+        "paso": paso.to_dict(),
+        "pronostico": [p.to_dict() for p in pronosticos],
+        "images": IMAGE_FILENAMES,
+    }, 200, max(fechas) if fechas else None
+
+
+def refresh_status_snapshot():
+    """Reconstruye y publica el snapshot (lo llaman los jobs después de hacer commit)."""
+    payload, status, last_modified = build_status_snapshot()
+    return response_cache.put(STATUS_CACHE_KEY, payload, status, last_modified, ttl=STATUS_SNAPSHOT_TTL)
+
+
+@status_bp.route("/status", methods=["GET"])
+def get_status():
+    """
+    Estado del paso, horario, pronóstico de 4 días y lista de imágenes en una sola respuesta.
+    Se sirve del snapshot en memoria (serializado una vez, con ETag/Last-Modified): sin acceso a la BD
+    mientras el snapshot esté vigente. La imagen al azar la elige el cliente desde "images".
+    """
+    entry = response_cache.get_or_build(STATUS_CACHE_KEY, build_status_snapshot, ttl=STATUS_SNAPSHOT_TTL)
+    return cached_json_response(entry)
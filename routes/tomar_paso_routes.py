@@ -1,13 +1,25 @@
 # routes/tomar_paso_routes.py
-from flask import current_app, Blueprint, jsonify, render_template
-import requests, re
-from bs4 import BeautifulSoup
-from config.constantes import URL, IMAGE_FILENAMES
+from datetime import datetime, time, timedelta, timezone
+from flask import current_app, Blueprint, jsonify, render_template, request
+from sqlalchemy import and_, case, func, literal, literal_column, select, union_all
+from config.constantes import IMAGE_FILENAMES
 from models.db import db
-from models.paso_models import Paso 
+from models.paso_models import Paso, PasoHistorial
 from routes.users_routes import token_required
+from utils.http_cache import response_cache, cached_json_response
+from utils.pasos_scraper import (
+    registro_pasos, scrape_pasos, registrar, ultimo_barrido, NO_MODIFICADO, SIN_CAMBIOS, PARSEADO,
+    CIRCUITO_ABIERTO, SCRAPER_MAX_WORKERS, SCRAPER_PER_HOST, SCRAPER_TIMEOUT
+)
 import random
 
+# Clave de la respuesta de /paso/public_api en la caché de respuestas
+PUBLIC_PASO_CACHE_KEY = 'paso:public'
+
+# Rango por defecto y máximo (días) de las consultas al historial
+HISTORIAL_DIAS_DEFAULT = 30
+HISTORIAL_DIAS_MAX = 366
+
 
 # Blueprint para /paso
 pasos = Blueprint("pasos", __name__, url_prefix="/paso")
@@ -17,7 +29,7 @@ pasos = Blueprint("pasos", __name__, url_prefix="/paso")
 @token_required()
 def api_paso(current_user):
     """Devuelve el último Paso en JSON (protegido)."""
-    paso = Paso.query.first()
+    paso = paso_principal()
     if paso:
         return jsonify(paso.to_dict())
     return jsonify({"message": "No hay registros de paso"}), 404
@@ -25,112 +37,286 @@ def api_paso(current_user):
 # Nuevo endpoint público para el layout.html (usuarios no autenticados)
 @pasos.route("/public_api", methods=["GET"])
 def public_api_paso():
-    """Devuelve el último Paso en JSON (público, sin token) y una imagen al azar."""
-    paso = Paso.query.first()
+    """
+    Devuelve el último Paso en JSON (público, sin token) y una imagen al azar.
+    La respuesta sale de la caché en memoria (se invalida cuando actualizar_estado hace commit):
+    entre dos corridas del job no se consulta la BD y un If-None-Match / If-Modified-Since válido recibe 304.
+    """
+    entry = response_cache.get_or_build(PUBLIC_PASO_CACHE_KEY, _build_public_paso)
+
+    # La imagen se elige por respuesta: no forma parte del validador (ETag débil)
+    return cached_json_response(entry, extra={'image_filename': random.choice(IMAGE_FILENAMES)})
 
-    # Lógica para elegir una imagen al azar
-    random_image = random.choice(IMAGE_FILENAMES)
 
+def _build_public_paso():
+    """Payload, status y Last-Modified (Paso.timestamp) de /paso/public_api."""
+    paso = paso_principal()
     if paso:
-        # Crea el diccionario de datos de la BD
-        data = paso.to_dict()
-        
-        # Agrega el nombre de la imagen al diccionario de respuesta
-        data['image_filename'] = random_image
-        
-        return jsonify(data), 200
-    
+        return paso.to_dict(), 200, paso.timestamp
+
     # Si la BD está vacía, devuelve el error 404, pero también una imagen por defecto
-    return jsonify({
+    return {
         "message": "No hay registros de paso",
         "estado": "desconocido", 
         "horario": "0000 HS A 0000 HS", # Valor por defecto con el formato deseado
-        "image_filename": random_image 
-    }), 404
+    }, 404, None
 
 @pasos.route("/", methods=["GET"])
 def ver_paso():
     """Vista HTML para debug/manual (opcional)."""
-    paso = Paso.query.first()
+    paso = paso_principal()
     return render_template("paso/paso.html", pasos=paso.to_dict() if paso else {})
 
 
+def paso_principal():
+    """Paso que muestra la portada: el primero del registro (o cualquiera, si la BD no lo tiene)."""
+    principal = Paso.query.filter_by(nombre=registro_pasos()[0]['nombre']).first()
+    return principal or Paso.query.first()
+
+
 def actualizar_estado():
     """
-    Scrapea la web y actualiza el estado, la hora de actualización y el horario de atención en la BD.
+    Scrapea las páginas de todos los pasos del registro (en paralelo) y actualiza el estado,
+    la hora de actualización y el horario de atención de cada uno en la BD, en una sola transacción.
+    Las descargas son condicionales (ETag / Last-Modified guardados) y un paso cuyo estado extraído
+    no cambió (mismo hash) no se escribe. Los pasos de un host con el circuito
+    abierto conservan su último estado.
     """
     with current_app.app_context():
-        # --- Variables de Scraping ---
-        horario_atencion = "Horario no disponible"
-        estado = "Error de scraping"
-        # 🚨 Cambiamos 'actualizado' para que capture el texto del tiempo de actualización
-        tiempo_actualizacion = "No se pudo determinar el tiempo" 
-        # -----------------------------
-
-        # PATRÓN REGULAR PARA EL HORARIO (ej: 0900 HS A 2100 HS)
-        HORARIO_PATTERN = r'(\d{4}\s*HS\s*A\s*\d{4}\s*HS)' 
-
-        try:
-            resp = requests.get(URL, timeout=10)
-            resp.raise_for_status()
-            soup = BeautifulSoup(resp.text, "html.parser")
-
-            # 1. 🔍 Extracción del ESTADO y TIEMPO DE ACTUALIZACIÓN
-            
-            # Buscamos el tag que contiene el estado (ej: <span class="label label-success ...">Abierto</span>)
-            estado_tag = soup.find('span', class_=re.compile(r"label-(success|warning|danger)", re.IGNORECASE))
-            
-            if estado_tag:
-                estado = estado_tag.get_text(strip=True)
-                
-                #NUEVA LÓGICA: Buscamos el nodo de texto inmediatamente adyacente
-                # que contiene el tiempo ("Actualizado hace X horas...")
-                tiempo_nodo = estado_tag.next_sibling
-                
-                if tiempo_nodo and tiempo_nodo.strip():
-                    # Limpiamos y guardamos solo el texto de la actualización
-                    tiempo_actualizacion = tiempo_nodo.strip()
-                else:
-                    tiempo_actualizacion = "Tiempo no visible en el nodo adyacente"
-            else:
-                estado = "Estado no encontrado"
-            
-            # 2.Extracción del HORARIO
-            horario_tag = soup.find('strong', string=re.compile(r"Horarios de atención:", re.IGNORECASE))
-            
-            if horario_tag:
-                texto_despues_del_strong = horario_tag.next_sibling
-                
-                if texto_despues_del_strong:
-                    match_horario = re.search(HORARIO_PATTERN, texto_despues_del_strong, re.IGNORECASE)
-                    
-                    if match_horario:
-                        horario_atencion = match_horario.group(1).strip()
-                    else:
-                        horario_atencion = "Patrón de hora no encontrado"
-                else:
-                    horario_atencion = "No se encontró texto adyacente"
-            else:
-                horario_atencion = "Etiqueta 'Horarios de atención:' no encontrada"
-
-
-        except Exception as e:
-            estado = "Error de conexión/parsing"
-            tiempo_actualizacion = str(e)
-            horario_atencion = "No disponible debido a error de conexión" 
-
-        # 3. 💾 Actualizar la BD
-        paso = Paso.query.first()
-        if not paso:
-            paso = Paso(nombre="Cristo Redentor")
-
-        paso.estado = estado
-        paso.actualizado = tiempo_actualizacion # Guardamos el string del tiempo de actualización
-        paso.horario_atencion = horario_atencion 
-        paso.fuente = URL
-        paso.timestamp = db.func.now()
-
-        db.session.add(paso)
-        db.session.commit()
-
-        return paso.to_dict()
\ No newline at end of file
+        registros = registro_pasos()
+        existentes = {
+            paso.nombre: paso
+            for paso in Paso.query.filter(Paso.nombre.in_([r['nombre'] for r in registros]))
+        }
+        resultados = scrape_pasos(
+            registros,
+            validadores={
+                nombre: {"etag": paso.http_etag, "last_modified": paso.http_last_modified,
+                         "content_hash": paso.content_hash}
+                for nombre, paso in existentes.items()
+            },
+            max_workers=current_app.config.get('SCRAPER_MAX_WORKERS', SCRAPER_MAX_WORKERS),
+            per_host=current_app.config.get('SCRAPER_PER_HOST', SCRAPER_PER_HOST),
+            timeout=current_app.config.get('SCRAPER_TIMEOUT', SCRAPER_TIMEOUT),
+        )
+
+        # 3. 💾 Actualizar la BD: solo los pasos con contenido nuevo (o error), en un solo commit
+        ultimos = ultimas_transiciones([p.id for p in existentes.values()]) if any(
+            r['resultado'] == PARSEADO for r in resultados) else {}
+        ahora = datetime.utcnow()
+        pasos_actualizados = []
+        escritos = 0
+        validadores = 0
+        for registro, resultado in zip(registros, resultados):
+            paso = existentes.get(registro['nombre'])
+            if paso and resultado['resultado'] == SIN_CAMBIOS:
+                # Mismo estado con otro ETag/Last-Modified: solo se guardan los validadores nuevos
+                # (UPDATE de esas dos columnas) para que el próximo pedido condicional vuelva a dar 304
+                nuevos = (resultado.get('etag'), resultado.get('last_modified'))
+                if nuevos != (paso.http_etag, paso.http_last_modified):
+                    paso.http_etag, paso.http_last_modified = nuevos
+                    validadores += 1
+                pasos_actualizados.append(paso)
+                continue
+            # Con el circuito del host abierto se conserva el último estado bueno (no se escribe el error)
+            if paso and resultado['resultado'] in (NO_MODIFICADO, CIRCUITO_ABIERTO):
+                pasos_actualizados.append(paso)
+                continue
+            if not paso:
+                paso = Paso(nombre=registro['nombre'])
+            if resultado['resultado'] in (NO_MODIFICADO, CIRCUITO_ABIERTO):
+                # 304 para un paso que no está en la BD (no debería pasar) o sin datos que guardar:
+                # se vuelve a pedir completo la próxima vez
+                continue
+
+            paso.estado = resultado['estado']
+            paso.actualizado = resultado['actualizado'] # Guardamos el string del tiempo de actualización
+            paso.horario_atencion = resultado['horario_atencion']
+            paso.fuente = registro['url']
+            paso.latitud = registro.get('lat')
+            paso.longitud = registro.get('lon')
+            # Tras un error no se guardan validadores: la próxima corrida descarga y parsea de nuevo
+            paso.http_etag = resultado.get('etag')
+            paso.http_last_modified = resultado.get('last_modified')
+            paso.content_hash = resultado.get('content_hash')
+            paso.timestamp = db.func.now()
+
+            # Historial: una fila solo si cambió el estado o el horario (los errores de descarga no cuentan)
+            ultimo = ultimos.get(paso.id)
+            if resultado['resultado'] == PARSEADO and (
+                    ultimo is None or (ultimo.estado, ultimo.horario_atencion) != (paso.estado, paso.horario_atencion)):
+                db.session.add(PasoHistorial(paso=paso, estado=paso.estado, horario_atencion=paso.horario_atencion,
+                                             actualizado=paso.actualizado, timestamp=ahora))
+
+            db.session.add(paso)
+            pasos_actualizados.append(paso)
+            escritos += 1
+
+        if escritos or validadores:
+            db.session.commit()
+        if escritos:
+            registrar('escritos', escritos)
+            response_cache.invalidate(PUBLIC_PASO_CACHE_KEY)
+            from routes.status_routes import refresh_status_snapshot
+            refresh_status_snapshot()
+
+        current_app.logger.info("⏱️ Barrido de pasos en %s ms (%s escritos): %s", ultimo_barrido.get('total_ms'), escritos,
+                                ", ".join(f"{nombre} {t['total_ms']} ms {t['resultado']}"
+                                          for nombre, t in ultimo_barrido.get('pasos', {}).items()))
+
+        return [paso.to_dict() for paso in pasos_actualizados]
+
+
+def ultimas_transiciones(paso_ids):
+    """{paso_id: última fila del historial} en una consulta (usa el índice paso_id, timestamp)."""
+    if not paso_ids:
+        return {}
+    ultima = (select(PasoHistorial.paso_id, func.max(PasoHistorial.timestamp).label('ts'))
+              .where(PasoHistorial.paso_id.in_(paso_ids))
+              .group_by(PasoHistorial.paso_id).subquery())
+    filas = PasoHistorial.query.join(
+        ultima, and_(PasoHistorial.paso_id == ultima.c.paso_id, PasoHistorial.timestamp == ultima.c.ts)
+    )
+    return {fila.paso_id: fila for fila in filas}
+
+
+# --------- Historial de estados ---------
+
+def _rango_historial():
+    """
+    (desde, hasta) en UTC a partir de ?desde=&hasta= (fechas o fechas y horas ISO).
+    Por defecto, los últimos HISTORIAL_DIAS_DEFAULT días. Lanza ValueError si el rango es inválido.
+    """
+    def parse(valor, por_defecto):
+        if not valor:
+            return por_defecto
+        fecha = datetime.fromisoformat(valor)
+        if fecha.tzinfo is not None:
+            fecha = fecha.astimezone(timezone.utc).replace(tzinfo=None)
+        return fecha
+
+    hasta = parse(request.args.get('hasta'), datetime.utcnow())
+    desde = parse(request.args.get('desde'), hasta - timedelta(days=HISTORIAL_DIAS_DEFAULT))
+    if desde >= hasta:
+        raise ValueError("'desde' debe ser anterior a 'hasta'")
+    if hasta - desde > timedelta(days=HISTORIAL_DIAS_MAX):
+        raise ValueError(f"El rango no puede superar {HISTORIAL_DIAS_MAX} días")
+    return desde, hasta
+
+
+def _transicion_vigente(paso_id, momento):
+    """Última transición anterior (o igual) a `momento`: el estado que regía en ese instante."""
+    return (PasoHistorial.query
+            .filter(PasoHistorial.paso_id == paso_id, PasoHistorial.timestamp <= momento)
+            .order_by(PasoHistorial.timestamp.desc())
+            .first())
+
+
+@pasos.route("/<paso_id>/historial", methods=["GET"])
+def historial_paso(paso_id):
+    """
+    Transiciones de estado/horario de un paso en [desde, hasta), más el estado vigente al comienzo del rango.
+    Ej: /paso/<id>/historial?desde=2025-06-01&hasta=2025-09-01
+    """
+    if db.session.get(Paso, paso_id) is None:
+        return jsonify({"message": "Paso no encontrado"}), 404
+    try:
+        desde, hasta = _rango_historial()
+    except ValueError as e:
+        return jsonify({"message": "Rango de fechas inválido.", "error": str(e)}), 400
+
+    vigente = _transicion_vigente(paso_id, desde)
+    transiciones = (PasoHistorial.query
+                    .filter(PasoHistorial.paso_id == paso_id,
+                            PasoHistorial.timestamp > desde, PasoHistorial.timestamp < hasta)
+                    .order_by(PasoHistorial.timestamp)
+                    .all())
+    return jsonify({
+        "paso_id": paso_id,
+        "desde": desde.isoformat(),
+        "hasta": hasta.isoformat(),
+        "estado_inicial": vigente.to_dict() if vigente else None,
+        "transiciones": [t.to_dict() for t in transiciones],
+    })
+
+
+def _segundos_entre(dialect, inicio, fin):
+    """Expresión SQL con los segundos entre dos DateTime (no hay una función portable)."""
+    if dialect == 'sqlite':
+        return (func.julianday(fin) - func.julianday(inicio)) * 86400
+    if dialect == 'mysql':
+        return func.timestampdiff(literal_column('SECOND'), inicio, fin)
+    return func.extract('epoch', fin - inicio)
+
+
+def resumen_diario(paso_id, desde, hasta, ahora=None):
+    """
+    Horas por estado y cantidad de transiciones de cada día (UTC) entre las fechas `desde` y `hasta` (inclusive),
+    calculadas en la BD: cada transición se convierte en un intervalo [timestamp, timestamp siguiente)
+    con LEAD() y se recorta contra los límites de cada día.
+    Devuelve [{fecha, horas: {estado: horas}, transiciones}], un elemento por día.
+    """
+    ahora = ahora or datetime.utcnow()
+    dialect = db.session.get_bind().dialect.name
+    dias = [desde + timedelta(days=i) for i in range((hasta - desde).days + 1)]
+
+    # Días del rango como tabla derivada (SELECT ... UNION ALL SELECT ...)
+    tabla_dias = union_all(*(
+        select(literal(datetime.combine(d, time.min), db.DateTime).label('inicio'),
+               literal(datetime.combine(d + timedelta(days=1), time.min), db.DateTime).label('fin'))
+        for d in dias
+    )).subquery('dias')
+
+    # Intervalos: desde la transición vigente al comienzo del rango; el último dura hasta ahora
+    comienzo = datetime.combine(desde, time.min)
+    vigente = _transicion_vigente(paso_id, comienzo)
+    siguiente = func.lead(PasoHistorial.timestamp).over(order_by=PasoHistorial.timestamp)
+    intervalos = (select(PasoHistorial.estado.label('estado'),
+                         PasoHistorial.timestamp.label('inicio'),
+                         func.coalesce(siguiente, literal(ahora, db.DateTime)).label('fin'))
+                  .where(PasoHistorial.paso_id == paso_id,
+                         PasoHistorial.timestamp >= (vigente.timestamp if vigente else comienzo),
+                         PasoHistorial.timestamp < datetime.combine(dias[-1] + timedelta(days=1), time.min))
+                  .subquery('intervalos'))
+
+    inicio = case((intervalos.c.inicio > tabla_dias.c.inicio, intervalos.c.inicio), else_=tabla_dias.c.inicio)
+    fin = case((intervalos.c.fin < tabla_dias.c.fin, intervalos.c.fin), else_=tabla_dias.c.fin)
+    filas = db.session.execute(
+        select(tabla_dias.c.inicio, intervalos.c.estado,
+               func.sum(_segundos_entre(dialect, inicio, fin)).label('segundos'),
+               func.sum(case((intervalos.c.inicio >= tabla_dias.c.inicio, 1), else_=0)).label('transiciones'))
+        .select_from(tabla_dias.join(intervalos, and_(intervalos.c.inicio < tabla_dias.c.fin,
+                                                      intervalos.c.fin > tabla_dias.c.inicio)))
+        .group_by(tabla_dias.c.inicio, intervalos.c.estado)
+    )
+
+    resumen = {d: {"fecha": d.isoformat(), "horas": {}, "transiciones": 0} for d in dias}
+    for dia, estado, segundos, transiciones in filas:
+        if isinstance(dia, str):
+            dia = datetime.fromisoformat(dia)  # SQLite devuelve la columna de la tabla derivada como texto
+        item = resumen[dia.date() if isinstance(dia, datetime) else dia]
+        item["horas"][estado] = round(float(segundos or 0) / 3600, 2)
+        item["transiciones"] += int(transiciones or 0)
+    return list(resumen.values())
+
+
+@pasos.route("/<paso_id>/historial/diario", methods=["GET"])
+def historial_diario_paso(paso_id):
+    """
+    Resumen por día del historial de un paso: horas en cada estado (abierto / cerrado / ...) y transiciones.
+    Ej: /paso/<id>/historial/diario?desde=2025-06-21&hasta=2025-09-21
+    """
+    if db.session.get(Paso, paso_id) is None:
+        return jsonify({"message": "Paso no encontrado"}), 404
+    try:
+        desde, hasta = _rango_historial()
+    except ValueError as e:
+        return jsonify({"message": "Rango de fechas inválido.", "error": str(e)}), 400
+
+    # 'hasta' es exclusivo: hasta=2025-09-01 llega al 31/08 inclusive
+    dias = resumen_diario(paso_id, desde.date(), (hasta - timedelta(microseconds=1)).date())
+    totales = {}
+    for dia in dias:
+        for estado, horas in dia["horas"].items():
+            totales[estado] = round(totales.get(estado, 0) + horas, 2)
+    return jsonify({"paso_id": paso_id, "dias": dias, "horas_totales": totales})
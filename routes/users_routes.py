@@ -7,10 +7,22 @@ import jwt
 from flask import current_app as app 
 from functools import wraps 
 from datetime import datetime, timedelta
+from sqlalchemy import or_
 from models.messages_models import Message
+from utils.principals import invalidate_principal
+from utils.user_search import index_user, unindex_user, search_condition, relevance_order
+from utils.pagination import encode_cursor, decode_cursor, keyset_after, estimate_count, InvalidCursor
 
 auth_bp = Blueprint('auth', __name__)
 
+# Columnas por las que se puede ordenar el listado de usuarios (sort_by)
+USER_SORT_COLUMNS = {
+    'username': User.username,
+    'email': User.email,
+    'role': User.role,
+    'id': User.id
+}
+
 
 
 # --- 1. RUTA DE REGISTRO (API) ---
@@ -37,6 +49,8 @@ def register():
     # 3. Guardar en la DB y hacer commit
     try:
         db.session.add(new_user)
+        db.session.flush() # Asigna el id antes de indexar
+        index_user(new_user)
         db.session.commit()
     except Exception as e:
         db.session.rollback()
@@ -143,53 +157,141 @@ def list_users(current_user):
     
     # --- 4. Aplicar Filtro de Búsqueda por Nombre o Email (Búsqueda por Texto) ---
     if search_term:
-        search_pattern = f'%{search_term}%'
-        query = query.filter(
-            db.or_(
-                User.username.ilike(search_pattern),
-                User.email.ilike(search_pattern)
-            )
-        )
+        # Se resuelve con el índice de trigramas en lugar de un ILIKE '%term%' sobre toda la tabla
+        query = query.filter(search_condition(search_term))
+        # Sin un sort_by explícito, los resultados de búsqueda se ordenan por relevancia
+        if 'sort_by' not in request.args:
+            sort_by = 'relevance'
     
-    # 5. Aplicar Ordenamiento
-    if sort_by == 'email':
-        query = query.order_by(User.email)
-    elif sort_by == 'role':
-        query = query.order_by(User.role)
-    elif sort_by == 'id': # Opcional: ordenar por ID
-        query = query.order_by(User.id)
-    else: 
-        query = query.order_by(User.username)
+    filtered = bool(filter_id or filter_role or search_term)
+    estimate_total = request.args.get('estimate_total', 'false').lower() in ('1', 'true')
+
+    # 5. Modo cursor (keyset): se activa enviando 'cursor' (vacío para la primera página)
+    if 'cursor' in request.args or request.args.get('mode') == 'cursor':
+        return _list_users_keyset(query, sort_by, per_page, filtered, estimate_total)
+
+    # El total estimado se calcula sobre los filtros, sin el ORDER BY
+    filtered_query = query
+
+    # 6. Aplicar Ordenamiento (modo clásico page/per_page, se mantiene por compatibilidad)
+    if sort_by == 'relevance' and search_term:
+        query = query.order_by(relevance_order(search_term), User.username)
+    else:
+        sort_column = USER_SORT_COLUMNS.get(sort_by, User.username)
+        query = query.order_by(sort_column)
         
-    # 6. Aplicar Paginación
+    # 7. Aplicar Paginación (con estimate_total se evita el COUNT(*) exacto)
     users_page = query.paginate(
         page=page, 
         per_page=per_page, 
-        error_out=False
+        error_out=False,
+        count=not estimate_total
     )
+
+    if estimate_total:
+        total_items, total_is_lower_bound = estimate_count(filtered_query, User.__tablename__, filtered)
+        total_pages = -(-total_items // users_page.per_page) if users_page.per_page else 0
+        has_next = users_page.page < total_pages or len(users_page.items) == users_page.per_page
+    else:
+        total_items, total_is_lower_bound = users_page.total, False
+        total_pages = users_page.pages
+        has_next = users_page.has_next
     
-    # 7. Formatear la lista de usuarios para la página actual
-    users_data = []
-    for u in users_page.items: 
-        users_data.append({
-            "id": u.id,
-            "username": u.username,
-            "email": u.email,
-            "role": u.role,
-            "is_active": u.is_active if u.is_active is not None else False 
-        })
+    # 8. Formatear la lista de usuarios para la página actual
+    users_data = [_user_list_item(u) for u in users_page.items]
         
-    # 8. Devolver los datos de los usuarios MÁS la información de paginación
+    # 9. Devolver los datos de los usuarios MÁS la información de paginación
+    pagination = {
+        'total_items': total_items,
+        'total_pages': total_pages,
+        'current_page': users_page.page,
+        'per_page': users_page.per_page,
+        'has_next': has_next,
+        'has_prev': users_page.has_prev
+    }
+    if estimate_total:
+        pagination['total_is_estimate'] = True
+        pagination['total_is_lower_bound'] = total_is_lower_bound
+
     return jsonify({
         'users': users_data,
-        'pagination': {
-            'total_items': users_page.total,
-            'total_pages': users_page.pages,
-            'current_page': users_page.page,
-            'per_page': users_page.per_page,
-            'has_next': users_page.has_next,
-            'has_prev': users_page.has_prev
-        }
+        'pagination': pagination
+    }), 200
+
+
+def _user_list_item(u):
+    return {
+        "id": u.id,
+        "username": u.username,
+        "email": u.email,
+        "role": u.role,
+        "is_active": u.is_active if u.is_active is not None else False 
+    }
+
+
+def _list_users_keyset(query, sort_by, limit, filtered, estimate_total):
+    """
+    Paginación por cursor sobre (columna de orden, id).
+    Cada página es un rango indexado (WHERE (col, id) > (v, id) LIMIT n+1): no hay OFFSET ni COUNT(*).
+    """
+    if sort_by not in USER_SORT_COLUMNS:
+        sort_by = 'username'
+    sort_column = USER_SORT_COLUMNS[sort_by]
+    limit = max(1, min(limit, 100))
+
+    # El total se estima sobre los filtros, no sobre el rango después del cursor (no cambia entre páginas)
+    filtered_query = query
+    direction = 'next'
+    raw_cursor = request.args.get('cursor')
+    if raw_cursor:
+        try:
+            cursor = decode_cursor(raw_cursor)
+            if cursor.get('s') != sort_by or cursor.get('d') not in ('next', 'prev'):
+                raise InvalidCursor("El cursor no corresponde al ordenamiento solicitado")
+            direction = cursor['d']
+            query = query.filter(keyset_after(sort_column, User.id, cursor['v'], cursor['id'],
+                                              descending=(direction == 'prev')))
+        except (InvalidCursor, KeyError) as e:
+            return jsonify({'message': 'Cursor inválido', 'error': str(e)}), 400
+
+    if direction == 'prev':
+        query = query.order_by(sort_column.desc(), User.id.desc())
+    else:
+        query = query.order_by(sort_column, User.id)
+
+    # Se pide una fila extra para saber si hay otra página en esa dirección
+    rows = query.limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if direction == 'prev':
+        rows.reverse()
+
+    has_next = has_more if direction == 'next' else True
+    has_prev = bool(raw_cursor) if direction == 'next' else has_more
+
+    def _cursor_for(user, d):
+        return encode_cursor({'s': sort_by, 'v': getattr(user, sort_column.key), 'id': user.id, 'd': d})
+
+    pagination = {
+        'mode': 'cursor',
+        'sort_by': sort_by,
+        'per_page': limit,
+        'has_next': has_next and bool(rows),
+        'has_prev': has_prev and bool(rows),
+        'next_cursor': _cursor_for(rows[-1], 'next') if rows and has_next else None,
+        'prev_cursor': _cursor_for(rows[0], 'prev') if rows and has_prev else None
+    }
+    if estimate_total:
+        total_items, total_is_lower_bound = estimate_count(filtered_query, User.__tablename__, filtered)
+        pagination.update({
+            'total_items': total_items,
+            'total_is_estimate': True,
+            'total_is_lower_bound': total_is_lower_bound
+        })
+
+    return jsonify({
+        'users': [_user_list_item(u) for u in rows],
+        'pagination': pagination
     }), 200
 
 # --- 5. Rutas HTML (render_template) ---
@@ -250,6 +352,8 @@ def update_user_role(current_user, user_id):
     user_to_update.role = new_role
     try:
         db.session.commit()
+        # El cambio de rol debe aplicarse en el siguiente request, sin esperar al TTL
+        invalidate_principal(user_id)
         current_app.logger.info(f"🟢 Admin {current_user.username} (ID: {current_user.id}) cambió el rol de {user_to_update.username} (ID: {user_id}) de '{old_role}' a '{new_role}'.")
         return jsonify({"message": f"User {user_id} role updated to {new_role}"}), 200
     except Exception as e:
@@ -269,7 +373,24 @@ def delete_user(current_user, user_id): # <-- ESTE ES EL NOMBRE CORRECTO AQUÍ
     
     try:
         # **ELIMINACIÓN MANUAL DE DEPENDENCIAS**
-        from models.messages_models import Message # Aseguramos la importación aquí si no está al principio
+        from models.messages_models import Message, MessageRead, MessageHidden, AlertReadState # Aseguramos la importación aquí si no está al principio
+        from utils.read_state import forget_alerts, bump_deleted_version
+        
+        # 0. ELIMINAR SU ESTADO DE LECTURA Y LAS LECTURAS DE LOS MENSAJES QUE SE VAN A BORRAR
+        AlertReadState.query.filter_by(user_id=user_to_delete.id).delete(synchronize_session=False)
+        own_messages = db.session.query(Message.id).filter(
+            or_(Message.sender_id == user_to_delete.id, Message.recipient_id == user_to_delete.id)
+        )
+        # Las alertas que envió dejan su secuencia para el conteo de no leídas del resto, y sus mensajes
+        # desaparecen de otros buzones: se invalida el ETag de todos (forget_alerts ya lo hace si había alertas)
+        if not forget_alerts(own_messages):
+            bump_deleted_version()
+        MessageRead.query.filter(
+            or_(MessageRead.user_id == user_to_delete.id, MessageRead.message_id.in_(own_messages))
+        ).delete(synchronize_session=False)
+        MessageHidden.query.filter(
+            or_(MessageHidden.user_id == user_to_delete.id, MessageHidden.message_id.in_(own_messages))
+        ).delete(synchronize_session=False)
         
         # 1. ELIMINAR MENSAJES ENVIADOS
         Message.query.filter(Message.sender_id == user_to_delete.id).delete(synchronize_session=False)
@@ -277,9 +398,13 @@ def delete_user(current_user, user_id): # <-- ESTE ES EL NOMBRE CORRECTO AQUÍ
         # 2. ELIMINAR MENSAJES RECIBIDOS
         Message.query.filter(Message.recipient_id == user_to_delete.id).delete(synchronize_session=False)
         
-        # 3. Eliminar el usuario (ahora libre de dependencias)
+        # 3. ELIMINAR SUS ENTRADAS DEL ÍNDICE DE BÚSQUEDA
+        unindex_user(user_to_delete.id)
+        
+        # 4. Eliminar el usuario (ahora libre de dependencias)
         db.session.delete(user_to_delete)
         db.session.commit()
+        invalidate_principal(user_id)
         
         current_app.logger.info(f"🟢 Admin {current_user.username} (ID: {current_user.id}) ELIMINÓ la cuenta del usuario: {user_to_delete.username} (ID: {user_id}) y sus mensajes asociados.")
         return jsonify({"message": f"User {user_id} deleted successfully"}), 200
@@ -317,6 +442,8 @@ def toggle_user_status(current_user, user_id):
         old_status_text = "activa" if user.is_active else "suspendida"
         user.is_active = new_status
         db.session.commit()
+        # La suspensión tiene efecto inmediato aunque el usuario esté en la caché
+        invalidate_principal(user_id)
         
         status_text = "activada" if new_status else "suspendida"
         current_app.logger.info(f"🟢 Admin {current_user.username} (ID: {current_user.id}) cambió el estado de {user.username} (ID: {user_id}) de '{old_status_text}' a '{status_text}'.")
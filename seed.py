@@ -7,6 +7,8 @@ from models.db import db
 from models.users_models import User 
 # Necesitamos la herramienta de seguridad para hashear contraseñas
 from werkzeug.security import generate_password_hash
+# Índice de trigramas para la búsqueda de usuarios
+from utils.user_search import index_user
 
 DATA_DIR = 'data'
 
@@ -47,6 +49,8 @@ def populate_users(data):
             role=role
         )
         db.session.add(user)
+        db.session.flush() # Asigna el id para poder indexarlo
+        index_user(user)
         created += 1
 
     return created
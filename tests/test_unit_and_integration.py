@@ -165,6 +165,7 @@ from werkzeug.security import generate_password_hash, check_password_hash
 from app import app 
 import jwt
 import json
+import os
 
 # 1. CLASE BASE DE PRUEBAS CON CONFIGURACIÓN AISLADA
 
@@ -199,6 +200,20 @@ class BaseTestCase(unittest.TestCase):
             db.session.remove()
             db.drop_all() # Elimina las tablas de la DB en memoria
 
+    def register_user(self, username, email, role='user'):
+        """Registra un usuario por la API y devuelve los headers con su token."""
+        response = self.client.post('/api/auth/register',
+                                    data=json.dumps({
+                                        "username": username,
+                                        "email": email,
+                                        "password": "password123",
+                                        "role": role,
+                                        "phone": "12345678"
+                                    }),
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        return {'Authorization': f"Bearer {response.json['token']}"}
+
 # 2. TEST DE INTEGRACIÓN: FLUJO ADMINISTRATIVO COMPLETO (CRUD)
 
 class AdminIntegrationTest(BaseTestCase):
@@ -368,4 +383,1559 @@ class UnitTests(BaseTestCase):
             self.assertEqual(retrieved_message.sender.username, 'msg_sender')
 
 
-            
\ No newline at end of file
+            
+
+
+# 4. TEST DE LA CACHÉ DE PRINCIPALS (token_required)
+class PrincipalCacheTest(BaseTestCase):
+
+    def test_cache_hits_and_immediate_invalidation(self):
+        """Los requests repetidos usan la caché y un cambio de rol se aplica de inmediato."""
+        from utils.principals import principal_cache
+
+        admin_headers = self.register_user('cache_admin', 'cache_admin@test.com', role='admin')
+        other_headers = self.register_user('cache_other', 'cache_other@test.com', role='admin')
+
+        hits_before = principal_cache.hits
+        for _ in range(3):
+            response = self.client.get('/api/dashboard', headers=other_headers)
+            self.assertEqual(response.status_code, 200)
+        self.assertGreaterEqual(principal_cache.hits - hits_before, 2)
+
+        with self.app.app_context():
+            other_id = User.query.filter_by(username='cache_other').first().id
+
+        # Degradar al otro admin: el siguiente request ya no debe tener acceso de admin
+        response = self.client.patch(f'/api/users/{other_id}',
+                                     headers=admin_headers,
+                                     data=json.dumps({'role': 'user'}),
+                                     content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get('/api/users', headers=other_headers)
+        self.assertEqual(response.status_code, 403)
+
+        # Las estadísticas se exponen para monitoreo
+        response = self.client.get('/api/monitoring/principal_cache', headers=admin_headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('queries_saved', response.json)
+
+
+# 5. TEST DE PAGINACIÓN POR CURSOR (GET /api/users)
+class UserKeysetPaginationTest(BaseTestCase):
+
+    def test_cursor_pages_cover_all_users_in_order(self):
+        """Recorre el listado con next_cursor y vuelve atrás con prev_cursor."""
+        admin_headers = self.register_user('admin_keyset', 'admin_keyset@test.com', role='admin')
+        with self.app.app_context():
+            for i in range(7):
+                user = User(username=f'keyset_{i}', email=f'keyset_{i}@test.com')
+                user.set_password('pwd')
+                db.session.add(user)
+            db.session.commit()
+
+        seen = []
+        cursors = []
+        cursor = ''
+        while True:
+            response = self.client.get(f'/api/users?cursor={cursor}&per_page=3&sort_by=email',
+                                       headers=admin_headers)
+            self.assertEqual(response.status_code, 200)
+            seen.extend(u['email'] for u in response.json['users'])
+            pagination = response.json['pagination']
+            if not pagination['has_next']:
+                break
+            cursor = pagination['next_cursor']
+            cursors.append(pagination)
+
+        self.assertEqual(len(seen), 8)
+        self.assertEqual(seen, sorted(seen))
+
+        # Volver una página desde la segunda página
+        response = self.client.get(f"/api/users?cursor={cursors[1]['prev_cursor']}&per_page=3&sort_by=email",
+                                   headers=admin_headers)
+        self.assertEqual([u['email'] for u in response.json['users']], seen[:3])
+
+        # Total estimado sin COUNT exacto
+        response = self.client.get('/api/users?cursor=&estimate_total=true', headers=admin_headers)
+        self.assertTrue(response.json['pagination']['total_is_estimate'])
+
+        # Con un filtro el total se cuenta sobre el filtro, no sobre lo que queda después del cursor
+        totales = []
+        cursor = ''
+        for _ in range(2):
+            response = self.client.get(f'/api/users?cursor={cursor}&per_page=3&role=user&estimate_total=true',
+                                       headers=admin_headers)
+            totales.append(response.json['pagination']['total_items'])
+            cursor = response.json['pagination']['next_cursor']
+        self.assertEqual(totales, [7, 7])
+
+        # Modo página (sin cursor): el total estimado también se cuenta sobre el filtro
+        totales = []
+        for page in (1, 2):
+            response = self.client.get(f'/api/users?page={page}&per_page=3&role=user&estimate_total=true',
+                                       headers=admin_headers)
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.json['pagination']['total_is_estimate'])
+            totales.append(response.json['pagination']['total_items'])
+        self.assertEqual(totales, [7, 7])
+
+        # Un cursor inválido devuelve 400
+        response = self.client.get('/api/users?cursor=basura', headers=admin_headers)
+        self.assertEqual(response.status_code, 400)
+
+
+# 6. TEST DEL ÍNDICE DE BÚSQUEDA DE USUARIOS (trigramas)
+class UserSearchIndexTest(BaseTestCase):
+
+    def test_search_index_follows_register_update_and_delete(self):
+        """La búsqueda usa el índice y se mantiene al registrar, renombrar y borrar."""
+        from models.user_search_models import UserSearchGram
+
+        admin_headers = self.register_user('admin_search', 'admin_search@test.com', role='admin')
+        user_headers = self.register_user('cordillera_user', 'viajero@andes.com')
+        self.register_user('otro_usuario', 'otro@test.com')
+
+        def search(term):
+            response = self.client.get(f'/api/users?search={term}', headers=admin_headers)
+            self.assertEqual(response.status_code, 200)
+            return [u['username'] for u in response.json['users']]
+
+        self.assertEqual(search('dille'), ['cordillera_user'])
+        self.assertEqual(search('ANDES'), ['cordillera_user'])
+        # Ranking: el prefijo de username va antes que una coincidencia en el medio
+        self.assertEqual(search('o')[0], 'otro_usuario')
+
+        response = self.client.put('/api/profile', headers=user_headers,
+                                   data=json.dumps({'username': 'paso_user'}),
+                                   content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(search('dille'), [])
+        self.assertEqual(search('paso_'), ['paso_user'])
+
+        with self.app.app_context():
+            user_id = User.query.filter_by(username='paso_user').first().id
+        self.client.delete(f'/api/users/{user_id}', headers=admin_headers)
+        with self.app.app_context():
+            self.assertEqual(UserSearchGram.query.filter_by(user_id=user_id).count(), 0)
+
+
+# 7. TEST DEL BUZÓN ACOTADO E INCREMENTAL (GET /api/messages)
+class InboxPaginationTest(BaseTestCase):
+
+    def test_limit_cursor_since_and_etag(self):
+        """El buzón se pagina por cursor, 'since' trae solo lo nuevo y el ETag evita reenviar datos."""
+        user_headers = self.register_user('inbox_user', 'inbox@test.com')
+        with self.app.app_context():
+            user_id = User.query.filter_by(username='inbox_user').first().id
+            base = datetime(2025, 1, 1, 12, 0, 0)
+            for i in range(5):
+                db.session.add(Message(sender_id=user_id, recipient_id=None, subject=f'Alerta {i}',
+                                       body='...', message_type='alert',
+                                       timestamp=base + timedelta(minutes=i)))
+            db.session.commit()
+
+        response = self.client.get('/api/messages?limit=2', headers=user_headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([m['subject'] for m in response.json], ['Alerta 4', 'Alerta 3'])
+        latest_cursor = response.headers['X-Latest-Cursor']
+        etag = response.headers['ETag']
+
+        response = self.client.get(f"/api/messages?limit=2&cursor={response.headers['X-Next-Cursor']}",
+                                   headers=user_headers)
+        self.assertEqual([m['subject'] for m in response.json], ['Alerta 2', 'Alerta 1'])
+
+        # Sin cambios: 304 sin cuerpo
+        response = self.client.get('/api/messages?limit=2',
+                                   headers={**user_headers, 'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+
+        with self.app.app_context():
+            db.session.add(Message(sender_id=user_id, recipient_id=None, subject='Alerta nueva',
+                                   body='...', message_type='alert',
+                                   timestamp=base + timedelta(hours=1)))
+            db.session.commit()
+
+        response = self.client.get('/api/messages?limit=2',
+                                   headers={**user_headers, 'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get(f'/api/messages?since={latest_cursor}', headers=user_headers)
+        self.assertEqual([m['subject'] for m in response.json], ['Alerta nueva'])
+        self.assertNotIn('ETag', response.headers)
+
+    def test_etag_follows_reads_and_deletes_below_the_newest_message(self):
+        """Leer o borrar un mensaje que no es el más nuevo también invalida el ETag (versiones de lectura/borrado)."""
+        admin_headers = self.register_user('etag_admin', 'etag_admin@test.com', role='admin')
+        user_headers = self.register_user('etag_user', 'etag_user@test.com')
+        other_headers = self.register_user('etag_other', 'etag_other@test.com')
+        with self.app.app_context():
+            admin_id = User.query.filter_by(username='etag_admin').first().id
+            user_id = User.query.filter_by(username='etag_user').first().id
+            base = datetime(2025, 1, 1, 12, 0, 0)
+            old_private = Message(sender_id=admin_id, recipient_id=user_id, subject='Privado viejo', body='...',
+                                  message_type='support', timestamp=base)
+            old_alert = Message(sender_id=admin_id, recipient_id=None, subject='Alerta vieja', body='...',
+                                message_type='alert', timestamp=base + timedelta(minutes=1))
+            db.session.add_all([old_private, old_alert])
+            db.session.flush()
+            db.session.add(Message(sender_id=admin_id, recipient_id=user_id, subject='Privado nuevo', body='...',
+                                   message_type='support', timestamp=base + timedelta(minutes=2)))
+            db.session.add(Message(sender_id=admin_id, recipient_id=None, subject='Alerta nueva', body='...',
+                                   message_type='alert', timestamp=base + timedelta(minutes=3)))
+            db.session.commit()
+            old_private_id, old_alert_id = old_private.id, old_alert.id
+
+        def revalidate(headers, etag):
+            return self.client.get('/api/messages', headers={**headers, 'If-None-Match': etag})
+
+        etag = self.client.get('/api/messages', headers=user_headers).headers['ETag']
+        self.assertEqual(revalidate(user_headers, etag).status_code, 304)
+
+        # Lectura de un mensaje privado viejo: cambia solo el ETag de ese usuario
+        other_etag = self.client.get('/api/messages', headers=other_headers).headers['ETag']
+        self.assertEqual(self.client.patch(f'/api/messages/{old_private_id}/read', headers=user_headers).status_code, 200)
+        response = revalidate(user_headers, etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response.headers['ETag']
+        self.assertEqual(revalidate(other_headers, other_etag).status_code, 304)
+
+        # Borrado de la alerta vieja por un admin: cambia el ETag de todos
+        self.assertEqual(self.client.delete(f'/api/messages/{old_alert_id}', headers=admin_headers).status_code, 200)
+        self.assertEqual(revalidate(user_headers, etag).status_code, 200)
+        self.assertEqual(revalidate(other_headers, other_etag).status_code, 200)
+
+
+# 8. TEST DEL CANAL SSE (GET /api/messages/stream)
+class MessageStreamTest(BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        # Conexiones cortas para que el stream termine dentro del test
+        app.config['SSE_HEARTBEAT_SECONDS'] = 0.05
+        app.config['SSE_MAX_CONNECTION_SECONDS'] = 0.2
+
+    def tearDown(self):
+        app.config.pop('SSE_HEARTBEAT_SECONDS', None)
+        app.config.pop('SSE_MAX_CONNECTION_SECONDS', None)
+        super().tearDown()
+
+    def test_stream_filters_by_user_and_resumes_from_last_event_id(self):
+        """Cada usuario recibe sus mensajes y las alertas, reanudando desde Last-Event-ID."""
+        from utils.events import get_event_hub
+
+        admin_headers = self.register_user('sse_admin', 'sse_admin@test.com', role='admin')
+        user_headers = self.register_user('sse_user', 'sse_user@test.com')
+        self.register_user('sse_other', 'sse_other@test.com')
+        with self.app.app_context():
+            user_id = User.query.filter_by(username='sse_user').first().id
+            other_id = User.query.filter_by(username='sse_other').first().id
+            start_id = get_event_hub().latest_id()
+
+        for recipient in (user_id, other_id):
+            response = self.client.post(f'/api/messages/user/{recipient}', headers=admin_headers,
+                                        data=json.dumps({'subject': f'Hola {recipient}', 'body': 'Texto'}),
+                                        content_type='application/json')
+            self.assertEqual(response.status_code, 201)
+        response = self.client.post('/api/messages/alert', headers=admin_headers,
+                                    data=json.dumps({'body': 'Ruta cortada'}),
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+
+        # EventSource no envía headers: la URL lleva un token de stream, no el JWT de login
+        token = self.client.post('/api/messages/stream/token', headers=user_headers).json['token']
+        response = self.client.get(f'/api/messages/stream?token={token}',
+                                   headers={'Accept': 'text/event-stream', 'Last-Event-ID': start_id})
+        self.assertEqual(response.status_code, 200)
+        body = response.get_data(as_text=True)
+        self.assertIn(f'Hola {user_id}', body)
+        self.assertNotIn(f'Hola {other_id}', body)
+        self.assertIn('event: alert', body)
+        self.assertIn(': ping', body)
+
+    def test_stream_token_is_short_lived_and_scoped_to_the_stream(self):
+        """El JWT de login no abre el stream y el token de stream no sirve como sesión ni después de vencer."""
+        user_headers = self.register_user('sse_scope', 'sse_scope@test.com')
+        login_token = user_headers['Authorization'].split()[1]
+        response = self.client.get(f'/api/messages/stream?token={login_token}',
+                                   headers={'Accept': 'text/event-stream'})
+        self.assertEqual(response.status_code, 401)
+
+        response = self.client.post('/api/messages/stream/token', headers=user_headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json['expires_in'], 60)
+        stream_token = response.json['token']
+        response = self.client.get('/api/messages', headers={'Authorization': f'Bearer {stream_token}'})
+        self.assertEqual(response.status_code, 401)
+
+        app.config['STREAM_TOKEN_TTL_SECONDS'] = -1
+        try:
+            expired = self.client.post('/api/messages/stream/token', headers=user_headers).json['token']
+        finally:
+            app.config.pop('STREAM_TOKEN_TTL_SECONDS', None)
+        response = self.client.get(f'/api/messages/stream?token={expired}', headers={'Accept': 'text/event-stream'})
+        self.assertEqual(response.status_code, 401)
+
+
+# 9. TEST DE LECTURA DE ALERTAS MASIVAS (marca de agua por usuario)
+class AlertReadStateTest(BaseTestCase):
+
+    def test_watermark_and_out_of_order_reads(self):
+        """Leer una alerta suelta es una excepción; marcar todas avanza la marca y la limpia."""
+        user_headers = self.register_user('reader', 'reader@test.com')
+        other_headers = self.register_user('reader2', 'reader2@test.com')
+        with self.app.app_context():
+            user_id = User.query.filter_by(username='reader').first().id
+            base = datetime(2025, 1, 1, 12, 0, 0)
+            alert_ids = []
+            for i in range(4):
+                msg = Message(sender_id=user_id, recipient_id=None, subject=f'Alerta {i}', body='...',
+                              message_type='alert', timestamp=base + timedelta(minutes=i))
+                db.session.add(msg)
+                db.session.flush()
+                alert_ids.append(msg.id)
+            db.session.commit()
+
+        response = self.client.get('/api/messages/alerts/unread_count', headers=user_headers)
+        self.assertEqual(response.json['unread_alerts'], 4)
+        etag = self.client.get('/api/messages', headers=user_headers).headers['ETag']
+
+        # Lectura fuera de orden de la alerta más nueva
+        response = self.client.patch(f'/api/messages/{alert_ids[3]}/read', headers=user_headers)
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get('/api/messages', headers={**user_headers, 'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        read = {m['subject']: m['is_read_by_recipient'] for m in response.json}
+        self.assertEqual(read, {'Alerta 3': True, 'Alerta 2': False, 'Alerta 1': False, 'Alerta 0': False})
+
+        # Marcar hasta la alerta 1: quedan 1 sin leer (la 2)
+        response = self.client.patch('/api/messages/alerts/read', headers=user_headers,
+                                     data=json.dumps({'up_to': alert_ids[1]}),
+                                     content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json['unread_alerts'], 1)
+
+        # Marcar todas: la excepción queda cubierta por la marca y se elimina
+        response = self.client.patch('/api/messages/alerts/read', headers=user_headers)
+        self.assertEqual(response.json['unread_alerts'], 0)
+        self.assertEqual(response.json['last_seen_alert_id'], alert_ids[3])
+        with self.app.app_context():
+            from models.messages_models import MessageRead
+            self.assertEqual(MessageRead.query.filter_by(user_id=user_id).count(), 0)
+
+        # El estado es por usuario
+        response = self.client.get('/api/messages/alerts/unread_count', headers=other_headers)
+        self.assertEqual(response.json['unread_alerts'], 4)
+
+    def test_unread_count_survives_deleted_alerts(self):
+        """El conteo es secuencia - marca - excepciones: borrar alertas (leídas o no) lo mantiene exacto."""
+        admin_headers = self.register_user('seq_admin', 'seq_admin@test.com', role='admin')
+        user_headers = self.register_user('seq_reader', 'seq_reader@test.com')
+        with self.app.app_context():
+            admin_id = User.query.filter_by(username='seq_admin').first().id
+            base = datetime(2025, 1, 1, 12, 0, 0)
+            alert_ids = []
+            for i in range(5):
+                msg = Message(sender_id=admin_id, recipient_id=None, subject=f'Seq {i}', body='...',
+                              message_type='alert', timestamp=base + timedelta(minutes=i))
+                db.session.add(msg)
+                db.session.flush()
+                alert_ids.append(msg.id)
+            db.session.commit()
+            self.assertEqual([db.session.get(Message, i).alert_seq for i in alert_ids], [1, 2, 3, 4, 5])
+
+        def unread():
+            return self.client.get('/api/messages/alerts/unread_count', headers=user_headers).json['unread_alerts']
+
+        self.client.patch('/api/messages/alerts/read', headers=user_headers,
+                          data=json.dumps({'up_to': alert_ids[0]}), content_type='application/json')
+        self.client.patch(f'/api/messages/{alert_ids[3]}/read', headers=user_headers)
+        self.assertEqual(unread(), 3)
+
+        # Borrar una leída fuera de orden, una sin leer y una bajo la marca
+        for alert_id in (alert_ids[3], alert_ids[2], alert_ids[0]):
+            self.assertEqual(self.client.delete(f'/api/messages/{alert_id}', headers=admin_headers).status_code, 200)
+        self.assertEqual(unread(), 2)
+
+        # Una alerta nueva suma una; marcar todo deja cero
+        with self.app.app_context():
+            db.session.add(Message(sender_id=admin_id, recipient_id=None, subject='Seq 5', body='...',
+                                   message_type='alert', timestamp=base + timedelta(minutes=5)))
+            db.session.commit()
+        self.assertEqual(unread(), 3)
+        self.client.patch('/api/messages/alerts/read', headers=user_headers)
+        self.assertEqual(unread(), 0)
+
+
+# 10. TEST DE REPORTES AL GRUPO DE ADMINISTRADORES (una fila por reporte)
+class GroupReportTest(BaseTestCase):
+
+    def test_report_is_stored_once_with_per_admin_read_state(self):
+        """El reporte se guarda una vez y cada admin tiene su propio estado de lectura."""
+        admin1 = self.register_user('group_admin1', 'group_admin1@test.com', role='admin')
+        admin2 = self.register_user('group_admin2', 'group_admin2@test.com', role='admin')
+        citizen = self.register_user('citizen', 'citizen@test.com')
+
+        response = self.client.post('/api/report', headers=citizen, data={
+            'subject': 'Choque en curva', 'description': 'Dos autos', 'lat': '-32.8', 'lng': '-70.1'
+        })
+        self.assertEqual(response.status_code, 201)
+        with self.app.app_context():
+            reports = Message.query.filter_by(subject='Choque en curva').all()
+            self.assertEqual(len(reports), 1)
+            self.assertEqual(reports[0].recipient_group, 'admins')
+            self.assertIsNone(reports[0].recipient_id)
+            report_id = reports[0].id
+
+        def report_for(headers):
+            return next((m for m in self.client.get('/api/messages', headers=headers).json
+                         if m['id'] == report_id), None)
+
+        self.assertFalse(report_for(admin1)['is_read_by_recipient'])
+        self.assertIsNone(report_for(citizen))
+
+        self.assertEqual(self.client.patch(f'/api/messages/{report_id}/read', headers=citizen).status_code, 403)
+        self.assertEqual(self.client.patch(f'/api/messages/{report_id}/read', headers=admin1).status_code, 200)
+        self.assertTrue(report_for(admin1)['is_read_by_recipient'])
+        self.assertFalse(report_for(admin2)['is_read_by_recipient'])
+
+    def test_admin_delete_hides_report_only_for_that_admin(self):
+        from models.messages_models import MessageRead, MessageHidden
+        admin1 = self.register_user('hide_admin1', 'hide_admin1@test.com', role='admin')
+        admin2 = self.register_user('hide_admin2', 'hide_admin2@test.com', role='admin')
+        citizen = self.register_user('hide_citizen', 'hide_citizen@test.com')
+
+        self.client.post('/api/report', headers=citizen, data={'subject': 'Piedras en la ruta', 'description': 'x'})
+        with self.app.app_context():
+            report_id = Message.query.filter_by(subject='Piedras en la ruta').one().id
+
+        def ids(headers):
+            return [m['id'] for m in self.client.get('/api/messages', headers=headers).json]
+
+        self.assertEqual(self.client.patch(f'/api/messages/{report_id}/read', headers=admin2).status_code, 200)
+        self.assertEqual(self.client.delete(f'/api/messages/{report_id}', headers=citizen).status_code, 403)
+        self.assertEqual(self.client.delete(f'/api/messages/{report_id}', headers=admin1).status_code, 200)
+        self.assertEqual(self.client.delete(f'/api/messages/{report_id}', headers=admin1).status_code, 200)
+
+        self.assertNotIn(report_id, ids(admin1))
+        self.assertIn(report_id, ids(admin2))
+        with self.app.app_context():
+            self.assertIsNotNone(db.session.get(Message, report_id))
+            self.assertEqual(MessageRead.query.filter_by(message_id=report_id).count(), 1)  # La lectura de admin2
+            self.assertEqual(MessageHidden.query.filter_by(message_id=report_id).count(), 1)
+
+
+# 11. TEST DE SUBIDA DE FOTOS (stream a disco, hash SHA-256, límite y magic bytes)
+class IncidentPhotoUploadTest(BaseTestCase):
+
+    PNG = b'\x89PNG\r\n\x1a\n' + b'\x00' * 64
+
+    def setUp(self):
+        super().setUp()
+        import tempfile
+        self.upload_dir = tempfile.mkdtemp()
+        self.previous_upload_dir = app.config['UPLOAD_FOLDER']
+        app.config['UPLOAD_FOLDER'] = self.upload_dir
+        self.citizen = self.register_user('photo_user', 'photo_user@test.com')
+        self.register_user('photo_admin', 'photo_admin@test.com', role='admin')
+
+    def tearDown(self):
+        import shutil
+        app.config['UPLOAD_FOLDER'] = self.previous_upload_dir
+        app.config.pop('INCIDENT_PHOTO_MAX_BYTES', None)
+        shutil.rmtree(self.upload_dir, ignore_errors=True)
+        super().tearDown()
+
+    def post_photo(self, content, filename):
+        import io
+        return self.client.post('/api/report', headers=self.citizen, content_type='multipart/form-data', data={
+            'subject': 'Foto', 'description': 'Ruta', 'lat': '-32.8', 'lng': '-70.1',
+            'incident_photo': (io.BytesIO(content), filename)
+        })
+
+    def stored_files(self):
+        return sorted(os.path.relpath(os.path.join(root, name), self.upload_dir)
+                      for root, _dirs, names in os.walk(self.upload_dir) for name in names)
+
+    def test_same_photo_is_stored_once_under_its_hash(self):
+        import hashlib
+        self.assertEqual(self.post_photo(self.PNG, 'foto.png').status_code, 201)
+        self.assertEqual(self.post_photo(self.PNG, 'otra.jpg').status_code, 201)
+
+        digest = hashlib.sha256(self.PNG).hexdigest()
+        self.assertEqual(self.stored_files(), [os.path.join(digest[:2], f'{digest}.png')])
+        with self.app.app_context():
+            bodies = [m.body for m in Message.query.filter_by(subject='Foto')]
+        self.assertEqual(len(bodies), 2)
+        self.assertTrue(all(f'uploads/incident_photos/{digest[:2]}/{digest}.png' in b for b in bodies))
+
+    def test_rejects_non_images_and_oversized_uploads(self):
+        response = self.post_photo(b'<?php echo "hola"; ?>', 'foto.png')
+        self.assertEqual(response.status_code, 415)
+
+        app.config['INCIDENT_PHOTO_MAX_BYTES'] = 32
+        response = self.post_photo(self.PNG, 'grande.png')
+        self.assertEqual(response.status_code, 413)
+        self.assertIn('msg', response.json)
+
+        # Ningún temporal queda en disco
+        self.assertEqual(self.stored_files(), [])
+
+    def test_other_endpoints_keep_the_default_file_stream(self):
+        """El stream con hash y límite solo se usa en /api/report; el resto de las rutas no lo ve."""
+        import io
+        from flask import request
+        from utils.uploads import HashingUploadStream
+        app.config['INCIDENT_PHOTO_MAX_BYTES'] = 4
+        with self.app.test_request_context('/api/messages', method='POST', content_type='multipart/form-data',
+                                           data={'adjunto': (io.BytesIO(b'texto plano'), 'nota.txt')}):
+            adjunto = request.files['adjunto']
+            self.assertNotIsInstance(adjunto.stream, HashingUploadStream)
+            self.assertEqual(adjunto.read(), b'texto plano')
+
+        with self.app.test_request_context('/api/report', method='POST', content_type='multipart/form-data',
+                                           data={'incident_photo': (io.BytesIO(self.PNG[:4]), 'foto.png')}):
+            self.assertIsInstance(request.files['incident_photo'].stream, HashingUploadStream)
+        self.assertEqual(self.stored_files(), [])
+
+
+# 12. TEST DEL STORE DE PUNTOS DEL MAPA (log append-only + compactación atómica)
+class PoiStoreTest(BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        import tempfile
+        self.tmp = tempfile.mkdtemp()
+        self.snapshot = os.path.join(self.tmp, 'puntos_interes.json')
+        self.log = os.path.join(self.tmp, 'puntos_interes.log')
+        with open(self.snapshot, 'w', encoding='utf-8') as f:
+            json.dump([{'name': 'Paso', 'lat': -32.8, 'lng': -70.1, 'type': 'frontera'}], f)
+        app.config['POI_SNAPSHOT_PATH'] = self.snapshot
+        app.config['POI_LOG_PATH'] = self.log
+        for name in ('poi_store', 'poi_index', 'poi_clusters', 'poi_expiry'):
+            app.extensions.pop(name, None)
+
+    def tearDown(self):
+        import shutil
+        app.config.pop('POI_SNAPSHOT_PATH', None)
+        app.config.pop('POI_LOG_PATH', None)
+        for name in ('poi_store', 'poi_index', 'poi_clusters', 'poi_expiry'):
+            app.extensions.pop(name, None)
+        shutil.rmtree(self.tmp, ignore_errors=True)
+        super().tearDown()
+
+    def test_appends_are_shared_between_workers_and_ids_never_repeat(self):
+        from utils.poi_store import PoiStore
+        worker_a = PoiStore(self.snapshot, self.log)
+        worker_b = PoiStore(self.snapshot, self.log)
+
+        first = worker_a.add({'name': 'Incidente 1', 'type': 'incidente'})
+        second = worker_b.add({'name': 'Incidente 2', 'type': 'incidente'})
+        self.assertEqual((first, second), (2, 3))
+        self.assertEqual([p['name'] for p in worker_a.points()], ['Paso', 'Incidente 1', 'Incidente 2'])
+
+        # Escritura cortada a la mitad: se ignora y se descarta en la próxima operación
+        with open(self.log, 'ab') as f:
+            f.write(b'{"op":"add","point":{"na')
+        self.assertTrue(worker_b.remove(second))
+        self.assertTrue(worker_a.compact())
+
+        with open(self.snapshot, encoding='utf-8') as f:
+            raw = f.read()
+        self.assertNotIn('\n', raw)
+        self.assertEqual([p['name'] for p in json.loads(raw)], ['Paso', 'Incidente 1'])
+        # El id 3 se borró, pero no se reutiliza después de compactar
+        self.assertEqual(worker_b.add({'name': 'Incidente 3', 'type': 'incidente'}), 4)
+        self.assertEqual(len(PoiStore(self.snapshot, self.log).points()), 3)
+
+    def test_geolocated_alert_adds_point(self):
+        admin_headers = self.register_user('poi_admin', 'poi_admin@test.com', role='admin')
+        response = self.client.post('/api/messages/alert', headers=admin_headers, content_type='application/json',
+                                    data=json.dumps({'body': 'Derrumbe', 'latitude': -32.9, 'longitude': -70.2}))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json['map_point_id'], 2)
+        with self.app.app_context():
+            from utils.poi_store import get_poi_store
+            self.assertEqual(get_poi_store().points()[-1]['body_alert'], 'Derrumbe')
+
+    def test_bbox_api_filters_by_area_and_type(self):
+        """GET /api/poi?bbox= devuelve solo lo visible y ve los puntos nuevos sin reconstruir todo."""
+        from utils.poi_store import PoiStore
+        other_worker = PoiStore(self.snapshot, self.log)
+        other_worker.add({'name': 'Cerca', 'lat': -32.81, 'lng': -70.09, 'iconType': 'incidente'})
+        other_worker.add({'name': 'Lejos', 'lat': -33.45, 'lng': -70.66, 'iconType': 'incidente'})
+
+        response = self.client.get('/api/poi?bbox=-70.2,-32.9,-70.0,-32.7')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(p['name'] for p in response.json), ['Cerca', 'Paso'])
+
+        response = self.client.get('/api/poi?bbox=-70.2,-32.9,-70.0,-32.7&types=Incidente')
+        self.assertEqual([p['name'] for p in response.json], ['Cerca'])
+
+        # Alta posterior de otro worker: el índice se actualiza de forma incremental
+        other_worker.add({'name': 'Nuevo', 'lat': -32.8, 'lng': -70.05, 'iconType': 'hotel'})
+        response = self.client.get('/api/poi?bbox=-70.2,-32.9,-70.0,-32.7&types=hotel')
+        self.assertEqual([p['name'] for p in response.json], ['Nuevo'])
+
+        self.assertEqual(self.client.get('/api/poi?bbox=1,2,3').status_code, 400)
+        for bbox in ('nan,nan,nan,nan', '-inf,-90,inf,90', '-70.2,-32.9,-70.0,nan'):
+            self.assertEqual(self.client.get(f'/api/poi?bbox={bbox}').status_code, 400)
+            self.assertEqual(self.client.get(f'/api/poi/clusters?z=5&bbox={bbox}').status_code, 400)
+        # Fuera de rango se recorta al mundo (Leaflet envía longitudes > 180 al desplazar el mapa)
+        response = self.client.get('/api/poi?bbox=-540,-100,540,100&types=hotel')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([p['name'] for p in response.json], ['Nuevo'])
+
+    def test_clusters_are_hierarchical_and_updated_incrementally(self):
+        """Los clusters de cada zoom suman sus celdas hijas y un alta/baja coincide con reconstruir todo."""
+        import random
+        from utils.poi_clusters import ClusterIndex
+        rnd = random.Random(3)
+        points = [{'id_map': i + 1, 'lat': rnd.uniform(-33, -32.5), 'lng': rnd.uniform(-70.3, -69.9),
+                   'iconType': rnd.choice(['hotel', 'incidente']), 'color': '#000'} for i in range(300)]
+        index = ClusterIndex(max_zoom=12)
+        index.reset(points)
+
+        bbox = (-71, -34, -69, -32)
+        for zoom in (4, 8, 12):
+            clusters = index.clusters(zoom, *bbox)
+            self.assertEqual(sum(c['count'] for c in clusters), 300)
+        self.assertEqual(sum(c['count'] for c in index.clusters(12, *bbox, types={'hotel'})),
+                         sum(1 for p in points if p['iconType'] == 'hotel'))
+
+        index.remove(5)
+        index.insert(301, {'id_map': 301, 'lat': -32.7, 'lng': -70.0, 'iconType': 'hotel'})
+        rebuilt = ClusterIndex(max_zoom=12)
+        rebuilt.reset([p for p in points if p['id_map'] != 5] +
+                      [{'id_map': 301, 'lat': -32.7, 'lng': -70.0, 'iconType': 'hotel'}])
+        for zoom in (4, 8, 12):
+            as_counts = lambda idx: sorted((tuple(c['cell']), c['count'], c['type']) for c in idx.clusters(zoom, *bbox))
+            self.assertEqual(as_counts(index), as_counts(rebuilt))
+
+        # Un cluster de un solo punto trae el punto completo
+        lonely = [c for c in index.clusters(12, *bbox) if c['count'] == 1][0]
+        self.assertIn('id_map', lonely['point'])
+
+    def test_clusters_api_by_tile_and_bbox(self):
+        response = self.client.get('/api/poi/clusters?z=3&x=2&y=4')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json[0]['count'], 1)
+        self.assertEqual(response.json[0]['point']['name'], 'Paso')
+        self.assertEqual(self.client.get('/api/poi/clusters?z=3&x=2&y=3').json, [])
+        response = self.client.get('/api/poi/clusters?z=18&bbox=-70.2,-32.9,-70.0,-32.7')
+        self.assertEqual([c['point']['name'] for c in response.json], ['Paso'])
+        self.assertEqual(self.client.get('/api/poi/clusters?x=1&y=1').status_code, 400)
+
+    def test_expired_alert_points_are_swept_and_compacted(self):
+        """Cada alerta geolocalizada vence (por defecto o según expires_in_hours) y el barrido la retira."""
+        import time
+        from utils.poi_expiry import sweep_expired_points
+        admin_headers = self.register_user('ttl_admin', 'ttl_admin@test.com', role='admin')
+        for body, hours in (('Corta', 1), ('Por defecto', None)):
+            response = self.client.post('/api/messages/alert', headers=admin_headers, content_type='application/json',
+                                        data=json.dumps({'body': body, 'latitude': -32.9, 'longitude': -70.2,
+                                                         'expires_in_hours': hours}))
+            self.assertEqual(response.status_code, 201)
+        response = self.client.post('/api/messages/alert', headers=admin_headers, content_type='application/json',
+                                    data=json.dumps({'body': 'x', 'expires_in_hours': -3}))
+        self.assertEqual(response.status_code, 400)
+
+        with self.app.app_context():
+            from utils.poi_store import get_poi_store
+            self.assertEqual(sweep_expired_points(now=time.time() + 1800), [])
+            self.assertEqual(sweep_expired_points(now=time.time() + 2 * 3600), [2])
+            self.assertEqual([p['body_alert'] for p in get_poi_store().points() if p.get('id_map')],
+                             ['Por defecto'])
+            self.assertEqual(sweep_expired_points(now=time.time() + 13 * 3600), [3])
+
+        # Compactado: el JSON publicado solo tiene los puntos fijos
+        with open(self.snapshot, encoding='utf-8') as f:
+            self.assertEqual([p['name'] for p in json.load(f)], ['Paso'])
+
+
+class StatusResponseCacheTest(BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        from utils.http_cache import response_cache
+        response_cache.clear()
+
+    def tearDown(self):
+        from utils.http_cache import response_cache
+        response_cache.clear()
+        super().tearDown()
+
+    def test_public_paso_is_cached_until_the_job_commits(self):
+        """Los pedidos repetidos no van a la BD, un validador vigente da 304 y el commit del job invalida."""
+        from unittest import mock
+        import requests
+        from models.paso_models import Paso
+        from routes.tomar_paso_routes import actualizar_estado
+        with self.app.app_context():
+            db.session.add(Paso(nombre="Cristo Redentor", estado="Abierto", timestamp=datetime(2025, 7, 1, 12, 0)))
+            db.session.commit()
+
+        response = self.client.get('/paso/public_api')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json['estado'], 'Abierto')
+        self.assertIn('image_filename', response.json)
+        self.assertIn('stale-while-revalidate', response.headers['Cache-Control'])
+        self.assertEqual(response.headers['Last-Modified'], 'Tue, 01 Jul 2025 12:00:00 GMT')
+        etag = response.headers['ETag']
+
+        self.assertEqual(self.client.get('/paso/public_api', headers={'If-None-Match': etag}).status_code, 304)
+        self.assertEqual(self.client.get('/paso/public_api', headers={
+            'If-Modified-Since': 'Tue, 01 Jul 2025 12:00:00 GMT'}).status_code, 304)
+
+        # Un cambio que no pasa por el job no se ve: la respuesta sale de la caché
+        with self.app.app_context():
+            Paso.query.first().estado = "Cerrado"
+            db.session.commit()
+        self.assertEqual(self.client.get('/paso/public_api').json['estado'], 'Abierto')
+
+        # El commit de actualizar_estado invalida la entrada
+        with self.app.app_context(), \
+                mock.patch.object(requests.Session, 'get', side_effect=requests.ConnectionError('sin red')):
+            actualizar_estado()
+        response = self.client.get('/paso/public_api', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json['estado'], 'Error de conexión/parsing')
+
+    def test_forecast_validators_and_404(self):
+        from datetime import date
+        from models.paso_models import Paso
+        from models.clima_models import PronosticoDiario
+        self.assertEqual(self.client.get('/api/clima/pronostico/no-existe').status_code, 404)
+        with self.app.app_context():
+            paso = Paso(nombre="Cristo Redentor")
+            db.session.add(paso)
+            db.session.flush()
+            for day in range(1, 6):
+                db.session.add(PronosticoDiario(paso_id=paso.id, fecha_pronostico=date(2025, 7, day),
+                                                temp_min=-5, temp_max=day,
+                                                fecha_actualizacion=datetime(2025, 7, 1, 8, day)))
+            db.session.commit()
+            paso_id = paso.id
+
+        response = self.client.get(f'/api/clima/pronostico/{paso_id}')
+        self.assertEqual([d['fecha_pronostico'][-2:] for d in response.json], ['02', '03', '04', '05'])
+        self.assertEqual(response.headers['Last-Modified'], 'Tue, 01 Jul 2025 08:05:00 GMT')
+        response = self.client.get(f'/api/clima/pronostico/{paso_id}',
+                                   headers={'If-None-Match': response.headers['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+    def test_concurrent_misses_build_once(self):
+        import threading
+        import time
+        from utils.http_cache import ResponseCache
+        cache = ResponseCache()
+        calls = []
+
+        def build():
+            calls.append(1)
+            time.sleep(0.05)
+            return {"ok": True}, 200, None
+
+        results = []
+
+        def worker():
+            with self.app.app_context():
+                results.append(cache.get_or_build('k', build))
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len({id(entry) for entry in results}), 1)
+        self.assertEqual(cache.stats()['coalesced'], 7)
+
+        # Una invalidación durante la construcción no deja guardado un resultado viejo
+        def build_and_invalidate():
+            cache.invalidate('k2')
+            return {"ok": False}, 200, None
+
+        with self.app.app_context():
+            cache.get_or_build('k2', build_and_invalidate)
+            cache.get_or_build('k2', build)
+        self.assertEqual(len(calls), 2)
+
+    def test_status_snapshot_is_republished_by_the_job_and_served_without_queries(self):
+        from unittest import mock
+        from datetime import date
+        import requests
+        from sqlalchemy import event
+        from models.paso_models import Paso
+        from models.clima_models import PronosticoDiario
+        from routes.tomar_paso_routes import actualizar_estado
+        with self.app.app_context():
+            paso = Paso(nombre="Cristo Redentor", estado="Abierto")
+            db.session.add(paso)
+            db.session.flush()
+            db.session.add(PronosticoDiario(paso_id=paso.id, fecha_pronostico=date(2025, 7, 1), temp_max=3))
+            db.session.commit()
+            with mock.patch.object(requests.Session, 'get', side_effect=requests.ConnectionError('x')):
+                actualizar_estado()
+            engine = db.engine
+
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        event.listen(engine, 'before_cursor_execute', listener)
+        try:
+            response = self.client.get('/api/status')
+            again = self.client.get('/api/status', headers={'If-None-Match': response.headers['ETag']})
+        finally:
+            event.remove(engine, 'before_cursor_execute', listener)
+
+        self.assertEqual(statements, [])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json['paso']['estado'], 'Error de conexión/parsing')
+        self.assertEqual([d['temp_max'] for d in response.json['pronostico']], [3])
+        self.assertTrue(response.json['images'])
+        self.assertEqual(again.status_code, 304)
+
+
+class MultiPassScraperTest(BaseTestCase):
+
+    PAGINA = ('<p><span class="label label-success">Abierto</span> Actualizado hace 5 minutos</p>'
+              '<p><strong>Horarios de atención:</strong> 0900 HS A 2100 HS</p>')
+
+    def setUp(self):
+        super().setUp()
+        from utils.http_cache import response_cache
+        response_cache.clear()
+        app.config['PASOS'] = [
+            {"nombre": "Cristo Redentor", "url": "https://a.test/cristo", "lat": -32.83, "lon": -70.04},
+            {"nombre": "Pehuenche", "url": "https://a.test/pehuenche", "lat": -35.98, "lon": -70.39},
+            {"nombre": "Jama", "url": "https://b.test/jama", "lat": -23.24, "lon": -67.03},
+        ]
+        app.config['SCRAPER_PER_HOST'] = 1
+        from utils.circuit_breaker import breakers
+        breakers.reset()
+
+    def tearDown(self):
+        from utils.http_cache import response_cache
+        app.config.pop('PASOS', None)
+        app.config.pop('SCRAPER_PER_HOST', None)
+        response_cache.clear()
+        super().tearDown()
+
+    def test_sweep_is_concurrent_per_host_limited_and_upserts_every_pass(self):
+        import threading
+        import time
+        from unittest import mock
+        import requests
+        from models.paso_models import Paso
+        from routes.tomar_paso_routes import actualizar_estado, paso_principal
+        from utils.pasos_scraper import ultimo_barrido
+
+        activos, maximos, lock = {}, {}, threading.Lock()
+        pagina = self.PAGINA
+
+        class Respuesta:
+            text = pagina
+            status_code = 200
+            headers = {}
+
+            def raise_for_status(self):
+                pass
+
+        def fake_get(session, url, timeout, headers):
+            host = url.split('/')[2]
+            with lock:
+                activos[host] = activos.get(host, 0) + 1
+                maximos[host] = max(maximos.get(host, 0), activos[host])
+            time.sleep(0.1)
+            with lock:
+                activos[host] -= 1
+            if 'jama' in url:
+                raise requests.Timeout('sin respuesta')
+            return Respuesta()
+
+        with self.app.app_context():
+            with mock.patch.object(requests.Session, 'get', autospec=True, side_effect=fake_get):
+                inicio = time.perf_counter()
+                actualizar_estado()
+                actualizar_estado()  # Segundo barrido: actualiza las mismas filas
+                duracion = time.perf_counter() - inicio
+
+            pasos = {p.nombre: p for p in Paso.query.all()}
+            self.assertEqual(set(pasos), {"Cristo Redentor", "Pehuenche", "Jama"})
+            self.assertEqual(pasos["Pehuenche"].estado, "Abierto")
+            self.assertEqual(pasos["Pehuenche"].horario_atencion, "0900 HS A 2100 HS")
+            self.assertEqual(pasos["Pehuenche"].latitud, -35.98)
+            self.assertEqual(pasos["Jama"].estado, "Error de conexión/parsing")
+            self.assertEqual(paso_principal().nombre, "Cristo Redentor")
+
+        # Un solo pedido a la vez por host; b.test corre en paralelo con a.test (2 x 0.2 s, no 2 x 0.3 s)
+        self.assertEqual(maximos, {"a.test": 1, "b.test": 1})
+        self.assertLess(duracion, 0.55)
+        self.assertEqual(ultimo_barrido['pasos']['Jama']['error'], 'sin respuesta')
+        self.assertGreaterEqual(ultimo_barrido['pasos']['Pehuenche']['total_ms'], 100)
+
+
+    def test_conditional_fetch_and_unchanged_fragment_skip_parse_and_write(self):
+        from unittest import mock
+        import requests
+        from sqlalchemy import event
+        from models.paso_models import Paso
+        from routes.tomar_paso_routes import actualizar_estado
+        from utils import pasos_scraper
+        app.config['PASOS'] = app.config['PASOS'][:1]
+        pagina = self.PAGINA
+        servidor = {"etag": '"v1"', "html": '<html><body data-csrf="a">' + pagina + '</body></html>'}
+        pedidos = []
+
+        class Respuesta:
+            def __init__(self, status_code, text='', headers=None):
+                self.status_code, self.text, self.headers = status_code, text, headers or {}
+
+            def raise_for_status(self):
+                pass
+
+        def fake_get(session, url, timeout, headers):
+            pedidos.append(dict(headers))
+            if headers.get('If-None-Match') == servidor['etag']:
+                return Respuesta(304)
+            return Respuesta(200, servidor['html'], {'ETag': servidor['etag']})
+
+        def correr():
+            antes = dict(pasos_scraper.contadores)
+            updates = []
+            listener = lambda *args: updates.append(args[2]) if args[2].startswith('UPDATE') else None
+            event.listen(db.engine, 'before_cursor_execute', listener)
+            try:
+                with mock.patch.object(requests.Session, 'get', autospec=True, side_effect=fake_get), \
+                        mock.patch('utils.pasos_scraper.extraer_estado', wraps=pasos_scraper.extraer_estado) as parse:
+                    actualizar_estado()
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', listener)
+            delta = {k: v - antes[k] for k, v in pasos_scraper.contadores.items() if v != antes[k]}
+            return delta, parse.call_count, len(updates)
+
+        with self.app.app_context():
+            self.assertEqual(correr(), ({'parseado': 1, 'escritos': 1}, 1, 0))  # Alta (INSERT)
+            self.assertEqual(pedidos[-1], {})
+            self.assertEqual(correr(), ({'no_modificado': 1}, 0, 0))
+            self.assertEqual(pedidos[-1], {'If-None-Match': '"v1"'})
+
+            # Cambia el ETag y partes irrelevantes de la página, no el estado ni el horario
+            servidor.update(etag='"v2"', html='<html><body data-csrf="b">' + pagina + '</body></html>')
+            # Se extrae y no se escribe el estado: solo los validadores nuevos (un UPDATE)
+            self.assertEqual(correr(), ({'sin_cambios': 1}, 1, 1))
+            # El pedido siguiente va con el ETag nuevo y vuelve a ser un 304
+            self.assertEqual(correr(), ({'no_modificado': 1}, 0, 0))
+            self.assertEqual(pedidos[-1], {'If-None-Match': '"v2"'})
+
+            servidor.update(etag='"v3"', html=pagina.replace('Abierto', 'Cerrado'))
+            self.assertEqual(correr(), ({'parseado': 1, 'escritos': 1}, 1, 1))
+            paso = Paso.query.one()
+            self.assertEqual((paso.estado, paso.http_etag), ('Cerrado', '"v3"'))
+
+    def test_state_hash_follows_the_nodes_the_extractor_reads(self):
+        from utils.pasos_extractor import extraer_estado
+        from utils.pasos_scraper import hash_estado
+
+        def huella(html):
+            return hash_estado(extraer_estado(html))
+
+        carpeta = os.path.join(os.path.dirname(__file__), 'fixtures', 'pasos')
+        with open(os.path.join(carpeta, 'anidado.html'), encoding='utf-8') as f:
+            anidado = f.read()
+        with open(os.path.join(carpeta, 'abierto.html'), encoding='utf-8') as f:
+            abierto = f.read()
+
+        # El <span label-danger> dentro del <script> y el primer <strong> sin horario no cuentan
+        cambios = [
+            (anidado, anidado.replace('Ab<em>ierto</em>', 'Cer<em>rado</em>')),
+            (anidado, anidado.replace('Ab<em>ierto</em>', 'Cerrado').replace('0600 HS A 1800 HS', '0000 HS A 0000 HS')),
+            (abierto, abierto.replace('<strong>Horarios de atención:</strong> 0900 HS A 2100 HS',
+                                      '<strong><em>Horarios de atención:</em></strong> 0000 HS A 0000 HS')),
+        ]
+        for antes, despues in cambios:
+            self.assertNotEqual(antes, despues)
+            self.assertNotEqual(huella(antes), huella(despues))
+
+        # Cambios fuera de lo que se extrae no alteran la huella
+        self.assertEqual(huella(anidado), huella(anidado.replace('Sección 3', 'Sección tres')))
+
+    def test_open_circuit_fails_fast_and_keeps_last_known_state(self):
+        from unittest import mock
+        import requests
+        from models.paso_models import Paso
+        from routes.tomar_paso_routes import actualizar_estado
+        from utils.circuit_breaker import breakers, ABIERTO, BREAKER_FAILURE_THRESHOLD
+        from utils.pasos_scraper import ultimo_barrido, CIRCUITO_ABIERTO
+        pagina = self.PAGINA
+        caidos = set()
+        pedidos = []
+
+        class Respuesta:
+            status_code, text, headers = 200, pagina, {}
+
+            def raise_for_status(self):
+                pass
+
+        def fake_get(session, url, timeout, headers):
+            pedidos.append(url)
+            if url.split('/')[2] in caidos:
+                raise requests.Timeout('sin respuesta')
+            return Respuesta()
+
+        def correr():
+            with mock.patch.object(requests.Session, 'get', autospec=True, side_effect=fake_get):
+                actualizar_estado()
+
+        with self.app.app_context():
+            correr()
+            caidos.add('b.test')
+            for _ in range(BREAKER_FAILURE_THRESHOLD):
+                correr()
+            self.assertEqual(breakers.get('b.test').state, ABIERTO)
+            self.assertEqual(Paso.query.filter_by(nombre='Jama').one().estado, "Error de conexión/parsing")
+
+            # Con el circuito abierto Jama no se pide; a.test sigue normal
+            caidos.clear()
+            Paso.query.filter_by(nombre='Jama').update({Paso.estado: 'Abierto'})
+            db.session.commit()
+            pedidos.clear()
+            correr()
+            self.assertNotIn('https://b.test/jama', pedidos)
+            self.assertEqual(ultimo_barrido['pasos']['Jama']['resultado'], CIRCUITO_ABIERTO)
+            self.assertLess(ultimo_barrido['pasos']['Jama']['total_ms'], 50)
+            self.assertEqual(Paso.query.filter_by(nombre='Jama').one().estado, 'Abierto')
+            self.assertEqual(breakers.stats()['b.test']['rejected'], 1)
+            self.assertEqual(breakers.stats()['a.test']['state'], 'closed')
+
+    def test_history_records_only_transitions_and_aggregates_by_day_in_sql(self):
+        from unittest import mock
+        from datetime import date
+        import requests
+        from models.paso_models import Paso, PasoHistorial
+        from routes.tomar_paso_routes import actualizar_estado, resumen_diario
+        paginas = {r['url']: self.PAGINA for r in app.config['PASOS']}
+        caidos = set()
+
+        class Respuesta:
+            def __init__(self, text):
+                self.status_code, self.text, self.headers = 200, text, {}
+
+            def raise_for_status(self):
+                pass
+
+        def fake_get(session, url, timeout, headers):
+            if url in caidos:
+                raise requests.exceptions.ConnectionError("timeout")
+            return Respuesta(paginas[url])
+
+        def correr():
+            with mock.patch.object(requests.Session, 'get', autospec=True, side_effect=fake_get):
+                actualizar_estado()
+            return PasoHistorial.query.count()
+
+        jama, cristo = 'https://b.test/jama', 'https://a.test/cristo'
+        with self.app.app_context():
+            self.assertEqual(correr(), 3)  # Estado inicial de cada paso
+            paginas[jama] = self.PAGINA.replace('hace 5 minutos', 'hace 9 minutos')
+            self.assertEqual(correr(), 3)  # Cambió solo el texto de actualización
+            caidos.add(jama)
+            self.assertEqual(correr(), 3)  # Los errores de descarga no son transiciones...
+            caidos.clear()
+            self.assertEqual(correr(), 3)  # ...ni la vuelta al estado que ya tenía
+            paginas[cristo] = self.PAGINA.replace('Abierto', 'Cerrado')
+            self.assertEqual(correr(), 4)
+            paso = Paso.query.filter_by(nombre='Cristo Redentor').one()
+            self.assertEqual([h.estado for h in PasoHistorial.query.filter_by(paso_id=paso.id)
+                              .order_by(PasoHistorial.timestamp)], ['Abierto', 'Cerrado'])
+
+            # Resumen diario sobre transiciones conocidas
+            PasoHistorial.query.delete()
+            for ts, estado in ((datetime(2025, 7, 1, 6), 'Abierto'), (datetime(2025, 7, 1, 18), 'Cerrado'),
+                               (datetime(2025, 7, 3, 12), 'Abierto')):
+                db.session.add(PasoHistorial(paso_id=paso.id, estado=estado, timestamp=ts))
+            db.session.commit()
+            dias = resumen_diario(paso.id, date(2025, 7, 1), date(2025, 7, 3), ahora=datetime(2025, 7, 3, 18))
+            self.assertEqual([(d['fecha'], d['horas'], d['transiciones']) for d in dias], [
+                ('2025-07-01', {'Abierto': 12.0, 'Cerrado': 6.0}, 2),
+                ('2025-07-02', {'Cerrado': 24.0}, 0),
+                ('2025-07-03', {'Cerrado': 12.0, 'Abierto': 6.0}, 1),
+            ])
+
+        r = self.client.get(f'/paso/{paso.id}/historial?desde=2025-07-02&hasta=2025-07-04')
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.json['estado_inicial']['estado'], 'Cerrado')
+        self.assertEqual([t['estado'] for t in r.json['transiciones']], ['Abierto'])
+
+        r = self.client.get(f'/paso/{paso.id}/historial/diario?desde=2025-07-01&hasta=2025-07-04')
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual([d['fecha'] for d in r.json['dias']], ['2025-07-01', '2025-07-02', '2025-07-03'])
+        self.assertEqual(r.json['horas_totales'], {'Abierto': 24.0, 'Cerrado': 42.0})
+
+        self.assertEqual(self.client.get(f'/paso/{paso.id}/historial?desde=2025-07-04&hasta=2025-07-01').status_code, 400)
+        self.assertEqual(self.client.get('/paso/no-existe/historial').status_code, 404)
+
+    def test_streaming_extractor_matches_beautifulsoup(self):
+        import glob
+        import os
+        from utils.pasos_extractor import extraer_estado, extraer_estado_bs4
+
+        fixtures = sorted(glob.glob(os.path.join(os.path.dirname(__file__), 'fixtures', 'pasos', '*.html')))
+        self.assertTrue(fixtures)
+        for path in fixtures:
+            with open(path, encoding='utf-8') as f:
+                html = f.read()
+            with self.subTest(fixture=os.path.basename(path)):
+                self.assertEqual(extraer_estado(html), extraer_estado_bs4(html))
+
+        # Casos borde del árbol: span sin cerrar, cierres sueltos, <strong> anidados y nodo adyacente etiqueta
+        casos = [
+            self.PAGINA,
+            '<div><span class="label-warning">Condicionado</span>',
+            '<p><span class="label-danger">Cerrado</div> hace 1 hora</p><strong><strong>Horarios de atención:</strong>',
+            '<span class="label-success">Abierto<br>hace</br> 2 min</span>x',
+        ]
+        for html in casos:
+            with self.subTest(html=html):
+                self.assertEqual(extraer_estado(html), extraer_estado_bs4(html))
+
+        html = '<span class="label-success">Abierto</span><em>hace 5 minutos</em>'
+        self.assertRaises(TypeError, extraer_estado_bs4, html)
+        self.assertRaises(TypeError, extraer_estado, html)
+
+class ForecastRefreshTest(BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        from utils.http_cache import response_cache
+        response_cache.clear()
+        app.config['WEATHER_API_KEY'] = 'test'
+        import tempfile
+        self.cache_dir = tempfile.mkdtemp()
+        app.config['WEATHER_CACHE_DIR'] = self.cache_dir
+        app.extensions.pop('weather_cache', None)
+        from utils.circuit_breaker import breakers
+        breakers.reset()
+
+    def tearDown(self):
+        import shutil
+        from utils.http_cache import response_cache
+        response_cache.clear()
+        app.config.pop('WEATHER_CACHE_DIR', None)
+        app.extensions.pop('weather_cache', None)
+        app.extensions.pop('refresh_jobs', None)
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        super().tearDown()
+
+    @staticmethod
+    def payload():
+        base = int(datetime(2025, 7, 1, 12, 0).timestamp())
+        return {"list": [
+            {"dt": base + i * 3 * 3600, "main": {"temp": float(i)}, "wind": {"speed": 2.0},
+             "weather": [{"description": "cielo claro"}]}
+            for i in range(16)
+        ]}
+
+    def test_refreshes_every_pass_with_one_call_per_grid_cell(self):
+        import threading
+        from unittest import mock
+        import requests
+        from models.paso_models import Paso
+        from models.clima_models import PronosticoDiario
+        from routes.clima_routes import actualizar_automatico
+        from utils.weather_client import get_weather_session
+
+        llamadas, lock = [], threading.Lock()
+        payload = self.payload()
+
+        class Respuesta:
+            def raise_for_status(self):
+                pass
+
+            def json(self):
+                return payload
+
+        def fake_get(session, url, timeout, params):
+            with lock:
+                llamadas.append((session, params['lat'], params['lon']))
+            return Respuesta()
+
+        with self.app.app_context():
+            db.session.add_all([
+                Paso(nombre="Cristo Redentor", latitud=-32.8322, longitud=-70.0450),
+                Paso(nombre="Aduana Horcones", latitud=-32.8301, longitud=-70.0412),  # misma celda
+                Paso(nombre="Pehuenche", latitud=-35.98, longitud=-70.39),
+                Paso(nombre="Sin coordenadas"),
+            ])
+            db.session.commit()
+
+            with mock.patch.object(requests.Session, 'get', autospec=True, side_effect=fake_get):
+                resultados = actualizar_automatico()
+
+            self.assertEqual(len(llamadas), 2)
+            self.assertEqual({id(call[0]) for call in llamadas}, {id(get_weather_session())})
+            self.assertEqual(len(resultados), 3)
+            por_paso = {p.nombre: PronosticoDiario.query.filter_by(paso_id=p.id).count() for p in Paso.query}
+            self.assertEqual(por_paso, {"Cristo Redentor": 3, "Aduana Horcones": 3, "Pehuenche": 3,
+                                        "Sin coordenadas": 0})
+
+        retry = get_weather_session().get_adapter('http://api.openweathermap.org').max_retries
+        self.assertEqual(retry.total, 3)
+        self.assertIn(503, retry.status_forcelist)
+
+    def test_batch_aggregation_matches_per_payload_processing(self):
+        import random
+        from routes.clima_routes import _procesar_datos_pronostico
+        from utils.pronostico_lote import resumir_pronosticos
+
+        rnd = random.Random(7)
+        descripciones = ['cielo claro', 'nubes dispersas', 'lluvia ligera', 'nevada']
+        base = int(datetime(2025, 7, 1, 0, 0).timestamp())
+        payloads = [{"list": []}, self.payload()]
+        for _ in range(50):
+            inicio = base + rnd.randrange(0, 86400, 3600)
+            payloads.append({"list": [
+                {"dt": inicio + i * 3 * 3600,
+                 "main": {"temp": rnd.choice([rnd.randint(-15, 10), round(rnd.uniform(-25, 15), 2), 0.05])},
+                 "wind": {"speed": rnd.choice([rnd.randint(0, 25), round(rnd.uniform(0, 30), 2)])},
+                 # Pocas descripciones por respuesta: fuerza empates en la más común
+                 "weather": [{"description": rnd.choice(descripciones[:rnd.randint(1, 4)])}]}
+                for i in range(rnd.randint(1, 40))
+            ]})
+
+        esperado = [_procesar_datos_pronostico(p) for p in payloads]
+        obtenido = resumir_pronosticos(payloads)
+        self.assertEqual(obtenido, esperado)
+        # También los tipos (int vs float) que terminan en el JSON de la respuesta
+        self.assertEqual([[{k: type(v) for k, v in d.items()} for d in dias] for dias in obtenido],
+                         [[{k: type(v) for k, v in d.items()} for d in dias] for dias in esperado])
+        self.assertEqual(resumir_pronosticos([]), [])
+
+    def test_bulk_upsert_is_one_statement_and_touches_only_changed_rows(self):
+        from datetime import date
+        from sqlalchemy import event
+        from sqlalchemy.dialects import mysql
+        from models.paso_models import Paso
+        from models.clima_models import PronosticoDiario
+        from routes.clima_routes import _guardar_pronosticos
+        from utils import bulk
+
+        def fila(paso_id, day, temp_max):
+            return {"paso_id": paso_id, "fecha_pronostico": date(2025, 7, day), "temp_min": -2.0,
+                    "temp_max": temp_max, "descripcion": "Nieve", "viento_velocidad_kmh": 20.0,
+                    "viento_direccion": "Oeste", "visibilidad_metros": 10000}
+
+        with self.app.app_context():
+            pasos = [Paso(nombre=f"Paso {i}") for i in range(3)]
+            db.session.add_all(pasos)
+            db.session.commit()
+            _guardar_pronosticos([fila(p.id, d, 1.0) for p in pasos for d in range(1, 5)])
+            db.session.commit()
+            viejo = datetime(2020, 1, 1)
+            PronosticoDiario.query.update({PronosticoDiario.fecha_actualizacion: viejo})
+            db.session.commit()
+            ids = {p.id for p in PronosticoDiario.query}
+            paso_ids = [p.id for p in pasos]
+
+            statements = []
+            listener = lambda *args: statements.append(args[2])
+            event.listen(db.engine, 'before_cursor_execute', listener)
+            try:
+                filas = [fila(paso_id, d, 1.0) for paso_id in paso_ids for d in range(1, 5)]
+                filas[0]['temp_max'] = 7.5
+                filas.append(fila(paso_ids[0], 5, 3.0))
+                _guardar_pronosticos(filas)
+                db.session.commit()
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', listener)
+
+            self.assertEqual(len([s for s in statements if s.lstrip().upper().startswith('INSERT')]), 1)
+            self.assertFalse([s for s in statements if s.lstrip().upper().startswith('SELECT')])
+            self.assertEqual(PronosticoDiario.query.count(), 13)
+            self.assertTrue(ids <= {p.id for p in PronosticoDiario.query})
+            tocados = PronosticoDiario.query.filter(PronosticoDiario.fecha_actualizacion > viejo).all()
+            self.assertEqual(sorted((t.temp_max, t.fecha_pronostico.day) for t in tocados), [(3.0, 5), (7.5, 1)])
+
+            # En MySQL: ON DUPLICATE KEY UPDATE, con fecha_actualizacion asignada antes que los valores
+            sql = str(bulk.upsert_statement(
+                'mysql', PronosticoDiario.__table__, [dict(filas[0], id='x')], ['paso_id', 'fecha_pronostico'],
+                ['temp_max'], 'fecha_actualizacion'
+            ).compile(dialect=mysql.dialect()))
+            self.assertIn('ON DUPLICATE KEY UPDATE fecha_actualizacion = CASE WHEN', sql)
+            self.assertIn('<=>', sql)
+
+    def test_weather_cache_serves_fresh_stale_and_on_error_and_survives_restart(self):
+        from utils.weather_cache import WeatherCache, weather_cache_key, FRESCO, VIEJO, VIEJO_POR_ERROR, DESCARGADO
+
+        ahora = [1000.0]
+        pendientes = []
+        llamadas = []
+
+        def nueva_cache():
+            return WeatherCache(self.cache_dir, ttl=600, stale=600, stale_if_error=3600,
+                                clock=lambda: ahora[0], run_async=pendientes.append)
+
+        def loader(valor):
+            def cargar():
+                llamadas.append(valor)
+                return {"list": [], "v": valor}
+            return cargar
+
+        def falla():
+            llamadas.append('error')
+            raise ConnectionError("proveedor caído")
+
+        key = weather_cache_key(-32.825, -70.025)
+        self.assertEqual(key, weather_cache_key(-32.825, -70.025, 'metric', 'es'))
+        self.assertNotEqual(key, weather_cache_key(-32.825, -70.025, 'imperial', 'es'))
+
+        cache = nueva_cache()
+        self.assertEqual(cache.get_or_fetch(key, loader(1)), ({"list": [], "v": 1}, DESCARGADO))
+        self.assertEqual(cache.get_or_fetch(key, loader(2)), ({"list": [], "v": 1}, FRESCO))
+
+        # Reinicio: una instancia nueva encuentra la copia en disco
+        cache = nueva_cache()
+        ahora[0] += 300
+        self.assertEqual(cache.get_or_fetch(key, loader(2)), ({"list": [], "v": 1}, FRESCO))
+        self.assertEqual(llamadas, [1])
+
+        # Vieja: se sirve y se programa UNA revalidación aunque lleguen dos pedidos
+        ahora[0] += 400
+        self.assertEqual(cache.get_or_fetch(key, loader(2))[1], VIEJO)
+        self.assertEqual(cache.get_or_fetch(key, loader(2))[1], VIEJO)
+        self.assertEqual(len(pendientes), 1)
+        pendientes.pop()()
+        self.assertEqual(cache.get_or_fetch(key, loader(3)), ({"list": [], "v": 2}, FRESCO))
+
+        # Vencida y el proveedor falla: se sirve la última copia mientras no supere stale_if_error
+        ahora[0] += 1500
+        self.assertEqual(cache.get_or_fetch(key, falla), ({"list": [], "v": 2}, VIEJO_POR_ERROR))
+        ahora[0] += 3000
+        self.assertRaises(ConnectionError, cache.get_or_fetch, key, falla)
+        self.assertEqual(llamadas, [1, 2, 'error', 'error'])
+
+        stats = cache.stats()
+        # Contadores de la instancia creada en el "reinicio"
+        self.assertEqual((stats["memory_hits"], stats["disk_hits"], stats["stale_served"]), (1, 1, 2))
+        self.assertEqual((stats["stale_on_error"], stats["misses"], stats["revalidations"]), (1, 2, 1))
+        self.assertEqual((stats["upstream_calls"], stats["upstream_errors"]), (3, 2))
+        self.assertEqual(stats["upstream_calls_saved"], 5)
+        self.assertEqual(stats["hit_ratio"], round(5 / 7, 4))
+
+    def test_manual_refresh_reuses_cached_provider_response(self):
+        from unittest import mock
+        import requests
+        from models.paso_models import Paso
+        from routes.clima_routes import _actualizar_pronostico, actualizar_automatico
+
+        payload = self.payload()
+        llamadas = []
+
+        class Respuesta:
+            def raise_for_status(self):
+                pass
+
+            def json(self):
+                return payload
+
+        def fake_get(session, url, timeout, params):
+            llamadas.append((params['lat'], params['lon'], params['units'], params['lang']))
+            return Respuesta()
+
+        with self.app.app_context():
+            paso = Paso(nombre="Cristo Redentor", latitud=-32.8322, longitud=-70.0450)
+            db.session.add(paso)
+            db.session.commit()
+
+            with mock.patch.object(requests.Session, 'get', autospec=True, side_effect=fake_get):
+                actualizar_automatico()
+                resultado = _actualizar_pronostico(paso.id)
+                # Reinicio de la app: la caché en memoria se pierde, la de disco no
+                app.extensions.pop('weather_cache', None)
+                _actualizar_pronostico(paso.id)
+
+            self.assertEqual(len(llamadas), 1)
+            self.assertEqual(len(resultado["dias_actualizados"]), 3)
+
+    def test_circuit_breaker_opens_backs_off_and_probes_once(self):
+        from utils.circuit_breaker import CircuitBreaker, CircuitOpenError, CERRADO, ABIERTO, SEMIABIERTO
+
+        ahora = [0.0]
+        breaker = CircuitBreaker('openweather', failure_threshold=2, base_delay=10, max_delay=25, jitter=0.5,
+                                 clock=lambda: ahora[0], rng=lambda: 0.0)
+
+        def falla():
+            raise ConnectionError("caído")
+
+        self.assertRaises(ConnectionError, breaker.call, falla)
+        self.assertEqual(breaker.call(lambda: 'ok'), 'ok')  # Un éxito reinicia los fallos seguidos
+        self.assertRaises(ConnectionError, breaker.call, falla)
+        self.assertRaises(ConnectionError, breaker.call, falla)
+        self.assertEqual(breaker.state, ABIERTO)
+
+        llamadas = []
+        self.assertRaises(CircuitOpenError, breaker.call, llamadas.append, 1)
+        self.assertEqual(llamadas, [])
+
+        # Vence la espera: una sola prueba (half-open); falla y la espera se duplica
+        ahora[0] = 10
+        bloqueado = []
+
+        def prueba_que_falla():
+            self.assertEqual(breaker.state, SEMIABIERTO)
+            try:
+                breaker.call(llamadas.append, 2)
+            except CircuitOpenError:
+                bloqueado.append(True)
+            raise ConnectionError("sigue caído")
+
+        self.assertRaises(ConnectionError, breaker.call, prueba_que_falla)
+        self.assertEqual((bloqueado, llamadas), ([True], []))
+        self.assertEqual(breaker.stats()['retry_in_seconds'], 20)
+        ahora[0] = 29
+        self.assertRaises(CircuitOpenError, breaker.call, llamadas.append, 3)
+
+        # Tope de la espera y jitter: rng=1 descuenta la mitad
+        breaker._rng = lambda: 1.0
+        ahora[0] = 30
+        self.assertRaises(ConnectionError, breaker.call, falla)
+        self.assertEqual(breaker.stats()['retry_in_seconds'], 12.5)
+
+        ahora[0] = 43
+        self.assertEqual(breaker.call(lambda: 'ok'), 'ok')
+        stats = breaker.stats()
+        self.assertEqual((stats['state'], stats['consecutive_opens'], stats['opened']), (CERRADO, 0, 3))
+        self.assertEqual(stats['rejected'], 3)
+
+    def test_open_weather_circuit_serves_cached_forecast_without_calling_provider(self):
+        from unittest import mock
+        import requests
+        from models.paso_models import Paso
+        from routes.clima_routes import actualizar_automatico
+        from utils.circuit_breaker import breakers, ABIERTO, BREAKER_FAILURE_THRESHOLD
+        from utils.weather_client import WEATHER_BREAKER
+
+        payload = self.payload()
+        llamadas = []
+        caido = [False]
+
+        class Respuesta:
+            def raise_for_status(self):
+                pass
+
+            def json(self):
+                return payload
+
+        def fake_get(session, url, timeout, params):
+            llamadas.append(params['lat'])
+            if caido[0]:
+                raise requests.exceptions.ConnectionError("timeout")
+            return Respuesta()
+
+        app.config['WEATHER_CACHE_TTL'] = 0
+        app.config['WEATHER_CACHE_STALE'] = 0
+        try:
+            with self.app.app_context():
+                db.session.add(Paso(nombre="Cristo Redentor", latitud=-32.8322, longitud=-70.0450))
+                db.session.commit()
+                with mock.patch.object(requests.Session, 'get', autospec=True, side_effect=fake_get):
+                    actualizar_automatico()
+                    caido[0] = True
+                    for _ in range(BREAKER_FAILURE_THRESHOLD):
+                        resultados = actualizar_automatico()
+                    self.assertEqual(breakers.get(WEATHER_BREAKER).state, ABIERTO)
+                    llamadas.clear()
+                    resultados = actualizar_automatico()
+
+                self.assertEqual(llamadas, [])
+                # La caché sirve la última respuesta buena (stale-if-error)
+                self.assertEqual([len(r["dias_actualizados"]) for r in resultados.values()], [3])
+                self.assertEqual(breakers.stats()[WEATHER_BREAKER]['rejected'], 1)
+        finally:
+            app.config.pop('WEATHER_CACHE_TTL', None)
+            app.config.pop('WEATHER_CACHE_STALE', None)
+
+    def test_manual_refresh_is_queued_and_coalesced_per_pass(self):
+        import threading
+        from unittest import mock
+        from models.paso_models import Paso
+        from utils.refresh_jobs import get_refresh_jobs
+
+        headers = self.register_user('refresco_admin', 'refresco_admin@test.com', role='admin')
+        with self.app.app_context():
+            paso = Paso(nombre="Cristo Redentor", latitud=-32.8322, longitud=-70.0450)
+            db.session.add(paso)
+            db.session.commit()
+            paso_id = paso.id
+
+        liberar = threading.Event()
+        llamadas = []
+
+        def refresco_lento(pid):
+            llamadas.append(pid)
+            liberar.wait(5)
+            return {"message": "Pronóstico actualizado para 3 días.", "dias_actualizados": []}
+
+        with mock.patch('routes.clima_routes._actualizar_pronostico', side_effect=refresco_lento):
+            respuestas = [self.client.post(f'/api/clima/actualizar/{paso_id}', headers=headers) for _ in range(3)]
+            self.assertEqual([r.status_code for r in respuestas], [202] * 3)
+            self.assertEqual(len({r.json['id'] for r in respuestas}), 1)
+            self.assertEqual([r.json['nuevo'] for r in respuestas], [True, False, False])
+            job_id = respuestas[0].json['id']
+            self.assertEqual(respuestas[0].headers['Location'], f'/api/clima/actualizar/jobs/{job_id}')
+
+            estado = self.client.get(f'/api/clima/actualizar/jobs/{job_id}', headers=headers)
+            self.assertIn(estado.json['estado'], ('pendiente', 'en_curso'))
+            self.assertEqual(estado.json['solicitudes'], 3)
+
+            liberar.set()
+            with self.app.app_context():
+                get_refresh_jobs().wait(job_id, timeout=5)
+
+            estado = self.client.get(f'/api/clima/actualizar/jobs/{job_id}', headers=headers)
+            self.assertEqual(estado.json['estado'], 'completado')
+            self.assertEqual(estado.json['resultado']['message'], "Pronóstico actualizado para 3 días.")
+            self.assertEqual(llamadas, [paso_id])
+
+            # Terminado el job, un pedido nuevo crea otro
+            otra = self.client.post(f'/api/clima/actualizar/{paso_id}', headers=headers)
+            self.assertNotEqual(otra.json['id'], job_id)
+            with self.app.app_context():
+                get_refresh_jobs().wait(otra.json['id'], timeout=5)
+
+        self.assertEqual(self.client.post('/api/clima/actualizar/no-existe', headers=headers).status_code, 404)
+        self.assertEqual(self.client.get('/api/clima/actualizar/jobs/no-existe', headers=headers).status_code, 404)
+        stats = self.client.get('/api/monitoring/refresh_jobs', headers=headers).json
+        self.assertEqual((stats['en_vuelo'], stats['solicitudes_sumadas']), (0, 2))
+
+    def test_scheduled_refresh_downloads_every_run_and_manual_refresh_reuses_it(self):
+        from utils.weather_cache import (
+            WeatherCache, weather_cache_key, FRESCO, DESCARGADO, VIEJO_POR_ERROR, WEATHER_CACHE_TTL
+        )
+
+        ahora = [0.0]
+        version = [0]
+        caido = [False]
+        intervalo_job = 10 * 60
+        cache = WeatherCache(self.cache_dir, clock=lambda: ahora[0], run_async=lambda fn: fn())
+        key = weather_cache_key(-32.825, -70.025)
+
+        def loader():
+            if caido[0]:
+                raise ConnectionError("proveedor caído")
+            ahora[0] += 2  # Latencia de la descarga: la copia se guarda después del pedido
+            version[0] += 1
+            return {"list": [], "v": version[0]}
+
+        # Cada corrida del job (cada 10 minutos) guarda datos nuevos, aunque la copia siga vigente
+        for corrida in range(1, 5):
+            self.assertEqual(cache.get_or_fetch(key, loader, refresh=True), ({"list": [], "v": corrida}, DESCARGADO))
+            # Un refresco manual entre corridas usa la copia del job
+            ahora[0] += WEATHER_CACHE_TTL / 2
+            self.assertEqual(cache.get_or_fetch(key, loader), ({"list": [], "v": corrida}, FRESCO))
+            ahora[0] += intervalo_job - WEATHER_CACHE_TTL / 2 - 2
+
+        caido[0] = True
+        self.assertEqual(cache.get_or_fetch(key, loader, refresh=True), ({"list": [], "v": 4}, VIEJO_POR_ERROR))
+        stats = cache.stats()
+        self.assertEqual((stats["forced_refreshes"], stats["memory_hits"], stats["upstream_calls"]), (5, 4, 5))
+
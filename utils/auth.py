@@ -1,8 +1,52 @@
 from functools import wraps
 from flask import request, jsonify, current_app
-from models.users_models import User
+from utils.principals import get_principal
+from datetime import datetime, timedelta
 import jwt
 
+# Token del canal SSE: EventSource no permite enviar headers, así que viaja en la query string
+# (queda en logs de acceso y de proxies). Por eso no es el JWT de login: solo sirve para abrir
+# /api/messages/stream y vence enseguida (el stream ya abierto sigue; al reconectar se pide otro).
+# Se configura con STREAM_TOKEN_TTL_SECONDS.
+STREAM_TOKEN_SCOPE = 'messages:stream'
+STREAM_TOKEN_TTL_SECONDS = 60
+
+
+def issue_stream_token(user_id):
+    """JWT de corta duración que solo abre el stream de mensajes del usuario. Devuelve (token, segundos)."""
+    ttl = current_app.config.get('STREAM_TOKEN_TTL_SECONDS', STREAM_TOKEN_TTL_SECONDS)
+    token = jwt.encode({
+        'id': str(user_id),
+        'scope': STREAM_TOKEN_SCOPE,
+        'exp': datetime.utcnow() + timedelta(seconds=ttl)
+    }, current_app.config['SECRET_KEY'], algorithm="HS256")
+    return token, ttl
+
+
+def stream_token_required(f):
+    """Como token_required, pero para el stream SSE: acepta solo el token de issue_stream_token en ?token=."""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        token = request.args.get('token')
+        if not token:
+            return jsonify({'message': 'Token de stream requerido.'}), 401
+        try:
+            data = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=["HS256"])
+        except jwt.ExpiredSignatureError:
+            return jsonify({'message': 'Token de stream expirado.'}), 401
+        except jwt.InvalidTokenError:
+            return jsonify({'message': 'Token de stream inválido.'}), 401
+        if data.get('scope') != STREAM_TOKEN_SCOPE:
+            return jsonify({'message': 'Token de stream inválido.'}), 401
+
+        current_user = get_principal(data.get('id'))
+        if not current_user:
+            return jsonify({'message': 'Usuario no encontrado.'}), 401
+        return f(current_user, *args, **kwargs)
+
+    return decorated
+
+
 def token_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
@@ -20,9 +64,12 @@ def token_required(f):
         try:
             data = jwt.decode(token, 'supersecreto123', algorithms=["HS256"])
             print(f"🟢 DEBUG PAYLOAD: {data}")
+            if 'scope' in data:
+                # Los tokens con alcance (p. ej. el del stream) no sirven como token de sesión
+                raise jwt.InvalidTokenError("Token con alcance restringido")
 
             user_id = data.get('id') or data.get('user_id')
-            current_user = User.query.get(user_id)
+            current_user = get_principal(user_id)
 
             if not current_user:
                 print(f"❌ Usuario con ID {user_id} no encontrado en la BD.")
@@ -0,0 +1,72 @@
+from sqlalchemy import case, func, or_, tuple_
+from models.db import db
+
+# Filas por sentencia INSERT ... ON CONFLICT / ON DUPLICATE KEY (limita el tamaño del paquete SQL)
+UPSERT_BATCH_SIZE = 500
+
+
+def upsert(model, rows, key_columns, update_columns, touched_column=None, batch_size=UPSERT_BATCH_SIZE):
+    """
+    Inserta o actualiza `rows` (lista de dicts con todas las columnas) en una sentencia por lote,
+    usando el upsert nativo del motor sobre la restricción única de `key_columns`:
+    MySQL: INSERT ... ON DUPLICATE KEY UPDATE; SQLite/PostgreSQL: INSERT ... ON CONFLICT DO UPDATE.
+    `touched_column` (opcional) toma NOW() solo en las filas cuyos valores cambiaron.
+    Con otros motores carga las filas existentes en una consulta y actualiza el resto por ORM.
+    Se ejecuta en la sesión actual: el commit lo hace quien llama. Devuelve la cantidad de sentencias.
+    """
+    if not rows:
+        return 0
+    dialect = db.session.get_bind().dialect.name
+    if dialect not in ('mysql', 'sqlite', 'postgresql'):
+        return _upsert_orm(model, rows, key_columns, update_columns)
+
+    statements = 0
+    for start in range(0, len(rows), batch_size):
+        db.session.execute(upsert_statement(
+            dialect, model.__table__, rows[start:start + batch_size], key_columns, update_columns, touched_column
+        ))
+        statements += 1
+    return statements
+
+
+def upsert_statement(dialect, table, rows, key_columns, update_columns, touched_column=None):
+    """Sentencia INSERT ... ON DUPLICATE KEY UPDATE / ON CONFLICT DO UPDATE para un lote de filas."""
+    if dialect == 'mysql':
+        from sqlalchemy.dialects.mysql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        from sqlalchemy.dialects.postgresql import insert
+
+    stmt = insert(table).values(rows)
+    incoming = stmt.inserted if dialect == 'mysql' else stmt.excluded
+
+    assignments = []
+    if touched_column is not None:
+        # Comparación null-safe (<=> en MySQL, IS NOT en SQLite, IS DISTINCT FROM en PostgreSQL)
+        changed = or_(*(incoming[c].is_distinct_from(table.c[c]) for c in update_columns))
+        # Va primero: MySQL evalúa las asignaciones en orden y las siguientes ya verían el valor nuevo
+        assignments.append((touched_column, case((changed, func.now()), else_=table.c[touched_column])))
+    assignments.extend((c, incoming[c]) for c in update_columns)
+
+    if dialect == 'mysql':
+        return stmt.on_duplicate_key_update(assignments)
+    return stmt.on_conflict_do_update(index_elements=key_columns, set_=dict(assignments))
+
+
+def _upsert_orm(model, rows, key_columns, update_columns):
+    """Alternativa portable: una consulta para las filas existentes, luego update/insert por ORM."""
+    key = lambda values: tuple(values[c] for c in key_columns)
+    columns = [getattr(model, c) for c in key_columns]
+    existing = {
+        key({c: getattr(obj, c) for c in key_columns}): obj
+        for obj in model.query.filter(tuple_(*columns).in_([key(row) for row in rows]))
+    }
+    for row in rows:
+        obj = existing.get(key(row))
+        if obj is None:
+            db.session.add(model(**row))
+        else:
+            for c in update_columns:
+                setattr(obj, c, row[c])
+    return 1
@@ -0,0 +1,153 @@
+import random
+import threading
+import time
+
+# Fallos seguidos que abren el circuito de un proveedor
+BREAKER_FAILURE_THRESHOLD = 3
+# Primera espera con el circuito abierto (segundos); se duplica cada vez que la prueba en half-open falla
+BREAKER_BASE_DELAY = 30
+BREAKER_MAX_DELAY = 15 * 60
+# Fracción de la espera que se sortea (jitter): los workers no vuelven a probar todos a la vez
+BREAKER_JITTER = 0.2
+
+CERRADO = 'closed'
+ABIERTO = 'open'
+SEMIABIERTO = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """El circuito del proveedor está abierto: la llamada se rechaza sin tocar la red."""
+
+    def __init__(self, name, retry_in):
+        super().__init__(f"Circuito abierto para {name}: se reintenta en {retry_in:.0f} s")
+        self.name = name
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker de un proveedor (closed / open / half-open).
+
+    - closed: las llamadas pasan; `failure_threshold` fallos seguidos abren el circuito.
+    - open: las llamadas fallan al instante con CircuitOpenError (sin ocupar un hilo durante el timeout)
+      hasta que vence la espera: base_delay * 2^(aperturas seguidas - 1), con tope y jitter.
+    - half-open: una sola llamada de prueba pasa (las demás siguen fallando al instante);
+      si funciona el circuito se cierra, si no se vuelve a abrir con el doble de espera.
+    """
+
+    def __init__(self, name, failure_threshold=BREAKER_FAILURE_THRESHOLD, base_delay=BREAKER_BASE_DELAY,
+                 max_delay=BREAKER_MAX_DELAY, jitter=BREAKER_JITTER, clock=time.monotonic, rng=random.random):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self._clock = clock
+        self._rng = rng
+        self._lock = threading.Lock()
+        self.state = CERRADO
+        self.failures = 0          # Fallos seguidos con el circuito cerrado
+        self.consecutive_opens = 0  # Aperturas seguidas (exponente del backoff)
+        self.open_until = 0.0
+        self._probe_in_flight = False
+        self.last_error = None
+        self.counters = {"calls": 0, "successes": 0, "failures": 0, "rejected": 0, "opened": 0}
+
+    def _delay(self):
+        delay = min(self.max_delay, self.base_delay * 2 ** (self.consecutive_opens - 1))
+        return delay * (1 - self.jitter * self._rng())
+
+    def _open(self):
+        """Requiere self._lock."""
+        self.consecutive_opens += 1
+        self.state = ABIERTO
+        self.open_until = self._clock() + self._delay()
+        self.counters["opened"] += 1
+
+    def _before_call(self):
+        with self._lock:
+            if self.state == ABIERTO:
+                if self._clock() < self.open_until:
+                    self.counters["rejected"] += 1
+                    raise CircuitOpenError(self.name, self.open_until - self._clock())
+                self.state = SEMIABIERTO
+                self._probe_in_flight = False
+            if self.state == SEMIABIERTO:
+                if self._probe_in_flight:
+                    self.counters["rejected"] += 1
+                    raise CircuitOpenError(self.name, 0)
+                self._probe_in_flight = True
+            self.counters["calls"] += 1
+
+    def _on_success(self):
+        with self._lock:
+            self.counters["successes"] += 1
+            self.state = CERRADO
+            self.failures = 0
+            self.consecutive_opens = 0
+            self._probe_in_flight = False
+
+    def _on_failure(self, error):
+        with self._lock:
+            self.counters["failures"] += 1
+            self.last_error = str(error)
+            if self.state == SEMIABIERTO:
+                self._probe_in_flight = False
+                self._open()
+            elif self.state == CERRADO:
+                self.failures += 1
+                if self.failures >= self.failure_threshold:
+                    self.failures = 0
+                    self._open()
+
+    def call(self, fn, *args, **kwargs):
+        """Ejecuta fn a través del circuito; lanza CircuitOpenError si está abierto."""
+        self._before_call()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            self._on_failure(e)
+            raise
+        self._on_success()
+        return result
+
+    def stats(self):
+        """Estado actual para el endpoint de monitoreo."""
+        with self._lock:
+            return dict(
+                self.counters,
+                state=self.state,
+                consecutive_failures=self.failures,
+                consecutive_opens=self.consecutive_opens,
+                retry_in_seconds=round(max(0.0, self.open_until - self._clock()), 1) if self.state == ABIERTO else 0,
+                last_error=self.last_error,
+            )
+
+
+class BreakerRegistry:
+    """Un CircuitBreaker por proveedor (clave: 'openweather' o el host de cada página scrapeada)."""
+
+    def __init__(self, **defaults):
+        self.defaults = defaults
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        with self._lock:
+            breaker = self._breakers.get(name)
+            if breaker is None:
+                breaker = self._breakers[name] = CircuitBreaker(name, **self.defaults)
+            return breaker
+
+    def reset(self):
+        with self._lock:
+            self._breakers.clear()
+
+    def stats(self):
+        with self._lock:
+            breakers = list(self._breakers.values())
+        return {breaker.name: breaker.stats() for breaker in breakers}
+
+
+# Circuitos compartidos por el job de clima, el de pasos y los refrescos manuales
+breakers = BreakerRegistry()
@@ -0,0 +1,125 @@
+import json
+import threading
+import time
+from collections import deque
+from flask import current_app
+
+# Eventos que se conservan para reanudar conexiones SSE con Last-Event-ID
+EVENT_BUFFER_SIZE = 1000
+
+
+class LocalEventBackend:
+    """
+    Backend en memoria del proceso (un solo worker o tests).
+    Guarda los últimos eventos en un buffer circular con ids enteros crecientes.
+    """
+
+    def __init__(self, buffer_size=EVENT_BUFFER_SIZE):
+        self._events = deque(maxlen=buffer_size)
+        self._last_id = 0
+        self._cond = threading.Condition()
+
+    def publish(self, event):
+        with self._cond:
+            self._last_id += 1
+            event = dict(event, id=str(self._last_id))
+            self._events.append(event)
+            self._cond.notify_all()
+            return event['id']
+
+    def latest_id(self):
+        with self._cond:
+            return str(self._last_id)
+
+    def read(self, after_id, timeout):
+        """Eventos con id > after_id; bloquea hasta timeout segundos si no hay ninguno."""
+        with self._cond:
+            try:
+                after = int(after_id)
+            except (TypeError, ValueError):
+                after = self._last_id
+            if after > self._last_id:
+                # Id de otra ejecución del proceso (reinicio): se entrega lo que haya en el buffer
+                after = 0
+            if self._last_id <= after:
+                self._cond.wait(timeout)
+            events = [e for e in self._events if int(e['id']) > after]
+            return events, (events[-1]['id'] if events else str(after))
+
+
+class RedisEventBackend:
+    """
+    Backend compartido entre procesos sobre un Redis Stream (XADD / XREAD BLOCK).
+    Los ids del stream sirven directamente como Last-Event-ID.
+    """
+
+    def __init__(self, url, stream_key='openfrontier:events', buffer_size=EVENT_BUFFER_SIZE):
+        import redis  # Dependencia opcional: solo se necesita con EVENTS_BACKEND_URL=redis://...
+        self._redis = redis.Redis.from_url(url, decode_responses=True)
+        self._key = stream_key
+        self._maxlen = buffer_size
+
+    def publish(self, event):
+        return self._redis.xadd(self._key, {'event': json.dumps(event)},
+                                maxlen=self._maxlen, approximate=True)
+
+    def latest_id(self):
+        last = self._redis.xrevrange(self._key, count=1)
+        return last[0][0] if last else '0-0'
+
+    def read(self, after_id, timeout):
+        after_id = after_id or self.latest_id()
+        result = self._redis.xread({self._key: after_id}, block=int(timeout * 1000), count=100)
+        events = []
+        for _stream, entries in result or []:
+            for entry_id, fields in entries:
+                events.append(dict(json.loads(fields['event']), id=entry_id))
+        return events, (events[-1]['id'] if events else after_id)
+
+
+class EventHub:
+    """Pub/sub de notificaciones: las rutas de escritura publican y el endpoint SSE consume."""
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def publish(self, event_type, data, recipient_id=None, recipient_group=None):
+        """
+        Publica un evento. Sin recipient_id ni recipient_group es un broadcast (alertas);
+        recipient_group='admins' llega a todos los administradores.
+        """
+        return self.backend.publish({
+            'type': event_type,
+            'recipient_id': recipient_id,
+            'recipient_group': recipient_group,
+            'data': data,
+            'published_at': time.time()
+        })
+
+    def latest_id(self):
+        return self.backend.latest_id()
+
+    def read(self, after_id, timeout):
+        return self.backend.read(after_id, timeout)
+
+
+def get_event_hub():
+    """Hub de la aplicación actual (se crea la primera vez según EVENTS_BACKEND_URL)."""
+    app = current_app._get_current_object()
+    hub = app.extensions.get('event_hub')
+    if hub is None:
+        url = app.config.get('EVENTS_BACKEND_URL')
+        backend = RedisEventBackend(url) if url else LocalEventBackend()
+        hub = app.extensions.setdefault('event_hub', EventHub(backend))
+    return hub
+
+
+def event_visible_for(event, user_id, role, notifications_enabled):
+    """Misma regla que el buzón: las alertas llegan a todos, el resto solo con notificaciones activas."""
+    if not event.get('recipient_id') and not event.get('recipient_group'):
+        return True
+    if not notifications_enabled:
+        return False
+    if event.get('recipient_id') == user_id:
+        return True
+    return event.get('recipient_group') == 'admins' and role == 'admin'
@@ -0,0 +1,165 @@
+import hashlib
+import threading
+import time
+from datetime import timezone
+from flask import current_app, request
+from utils.cache import TTLCache
+
+# Tiempo que una respuesta cacheada se sirve sin volver a la BD (segundos).
+# Los jobs invalidan la entrada al hacer commit; el TTL es solo un límite de seguridad
+# (por ejemplo, si varios workers comparten la BD y solo uno corre el scheduler).
+RESPONSE_CACHE_TTL = 300
+RESPONSE_CACHE_MAXSIZE = 512
+
+# Cache-Control de las respuestas públicas: el navegador/CDN las reutiliza 60 s
+# y durante 10 minutos más puede servir la copia vieja mientras revalida en segundo plano
+PUBLIC_MAX_AGE = 60
+PUBLIC_STALE_WHILE_REVALIDATE = 600
+
+
+class CachedResponse:
+    """Respuesta ya serializada: cuerpo JSON, status y validadores (ETag / Last-Modified)."""
+
+    __slots__ = ('payload', 'body', 'status', 'etag', 'last_modified')
+
+    def __init__(self, payload, body, status, etag, last_modified):
+        self.payload = payload
+        self.body = body
+        self.status = status
+        self.etag = etag
+        self.last_modified = last_modified
+
+
+class _Flight:
+    """Construcción en curso de una clave: los pedidos concurrentes esperan su resultado."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.entry = None
+        self.error = None
+
+
+class ResponseCache:
+    """
+    Caché de respuestas en memoria con coalescencia de fallos (single-flight):
+    si N pedidos encuentran la caché fría a la vez, solo uno consulta la BD y el resto espera su resultado.
+    invalidate() descarta la entrada y también el resultado de una construcción en curso,
+    que pudo haber leído la BD antes del commit del job.
+    """
+
+    def __init__(self, maxsize=RESPONSE_CACHE_MAXSIZE, ttl=RESPONSE_CACHE_TTL, clock=time.monotonic):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl, clock=clock)
+        self._lock = threading.Lock()
+        self._inflight = {}     # clave -> _Flight
+        self._generation = 0    # aumenta con cada invalidación
+        self.builds = 0
+        self.coalesced = 0
+
+    def get_or_build(self, key, build, ttl=None):
+        """
+        Devuelve el CachedResponse de `key`; en un fallo llama a build() -> (payload, status, last_modified).
+        """
+        entry = self._cache.get(key)
+        if entry is not None:
+            return entry
+
+        with self._lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+                generation = self._generation
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.entry
+
+        try:
+            payload, status, last_modified = build()
+            flight.entry = make_entry(payload, status, last_modified)
+            with self._lock:
+                self.builds += 1
+                if generation == self._generation:
+                    self._cache.set(key, flight.entry, ttl)
+            return flight.entry
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.done.set()
+
+    def put(self, key, payload, status=200, last_modified=None, ttl=None):
+        """
+        Publica una respuesta ya armada (la construye quien actualiza los datos, no el pedido).
+        Una construcción en curso que leyó la BD antes no la pisa.
+        """
+        entry = make_entry(payload, status, last_modified)
+        with self._lock:
+            self._generation += 1
+            self._cache.set(key, entry, ttl)
+        return entry
+
+    def invalidate(self, *keys):
+        with self._lock:
+            self._generation += 1
+            for key in keys:
+                self._cache.invalidate(key)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._cache.clear()
+
+    def stats(self):
+        """Resumen de uso para el endpoint de monitoreo."""
+        stats = self._cache.stats()
+        stats["builds"] = self.builds
+        stats["coalesced"] = self.coalesced
+        stats["in_flight"] = len(self._inflight)
+        return stats
+
+
+def make_entry(payload, status, last_modified=None):
+    """Serializa el payload una sola vez y deriva el ETag del cuerpo."""
+    body = current_app.json.dumps(payload).encode('utf-8') + b'\n'
+    etag = hashlib.sha1(body).hexdigest()
+    if last_modified is not None and last_modified.tzinfo is None:
+        # Las fechas de la BD (func.now()) se guardan sin zona: se interpretan como UTC
+        last_modified = last_modified.replace(tzinfo=timezone.utc)
+    return CachedResponse(payload, body, status, etag, last_modified)
+
+
+def cached_json_response(entry, extra=None):
+    """
+    Arma la respuesta HTTP desde una entrada cacheada.
+    Las respuestas 200 llevan ETag, Last-Modified y Cache-Control público con stale-while-revalidate,
+    y se convierten en 304 si el pedido trae If-None-Match / If-Modified-Since todavía válidos.
+    `extra` agrega campos por respuesta que no forman parte del validador (el ETag es débil en ese caso).
+    """
+    body = entry.body
+    if extra:
+        body = current_app.json.dumps(dict(entry.payload, **extra)).encode('utf-8') + b'\n'
+
+    response = current_app.response_class(body, status=entry.status, mimetype='application/json')
+    if entry.status != 200:
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+
+    response.set_etag(entry.etag, weak=bool(extra))
+    if entry.last_modified is not None:
+        response.last_modified = entry.last_modified
+    response.headers['Cache-Control'] = (
+        f"public, max-age={PUBLIC_MAX_AGE}, "
+        f"stale-while-revalidate={PUBLIC_STALE_WHILE_REVALIDATE}"
+    )
+    return response.make_conditional(request)
+
+
+# Caché compartida por los endpoints públicos de estado (/paso/public_api, /api/clima/pronostico/<id>)
+response_cache = ResponseCache()
@@ -0,0 +1,65 @@
+import base64
+import json
+from sqlalchemy import and_, or_, select, func, text
+from models.db import db
+
+# Máximo de filas que se cuentan al estimar un total con filtros (más allá se informa "al menos N")
+ESTIMATE_COUNT_CAP = 1000
+
+
+class InvalidCursor(ValueError):
+    """El cursor recibido no se puede decodificar o no corresponde a la consulta."""
+
+
+def encode_cursor(data):
+    """Convierte un dict en un cursor opaco (base64 url-safe de un JSON compacto)."""
+    raw = json.dumps(data, separators=(',', ':'), default=str).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Operación inversa de encode_cursor. Lanza InvalidCursor si el formato no es válido."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(str(e))
+    if not isinstance(data, dict):
+        raise InvalidCursor("El cursor no es un objeto")
+    return data
+
+
+def keyset_after(column, id_column, value, last_id, descending=False):
+    """
+    Condición de keyset para (column, id): filas estrictamente después de (value, last_id).
+    Se expande como OR/AND en lugar de tuple_() para que funcione igual en SQLite y MySQL.
+    """
+    if descending:
+        return or_(column < value, and_(column == value, id_column < last_id))
+    return or_(column > value, and_(column == value, id_column > last_id))
+
+
+def estimate_count(query, table_name, filtered):
+    """
+    Total aproximado sin un COUNT(*) completo.
+    - Sin filtros: usa las estadísticas de la tabla (MySQL) o MAX(rowid) (SQLite).
+    - Con filtros: cuenta como máximo ESTIMATE_COUNT_CAP filas.
+    Devuelve (total, es_cota_inferior).
+    """
+    dialect = db.engine.dialect.name
+
+    if not filtered:
+        if dialect == 'mysql':
+            total = db.session.execute(text(
+                "SELECT TABLE_ROWS FROM information_schema.TABLES "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :t"
+            ), {'t': table_name}).scalar()
+            if total is not None:
+                return int(total), False
+        elif dialect == 'sqlite':
+            total = db.session.execute(text(f'SELECT MAX(rowid) FROM "{table_name}"')).scalar()
+            return int(total or 0), False
+
+    limited = query.order_by(None).limit(ESTIMATE_COUNT_CAP).subquery()
+    total = db.session.execute(select(func.count()).select_from(limited)).scalar()
+    return total, total >= ESTIMATE_COUNT_CAP
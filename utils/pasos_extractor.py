@@ -0,0 +1,316 @@
+import re
+from html.parser import HTMLParser
+
+# PATRÓN REGULAR PARA EL HORARIO (ej: 0900 HS A 2100 HS) y búsquedas de la página, compilados una sola vez
+HORARIO_RE = re.compile(r'(\d{4}\s*HS\s*A\s*\d{4}\s*HS)', re.IGNORECASE)
+ESTADO_CLASS_RE = re.compile(r"label-(success|warning|danger)", re.IGNORECASE)
+HORARIO_LABEL_RE = re.compile(r"Horarios de atención:", re.IGNORECASE)
+
+# Elementos vacíos de HTML: se cierran solos (como en el árbol de BeautifulSoup)
+VOID_ELEMENTS = frozenset((
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'keygen', 'link', 'menuitem', 'meta',
+    'param', 'source', 'track', 'wbr', 'basefont', 'bgsound', 'command', 'frame', 'image', 'isindex',
+    'nextid', 'spacer',
+))
+
+# Tamaño de los trozos que se le pasan al tokenizer (permite cortar apenas se encontró todo)
+CHUNK_SIZE = 8192
+
+_TAG = object()  # Hermano siguiente que es una etiqueta (no texto)
+
+
+def _resultado(estado, tiempo_nodo, horario_encontrado, texto_despues_del_strong):
+    """Mismas reglas que la versión con BeautifulSoup, a partir de lo que encontró cada extractor."""
+    if estado is None:
+        estado = "Estado no encontrado"
+        tiempo_actualizacion = "No se pudo determinar el tiempo"
+    elif tiempo_nodo is _TAG:
+        # BeautifulSoup falla al hacer .strip() sobre una etiqueta: se reproduce el error
+        raise TypeError("El nodo adyacente al estado es una etiqueta, no texto")
+    elif tiempo_nodo and tiempo_nodo.strip():
+        tiempo_actualizacion = tiempo_nodo.strip()
+    else:
+        tiempo_actualizacion = "Tiempo no visible en el nodo adyacente"
+
+    if not horario_encontrado:
+        horario_atencion = "Etiqueta 'Horarios de atención:' no encontrada"
+    elif texto_despues_del_strong is _TAG:
+        raise TypeError("El nodo adyacente al horario es una etiqueta, no texto")
+    elif texto_despues_del_strong:
+        match_horario = HORARIO_RE.search(texto_despues_del_strong)
+        horario_atencion = match_horario.group(1).strip() if match_horario else "Patrón de hora no encontrado"
+    else:
+        horario_atencion = "No se encontró texto adyacente"
+
+    return {"estado": estado, "actualizado": tiempo_actualizacion, "horario_atencion": horario_atencion}
+
+
+def extraer_estado_bs4(html):
+    """
+    Extracción de referencia con el árbol completo de BeautifulSoup (la implementación original).
+    Se mantiene para los tests de equivalencia y el benchmark.
+    """
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, "html.parser")
+
+    # Buscamos el tag que contiene el estado (ej: <span class="label label-success ...">Abierto</span>)
+    estado_tag = soup.find('span', class_=ESTADO_CLASS_RE)
+    horario_tag = soup.find('strong', string=HORARIO_LABEL_RE)
+
+    tiempo_nodo = estado_tag.next_sibling if estado_tag else None
+    if tiempo_nodo is not None and not isinstance(tiempo_nodo, str):
+        tiempo_nodo = _TAG
+    texto = horario_tag.next_sibling if horario_tag else None
+    if texto is not None and not isinstance(texto, str):
+        texto = _TAG
+
+    return _resultado(
+        estado_tag.get_text(strip=True) if estado_tag else None, tiempo_nodo, horario_tag is not None, texto
+    )
+
+
+class _Done(Exception):
+    """Se encontró todo lo necesario: se deja de tokenizar el resto de la página."""
+
+
+class _Sibling:
+    """
+    Espera el nodo que sigue a un elemento ya cerrado (su next_sibling en el árbol):
+    texto (se acumula hasta la próxima etiqueta), una etiqueta, o nada si el padre se cierra antes.
+    """
+
+    __slots__ = ('text', 'value', 'done')
+
+    def __init__(self):
+        self.text = []
+        self.value = None
+        self.done = False
+
+    def resolve(self, value=None):
+        if not self.done:
+            self.value = ''.join(self.text) if self.text else value
+            self.done = True
+
+
+class _Node:
+    """Subárbol mínimo de un <strong> candidato, para calcular su .string como BeautifulSoup."""
+
+    __slots__ = ('children', 'start')
+
+    def __init__(self, start=None):
+        self.children = []
+        self.start = start
+
+    def add_text(self, text):
+        if self.children and isinstance(self.children[-1], list):
+            self.children[-1].append(text)
+        else:
+            self.children.append([text])
+
+    def end_text(self):
+        """Cierra el nodo de texto actual: el próximo texto es un nodo aparte."""
+        if self.children and isinstance(self.children[-1], list):
+            self.children[-1] = tuple(self.children[-1])
+
+    def string(self):
+        if len(self.children) != 1:
+            return None
+        child = self.children[0]
+        if isinstance(child, (list, tuple)):
+            return ''.join(child)
+        if isinstance(child, str):
+            return child  # Comentario como único hijo
+        return child.string()
+
+
+class _EstadoParser(HTMLParser):
+    """
+    Tokenizer (el mismo html.parser que usa BeautifulSoup) que no arma el árbol:
+    solo sigue la pila de etiquetas abiertas, el primer <span class="label-*"> y los <strong> candidatos,
+    y corta apenas tiene el estado, el horario y sus nodos adyacentes.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.stack = []
+        self.starts = 0             # Orden de aparición de las etiquetas (para "el primero" del documento)
+        self.span_depth = None      # Posición en la pila del span de estado mientras está abierto
+        self.span_text = []
+        self.span_data = []         # Texto del nodo en curso dentro del span (puede llegar en varios eventos)
+        self.skip_text = 0          # Dentro de <script>/<style> del span (get_text no los incluye)
+        self.estado = None
+        self.span_sibling = None
+        self.captures = []          # (profundidad, _Node, es_strong) de los elementos abiertos dentro de un <strong>
+        self.matches = []           # (orden, _Sibling) de los <strong> que coinciden, ya cerrados
+        self.closed_voids = []      # <br>, <img>... abiertos sin "/": su cierre explícito posterior se ignora
+
+    # --------- Nodos adyacentes pendientes ---------
+
+    def _siblings(self):
+        if self.span_sibling is not None:
+            yield self.span_sibling
+        for _order, sibling in self.matches:
+            yield sibling
+
+    def _horario(self):
+        """(encontrado, nodo adyacente) del primer <strong> coincidente, o None si todavía no se puede decidir."""
+        open_strongs = [node.start for _depth, node, is_strong in self.captures if is_strong]
+        if not self.matches:
+            return None if open_strongs else (False, None)
+        order, sibling = min(self.matches, key=lambda m: m[0])
+        if any(start < order for start in open_strongs):
+            return None  # Un <strong> anterior, todavía abierto, también podría coincidir
+        return (True, sibling.value) if sibling.done else None
+
+    def _check_done(self):
+        if self.estado is not None and self.span_sibling.done:
+            horario = self._horario()
+            if horario is not None and horario[0]:
+                raise _Done()
+
+    # --------- Eventos del tokenizer ---------
+
+    def _end_data(self):
+        """Termina el nodo de texto en curso (BeautifulSoup junta los eventos de texto seguidos en un nodo)."""
+        if self.span_data:
+            stripped = ''.join(self.span_data).strip()
+            if stripped:
+                self.span_text.append(stripped)
+            self.span_data = []
+
+    def handle_starttag(self, tag, attrs):
+        self._start(tag, attrs)
+        if tag in VOID_ELEMENTS:
+            self.closed_voids.append(tag)
+        self._check_done()
+
+    def _start(self, tag, attrs):
+        self._end_data()
+        for sibling in self._siblings():
+            sibling.resolve(_TAG)
+        self.starts += 1
+
+        if self.estado is None and self.span_depth is None and tag == 'span':
+            classes = next((value for name, value in attrs if name == 'class'), None) or ''
+            if any(ESTADO_CLASS_RE.search(c) for c in classes.split()):
+                self.span_depth = len(self.stack)
+        elif self.span_depth is not None and tag in ('script', 'style') and tag not in VOID_ELEMENTS:
+            self.skip_text += 1
+
+        node = None
+        if self.captures or tag == 'strong':
+            # Dentro de un <strong> candidato se arma su subárbol (solo estructura y texto)
+            node = _Node(self.starts)
+            if self.captures:
+                self.captures[-1][1].children.append(node)
+
+        if tag not in VOID_ELEMENTS:
+            if node is not None:
+                self.captures.append((len(self.stack), node, tag == 'strong'))
+            self.stack.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self._start(tag, attrs)
+        if tag not in VOID_ELEMENTS:
+            self._end(tag)
+        self._check_done()
+
+    def handle_endtag(self, tag):
+        if tag in self.closed_voids:
+            # Cierre redundante de un elemento vacío: BeautifulSoup lo descarta sin cortar el texto
+            self.closed_voids.remove(tag)
+            return
+        self._end(tag)
+        self._check_done()
+
+    def _end(self, tag):
+        self._end_data()
+        if tag in VOID_ELEMENTS or tag not in self.stack:
+            # BeautifulSoup ignora los cierres sin apertura, pero igual corta el nodo de texto en curso
+            for sibling in self._siblings():
+                if sibling.text:
+                    sibling.resolve()
+            if self.captures:
+                self.captures[-1][1].end_text()
+            return
+        depth = len(self.stack) - 1 - self.stack[::-1].index(tag)
+
+        # Se cierra el padre de los elementos que esperaban su nodo adyacente: no tienen hermano siguiente
+        for sibling in self._siblings():
+            sibling.resolve(None)
+
+        self._pop_to(depth)
+
+    def _pop_to(self, depth):
+        """Cierra los elementos abiertos desde el tope de la pila hasta la posición `depth` (inclusive)."""
+        while len(self.stack) > depth:
+            closed_depth = len(self.stack) - 1
+            closed = self.stack.pop()
+            # Si además se cierra su padre (cierre de un ancestro), el elemento no tiene hermano siguiente
+            parent_closed = len(self.stack) > depth
+
+            if self.captures and self.captures[-1][0] == closed_depth:
+                _depth, node, is_strong = self.captures.pop()
+                text = node.string() if is_strong else None
+                if text is not None and HORARIO_LABEL_RE.search(text):
+                    sibling = _Sibling()
+                    if parent_closed:
+                        sibling.resolve(None)
+                    self.matches.append((node.start, sibling))
+
+            if self.span_depth is not None:
+                if self.span_depth == closed_depth:
+                    self.span_depth = None
+                    self.estado = ''.join(self.span_text)
+                    self.span_sibling = _Sibling()
+                    if parent_closed:
+                        self.span_sibling.resolve(None)
+                elif closed in ('script', 'style') and self.skip_text:
+                    self.skip_text -= 1
+
+    def handle_data(self, data):
+        if self.span_depth is not None and not self.skip_text:
+            self.span_data.append(data)
+        if self.captures:
+            self.captures[-1][1].add_text(data)
+        for sibling in self._siblings():
+            if not sibling.done:
+                sibling.text.append(data)
+
+    def handle_comment(self, data):
+        # Un comentario es un nodo propio: corta el texto acumulado y, si no había texto, es el hermano
+        self._end_data()
+        for sibling in self._siblings():
+            sibling.resolve(data)
+        if self.captures:
+            self.captures[-1][1].children.append(data)
+        self._check_done()
+
+    # --------- Resultado ---------
+
+    def result(self):
+        # Fin del documento: los elementos que quedaron abiertos se cierran (como en el árbol) sin hermano
+        self._end_data()
+        self._pop_to(0)
+        for sibling in self._siblings():
+            sibling.resolve(None)
+        horario = self._horario() or (False, None)
+        return _resultado(
+            self.estado, self.span_sibling.value if self.span_sibling else None, horario[0], horario[1]
+        )
+
+
+def extraer_estado(html):
+    """
+    Extrae estado, texto de actualización y horario de atención de la página de detalle de un paso.
+    Devuelve un dict con las claves estado / actualizado / horario_atencion, idéntico al de
+    extraer_estado_bs4, pero sin construir el árbol y dejando de leer apenas encontró todo.
+    """
+    parser = _EstadoParser()
+    try:
+        for start in range(0, len(html), CHUNK_SIZE):
+            parser.feed(html[start:start + CHUNK_SIZE])
+        parser.close()
+    except _Done:
+        pass
+    return parser.result()
@@ -0,0 +1,162 @@
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from flask import current_app
+from config.constantes import PASOS
+from utils.circuit_breaker import breakers, CircuitOpenError
+from utils.pasos_extractor import extraer_estado
+
+# Hilos del pool de descarga y pedidos simultáneos como máximo contra un mismo host
+# (todas las páginas oficiales están en argentina.gob.ar: no queremos parecer un ataque).
+# Se configuran con SCRAPER_MAX_WORKERS / SCRAPER_PER_HOST / SCRAPER_TIMEOUT.
+SCRAPER_MAX_WORKERS = 8
+SCRAPER_PER_HOST = 4
+SCRAPER_TIMEOUT = 10
+
+# Resultado de cada paso en un barrido
+NO_MODIFICADO = 'no_modificado'   # 304 del servidor (validadores vigentes)
+SIN_CAMBIOS = 'sin_cambios'       # 200, pero lo extraído (estado, actualización, horario) tiene el mismo hash
+PARSEADO = 'parseado'             # Contenido nuevo: se extrajo y hay que escribirlo
+ERROR = 'error'
+CIRCUITO_ABIERTO = 'circuito_abierto'  # El host viene fallando: no se pidió y se conserva el último estado
+
+# Resumen del último barrido (tiempos por paso) y contadores acumulados, para el endpoint de monitoreo.
+# La proporción de no_modificado + sin_cambios indica cuánto se puede acortar el intervalo del job.
+ultimo_barrido = {}
+contadores = {NO_MODIFICADO: 0, SIN_CAMBIOS: 0, PARSEADO: 0, ERROR: 0, CIRCUITO_ABIERTO: 0, 'escritos': 0}
+_contadores_lock = threading.Lock()
+
+
+def registrar(clave, cantidad=1):
+    with _contadores_lock:
+        contadores[clave] += cantidad
+
+
+def hash_estado(estado):
+    """
+    SHA-256 de lo que extrae extraer_estado (estado, actualización y horario): la huella cambia
+    exactamente cuando cambia algo que se guardaría, sin depender de dónde está en el HTML.
+    """
+    huella = '\n'.join(estado[campo] for campo in ('estado', 'actualizado', 'horario_atencion'))
+    return hashlib.sha256(huella.encode('utf-8')).hexdigest()
+
+
+def registro_pasos():
+    """Pasos a seguir: app.config["PASOS"] si está definido, si no el registro de config.constantes."""
+    return current_app.config.get('PASOS') or PASOS
+
+
+class HostLimiter:
+    """Un semáforo por host: limita los pedidos simultáneos a cada servidor dentro del pool."""
+
+    def __init__(self, per_host):
+        self.per_host = per_host
+        self._semaphores = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, url):
+        host = urlsplit(url).netloc
+        with self._lock:
+            semaphore = self._semaphores.get(host)
+            if semaphore is None:
+                semaphore = self._semaphores[host] = threading.BoundedSemaphore(self.per_host)
+        return semaphore
+
+
+def _scrape_paso(session, registro, validadores, limiter, timeout):
+    """
+    Descarga y extrae un paso. No toca la BD (corre en un hilo del pool, sin contexto de app).
+    `validadores` trae etag / last_modified / content_hash de la descarga anterior (o está vacío).
+    """
+    inicio = time.perf_counter()
+    espera = 0.0
+    headers = {}
+    if validadores.get('etag'):
+        headers['If-None-Match'] = validadores['etag']
+    if validadores.get('last_modified'):
+        headers['If-Modified-Since'] = validadores['last_modified']
+
+    def descargar():
+        nonlocal espera
+        with limiter(registro['url']):
+            espera = time.perf_counter() - inicio
+            resp = session.get(registro['url'], timeout=timeout, headers=headers)
+            if resp.status_code != 304:
+                resp.raise_for_status()
+        return resp
+
+    try:
+        # Un circuito por host: si está abierto se falla antes de esperar el cupo del host o el timeout
+        resp = breakers.get(urlsplit(registro['url']).netloc).call(descargar)
+
+        if resp.status_code == 304:
+            datos = {"resultado": NO_MODIFICADO}
+        else:
+            # El extractor corta apenas encuentra los nodos: parsear es barato, lo que se evita es la escritura
+            estado = extraer_estado(resp.text)
+            datos = {
+                "etag": resp.headers.get('ETag'),
+                "last_modified": resp.headers.get('Last-Modified'),
+                "content_hash": hash_estado(estado),
+            }
+            if validadores.get('content_hash') == datos['content_hash']:
+                datos["resultado"] = SIN_CAMBIOS
+            else:
+                datos.update(estado)
+                datos["resultado"] = PARSEADO
+        error = None
+    except CircuitOpenError as e:
+        datos = {"resultado": CIRCUITO_ABIERTO}
+        error = str(e)
+    except Exception as e:
+        datos = {
+            "resultado": ERROR,
+            "estado": "Error de conexión/parsing",
+            "actualizado": str(e),
+            "horario_atencion": "No disponible debido a error de conexión",
+        }
+        error = str(e)
+    registrar(datos["resultado"])
+    datos["tiempos"] = {
+        "total_ms": round((time.perf_counter() - inicio) * 1000, 1),
+        "espera_ms": round(espera * 1000, 1),  # tiempo esperando el cupo del host
+        "resultado": datos["resultado"],
+        "error": error,
+    }
+    return datos
+
+
+def scrape_pasos(registros, validadores=None, max_workers=SCRAPER_MAX_WORKERS, per_host=SCRAPER_PER_HOST,
+                 timeout=SCRAPER_TIMEOUT):
+    """
+    Descarga todas las páginas de detalle en paralelo (pool acotado + límite por host).
+    Un barrido completo tarda lo que la página más lenta, no la suma de todas.
+    `validadores` es {nombre: {etag, last_modified, content_hash}} de la corrida anterior.
+    Devuelve los resultados en el mismo orden que `registros`.
+    """
+    validadores = validadores or {}
+    inicio = time.perf_counter()
+    limiter = HostLimiter(per_host)
+    with requests.Session() as session:
+        # Conexiones keep-alive: tantas por host como pedidos simultáneos permitidos
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=per_host)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        workers = max(1, min(max_workers, len(registros)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='scraper') as pool:
+            resultados = list(pool.map(
+                lambda r: _scrape_paso(session, r, validadores.get(r['nombre'], {}), limiter, timeout), registros
+            ))
+
+    ultimo_barrido.clear()
+    ultimo_barrido.update({
+        "finalizado": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "total_ms": round((time.perf_counter() - inicio) * 1000, 1),
+        "pasos": {registro['nombre']: resultado['tiempos'] for registro, resultado in zip(registros, resultados)},
+        "contadores": dict(contadores),
+    })
+    return resultados
@@ -0,0 +1,154 @@
+import math
+import threading
+from utils.poi_index import GridIndex, point_type, get_store_index
+
+# Zoom máximo con clusters; más cerca se devuelven los puntos individuales
+CLUSTER_MAX_ZOOM = 16
+# Celdas de cluster por ancho de tile (tile de 256px -> celdas de 64px)
+CELLS_PER_TILE = 4
+
+DEFAULT_COLOR = '#808080'
+
+
+def cell_size(zoom):
+    """Ancho de una celda de cluster en grados para un nivel de zoom."""
+    return 360.0 / (2 ** zoom) / CELLS_PER_TILE
+
+
+def tile_bbox(z, x, y):
+    """Bbox (minLng, minLat, maxLng, maxLat) de un tile XYZ (el esquema de tile.openstreetmap.org)."""
+    n = 2 ** z
+
+    def lat(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return x / n * 360.0 - 180.0, lat(y + 1), (x + 1) / n * 360.0 - 180.0, lat(y)
+
+
+class ClusterIndex:
+    """
+    Clusters precalculados por nivel de zoom sobre una grilla jerárquica.
+    La celda de un punto en el zoom z es la de CLUSTER_MAX_ZOOM desplazada (max - z) bits:
+    cada celda contiene exactamente a sus 4 hijas del nivel siguiente.
+    Cada celda guarda, por tipo, [cantidad, suma_lng, suma_lat, xor_de_claves].
+    Agregar o quitar un punto actualiza UNA celda por nivel (O(niveles)), sin reagrupar nada más.
+    El xor de las claves (enteras) identifica al único miembro de una celda con un solo punto.
+    """
+
+    def __init__(self, max_zoom=CLUSTER_MAX_ZOOM):
+        self.max_zoom = max_zoom
+        self._levels = [{} for _ in range(max_zoom + 1)]
+        self._points = {}  # clave -> (celda_en_max_zoom, tipo, lng, lat, punto)
+        self._colors = {}  # tipo -> color (para el color dominante del cluster)
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._points)
+
+    @staticmethod
+    def _key(point, position):
+        # Claves enteras para el xor: id_map de los incidentes, negativos para los puntos fijos
+        key = GridIndex._key(point, position)
+        return key if isinstance(key, int) else -(position + 1)
+
+    def _update(self, leaf, ptype, lng, lat, key, sign):
+        cx, cy = leaf
+        for z in range(self.max_zoom, -1, -1):
+            shift = self.max_zoom - z
+            cell = (cx >> shift, cy >> shift)
+            by_type = self._levels[z].setdefault(cell, {})
+            agg = by_type.setdefault(ptype, [0, 0.0, 0.0, 0])
+            agg[0] += sign
+            agg[1] += sign * lng
+            agg[2] += sign * lat
+            agg[3] ^= key
+            if agg[0] == 0:
+                del by_type[ptype]
+                if not by_type:
+                    del self._levels[z][cell]
+
+    def insert(self, key, point):
+        try:
+            lng, lat = float(point['lng']), float(point['lat'])
+        except (KeyError, TypeError, ValueError):
+            return
+        size = cell_size(self.max_zoom)
+        leaf = (math.floor(lng / size), math.floor(lat / size))
+        ptype = point_type(point)
+        with self._lock:
+            self.remove(key)
+            if point.get('color'):
+                self._colors.setdefault(ptype, point['color'])
+            self._points[key] = (leaf, ptype, lng, lat, point)
+            self._update(leaf, ptype, lng, lat, key, 1)
+
+    def remove(self, key):
+        with self._lock:
+            entry = self._points.pop(key, None)
+            if entry is not None:
+                leaf, ptype, lng, lat, _point = entry
+                self._update(leaf, ptype, lng, lat, key, -1)
+
+    def reset(self, points):
+        with self._lock:
+            self._levels = [{} for _ in range(self.max_zoom + 1)]
+            self._points = {}
+            for position, point in enumerate(points):
+                self.insert(self._key(point, position), point)
+
+    def on_store_change(self, op, payload):
+        """Listener para PoiStore.subscribe."""
+        if op == 'reset':
+            self.reset(payload)
+        elif op == 'add':
+            self.insert(payload['id_map'], payload)
+        elif op == 'remove':
+            self.remove(payload)
+
+    def clusters(self, zoom, min_lng, min_lat, max_lng, max_lat, types=None):
+        """
+        Clusters del nivel `zoom` cuyas celdas tocan el bbox. Cada uno trae cantidad, centroide,
+        tipo y color dominantes; los de un solo punto incluyen el punto completo en "point".
+        """
+        zoom = max(0, min(int(zoom), self.max_zoom))
+        size = cell_size(zoom)
+        x0, y0 = math.floor(min_lng / size), math.floor(min_lat / size)
+        x1, y1 = math.floor(max_lng / size), math.floor(max_lat / size)
+
+        with self._lock:
+            level = self._levels[zoom]
+            if (x1 - x0 + 1) * (y1 - y0 + 1) <= len(level):
+                cells = ((x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1))
+            else:
+                cells = (c for c in level if x0 <= c[0] <= x1 and y0 <= c[1] <= y1)
+
+            result = []
+            for cell in cells:
+                by_type = level.get(cell)
+                if not by_type:
+                    continue
+                selected = [(t, agg) for t, agg in by_type.items() if types is None or t in types]
+                if not selected:
+                    continue
+                count = sum(agg[0] for _t, agg in selected)
+                dominant = max(selected, key=lambda item: (item[1][0], item[0]))[0]
+                cluster = {
+                    "zoom": zoom,
+                    "cell": [cell[0], cell[1]],
+                    "count": count,
+                    "lng": sum(agg[1] for _t, agg in selected) / count,
+                    "lat": sum(agg[2] for _t, agg in selected) / count,
+                    "type": dominant,
+                    "color": self._colors.get(dominant, DEFAULT_COLOR),
+                }
+                if count == 1:
+                    cluster["point"] = self._points[selected[0][1][3]][4]
+                result.append(cluster)
+            return result
+
+
+def get_cluster_index():
+    """Índice de clusters de la app actual, suscripto al store de puntos."""
+    return get_store_index(
+        'poi_clusters', lambda app: ClusterIndex(app.config.get('POI_CLUSTER_MAX_ZOOM', CLUSTER_MAX_ZOOM))
+    )
@@ -0,0 +1,101 @@
+import heapq
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from utils.poi_index import get_store_index
+from utils.poi_store import get_poi_store
+
+# Vigencia por defecto de un punto de alerta temporal en el mapa; se configura con POI_ALERT_TTL_HOURS
+DEFAULT_ALERT_TTL_HOURS = 12
+
+
+def expiry_timestamp(hours, now=None):
+    """ISO 8601 en UTC del vencimiento dentro de `hours` horas (se guarda en el punto como expires_at)."""
+    now = now or datetime.now(timezone.utc)
+    return (now + timedelta(hours=hours)).isoformat(timespec='seconds')
+
+
+def _parse_expiry(value):
+    try:
+        parsed = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+class ExpiryIndex:
+    """
+    Min-heap de (vence_en, id_map) de los puntos temporales, mantenido desde el PoiStore.
+    Las bajas no se buscan en el heap (borrado perezoso): al extraer se descarta la entrada
+    si el punto ya no existe o cambió de vencimiento. Barrer cuesta O(vencidos · log n).
+    """
+
+    def __init__(self, default_ttl_hours=DEFAULT_ALERT_TTL_HOURS, clock=time.time):
+        self.default_ttl_hours = default_ttl_hours
+        self._clock = clock
+        self._heap = []
+        self._expires = {}  # id_map -> vence_en (epoch) vigente
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._expires)
+
+    def _track(self, point, known_expiry=None):
+        if not point.get('is_temporary_alert') or point.get('id_map') is None:
+            return
+        expires = _parse_expiry(point.get('expires_at'))
+        if expires is None:
+            # Alertas anteriores a la vigencia: vencen un TTL por defecto después de verlas por primera vez
+            expires = known_expiry or self._clock() + self.default_ttl_hours * 3600
+        self._expires[point['id_map']] = expires
+        heapq.heappush(self._heap, (expires, point['id_map']))
+
+    def on_store_change(self, op, payload):
+        """Listener para PoiStore.subscribe."""
+        with self._lock:
+            if op == 'reset':
+                previous = self._expires
+                self._heap, self._expires = [], {}
+                for point in payload:
+                    # Una recarga (ej: tras compactar) no reinicia la vigencia de alertas sin expires_at
+                    self._track(point, previous.get(point.get('id_map')))
+            elif op == 'add':
+                self._track(payload)
+            elif op == 'remove':
+                self._expires.pop(payload, None)
+
+    def due(self, now=None):
+        """Extrae del heap los ids vencidos a `now` (por defecto, ahora)."""
+        now = self._clock() if now is None else now
+        expired = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                expires, id_map = heapq.heappop(self._heap)
+                if self._expires.get(id_map) == expires:
+                    del self._expires[id_map]
+                    expired.append(id_map)
+        return expired
+
+
+def get_expiry_index():
+    """Índice de vencimientos de la app actual, suscripto al store de puntos."""
+    return get_store_index(
+        'poi_expiry',
+        lambda app: ExpiryIndex(app.config.get('POI_ALERT_TTL_HOURS', DEFAULT_ALERT_TTL_HOURS))
+    )
+
+
+def sweep_expired_points(now=None):
+    """
+    Quita del store los puntos temporales vencidos (una sola escritura al log) y, si hubo alguno,
+    compacta para que el JSON publicado solo tenga incidentes vigentes. Devuelve los ids eliminados.
+    """
+    expired = get_expiry_index().due(now)
+    if not expired:
+        return []
+    store = get_poi_store()
+    removed = store.remove_many(expired)
+    store.compact()
+    return removed
@@ -0,0 +1,139 @@
+import math
+import threading
+from flask import current_app
+from utils.poi_store import get_poi_store
+
+# Tamaño de celda de la grilla en grados (~1 km de latitud); se configura con POI_GRID_CELL_DEG
+DEFAULT_CELL_DEG = 0.01
+
+# Si el bbox cubre más que esta fracción de las celdas ocupadas, recorrer todos los puntos
+# en una sola pasada es más barato que visitar celda por celda
+FULL_SCAN_FRACTION = 0.1
+
+# Evita que dos hilos creen (y suscriban) dos índices para la misma app
+_create_lock = threading.Lock()
+
+
+def point_type(point):
+    """Tipo de un punto tal como lo usan las capas del mapa (iconType en minúsculas)."""
+    return (point.get('iconType') or point.get('type') or 'default').lower()
+
+
+class GridIndex:
+    """
+    Índice espacial de grilla uniforme: celda (floor(lng/c), floor(lat/c)) -> {clave: punto}.
+    Una consulta por bbox solo recorre las celdas que la cubren (o todos los puntos de una pasada,
+    si el bbox abarca buena parte del mapa).
+    Se mantiene al día de forma incremental escuchando al PoiStore (add/remove por punto).
+    """
+
+    def __init__(self, cell_deg=DEFAULT_CELL_DEG):
+        self.cell_deg = cell_deg
+        self._cells = {}
+        self._where = {}  # clave -> celda
+        self._all = {}    # clave -> (lng, lat, punto), para el recorrido completo
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._where)
+
+    def _cell(self, lng, lat):
+        return math.floor(lng / self.cell_deg), math.floor(lat / self.cell_deg)
+
+    @staticmethod
+    def _key(point, position):
+        # Los puntos fijos del snapshot no tienen id_map: se identifican por su posición en la lista
+        return point['id_map'] if point.get('id_map') is not None else ('static', position)
+
+    def insert(self, key, point):
+        try:
+            lng, lat = float(point['lng']), float(point['lat'])
+        except (KeyError, TypeError, ValueError):
+            return  # Punto sin coordenadas válidas: no se puede ubicar en el mapa
+        with self._lock:
+            self.remove(key)
+            cell = self._cell(lng, lat)
+            entry = (lng, lat, point)
+            self._cells.setdefault(cell, {})[key] = entry
+            self._where[key] = cell
+            self._all[key] = entry
+
+    def remove(self, key):
+        with self._lock:
+            cell = self._where.pop(key, None)
+            if cell is None:
+                return
+            del self._all[key]
+            bucket = self._cells[cell]
+            bucket.pop(key, None)
+            if not bucket:
+                del self._cells[cell]
+
+    def reset(self, points):
+        with self._lock:
+            self._cells, self._where, self._all = {}, {}, {}
+            for position, point in enumerate(points):
+                self.insert(self._key(point, position), point)
+
+    def on_store_change(self, op, payload):
+        """Listener para PoiStore.subscribe."""
+        if op == 'reset':
+            self.reset(payload)
+        elif op == 'add':
+            self.insert(payload['id_map'], payload)
+        elif op == 'remove':
+            self.remove(payload)
+
+    def query(self, min_lng, min_lat, max_lng, max_lat, types=None):
+        """Puntos dentro del bbox (bordes incluidos), opcionalmente filtrados por tipo."""
+        x0, y0 = self._cell(min_lng, min_lat)
+        x1, y1 = self._cell(max_lng, max_lat)
+        with self._lock:
+            covered = (x1 - x0 + 1) * (y1 - y0 + 1)
+            if covered > len(self._cells) * FULL_SCAN_FRACTION:
+                # Bbox muy grande (zoom lejano): una sola pasada sobre todos los puntos
+                return [point for lng, lat, point in self._all.values()
+                        if min_lng <= lng <= max_lng and min_lat <= lat <= max_lat and
+                        (types is None or point_type(point) in types)]
+
+            cells = ((x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1))
+            result = []
+            for cell in cells:
+                bucket = self._cells.get(cell)
+                if not bucket:
+                    continue
+                if x0 < cell[0] < x1 and y0 < cell[1] < y1:
+                    # Celda interior: todos sus puntos están dentro del bbox, no hace falta comparar coordenadas
+                    result.extend(point for _lng, _lat, point in bucket.values()
+                                  if types is None or point_type(point) in types)
+                    continue
+                for lng, lat, point in bucket.values():
+                    if min_lng <= lng <= max_lng and min_lat <= lat <= max_lat and \
+                            (types is None or point_type(point) in types):
+                        result.append(point)
+            return result
+
+
+def get_store_index(name, factory):
+    """
+    Índice derivado del store de puntos guardado en app.extensions[name] (se crea y se suscribe
+    la primera vez). Antes de devolverlo se leen las líneas nuevas del log (cambios de otros workers).
+    """
+    app = current_app._get_current_object()
+    index = app.extensions.get(name)
+    if index is None:
+        with _create_lock:
+            index = app.extensions.get(name)
+            if index is None:
+                index = factory(app)
+                get_poi_store().subscribe(index.on_store_change)
+                app.extensions[name] = index
+    get_poi_store().sync()
+    return index
+
+
+def get_poi_index():
+    """Índice de grilla de la app actual (consultas por bbox)."""
+    return get_store_index(
+        'poi_index', lambda app: GridIndex(app.config.get('POI_GRID_CELL_DEG', DEFAULT_CELL_DEG))
+    )
@@ -0,0 +1,271 @@
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from flask import current_app
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Operaciones acumuladas en el log a partir de las cuales una escritura compacta en el momento
+# (además del job periódico)
+POI_COMPACT_THRESHOLD = 200
+
+
+def _dumps(record):
+    return json.dumps(record, ensure_ascii=False, separators=(',', ':'))
+
+
+class PoiStore:
+    """
+    Puntos de interés del mapa como snapshot + log de operaciones (append-only).
+
+    - snapshot: el JSON compacto que descargan layout.html y mapa.html (lista de puntos).
+    - log: una línea JSON por operación ({"op": "add"|"remove"|"seq", ...}).
+      Agregar un punto es escribir UNA línea, no reescribir todo el archivo.
+    - Un lock de archivo serializa a los workers: los ids (id_map) son monótonos y nunca se repiten.
+    - compact() vuelca el estado a un temporal y lo renombra sobre el snapshot (atómico):
+      un proceso que muere a mitad de escritura nunca deja un JSON truncado.
+
+    Reaplicar el log sobre un snapshot ya compactado es idempotente (add por id_map, remove sin efecto),
+    así una caída entre el rename del snapshot y el del log no duplica puntos.
+    """
+
+    def __init__(self, snapshot_path, log_path, compact_threshold=POI_COMPACT_THRESHOLD):
+        self.snapshot_path = snapshot_path
+        self.log_path = log_path
+        self.lock_path = log_path + '.lock'
+        self.compact_threshold = compact_threshold
+        os.makedirs(os.path.dirname(os.path.abspath(log_path)), exist_ok=True)
+
+        self._mutex = threading.RLock()
+        self._snapshot_signature = None
+        self._log_offset = 0
+        self._static = []     # Puntos fijos del snapshot (sin id_map)
+        self._by_id = {}      # id_map -> punto (incidentes, en orden de alta)
+        self._next_id = 1
+        self.pending_ops = 0  # Operaciones en el log todavía no compactadas
+        self.version = 0      # Aumenta con cada cambio visible (para índices/cachés derivados)
+        self._listeners = []  # Índices derivados que se actualizan con cada operación
+
+    # ----------------- Lock entre procesos -----------------
+
+    @contextmanager
+    def _locked(self):
+        with self._mutex:
+            with open(self.lock_path, 'a+b') as lock_file:
+                if fcntl:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+                else:
+                    lock_file.seek(0)
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                try:
+                    yield
+                finally:
+                    if fcntl:
+                        fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+                    else:
+                        lock_file.seek(0)
+                        msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+    # ----------------- Lectura incremental -----------------
+
+    @staticmethod
+    def _signature(path):
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_mtime_ns, st.st_size
+
+    def _load_snapshot(self):
+        self._static, self._by_id = [], {}
+        try:
+            with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                points = json.load(f)
+        except FileNotFoundError:
+            points = []
+        for point in points:
+            if point.get('id_map') is None:
+                self._static.append(point)
+            else:
+                self._by_id[point['id_map']] = point
+        # Mismo criterio que el esquema anterior (len + 1) para no chocar con ids ya publicados
+        self._next_id = max([len(points)] + list(self._by_id)) + 1
+        self._log_offset = 0
+        self.pending_ops = 0
+        self._notify('reset', self._static + list(self._by_id.values()))
+
+    def _apply(self, record):
+        op = record.get('op')
+        if op == 'add':
+            point = record['point']
+            if point['id_map'] in self._by_id:
+                self._notify('remove', point['id_map'])
+            self._by_id[point['id_map']] = point
+            self._next_id = max(self._next_id, point['id_map'] + 1)
+            self._notify('add', point)
+        elif op == 'remove':
+            if self._by_id.pop(record['id_map'], None) is not None:
+                self._notify('remove', record['id_map'])
+        elif op == 'seq':
+            self._next_id = max(self._next_id, record['next_id'])
+
+    def _refresh(self):
+        """Se pone al día con lo que escribieron otros procesos: solo lee las líneas nuevas del log."""
+        signature = self._signature(self.snapshot_path)
+        if signature != self._snapshot_signature:
+            self._load_snapshot()
+            self._snapshot_signature = signature
+            self.version += 1
+
+        try:
+            with open(self.log_path, 'rb') as log:
+                log.seek(0, os.SEEK_END)
+                if log.tell() < self._log_offset:
+                    # El log se reescribió sin que cambie el snapshot (no debería pasar): recarga completa
+                    self._snapshot_signature = None
+                    return self._refresh()
+                log.seek(self._log_offset)
+                data = log.read()
+        except FileNotFoundError:
+            return
+
+        # Solo líneas completas: una línea sin '\n' final es una escritura cortada
+        complete = data[:data.rfind(b'\n') + 1]
+        for line in complete.splitlines():
+            if line.strip():
+                record = json.loads(line)
+                self._apply(record)
+                if record.get('op') != 'seq':
+                    self.pending_ops += 1
+        if complete:
+            self._log_offset += len(complete)
+            self.version += 1
+
+    def _append(self, *records):
+        """Agrega las operaciones al log en una sola escritura + fsync."""
+        with open(self.log_path, 'ab') as log:
+            if log.tell() != self._log_offset:
+                # Restos de una escritura interrumpida: se descartan antes de agregar
+                log.truncate(self._log_offset)
+            data = ''.join(_dumps(record) + '\n' for record in records).encode('utf-8')
+            log.write(data)
+            log.flush()
+            os.fsync(log.fileno())
+        self._log_offset += len(data)
+        for record in records:
+            self._apply(record)
+        self.pending_ops += len(records)
+        self.version += 1
+
+    def _notify(self, op, payload):
+        for listener in self._listeners:
+            listener(op, payload)
+
+    # ----------------- API pública -----------------
+
+    def subscribe(self, listener):
+        """
+        Registra listener(op, payload) para mantener un índice derivado al día:
+        ('reset', lista_de_puntos), ('add', punto) o ('remove', id_map).
+        Recibe de inmediato un 'reset' con el estado actual.
+        """
+        with self._mutex:
+            self._refresh()
+            self._listeners.append(listener)
+            listener('reset', self._static + list(self._by_id.values()))
+
+    def sync(self):
+        """
+        Se pone al día con el log sin tomar el lock de archivo (para lecturas frecuentes).
+        Es seguro: las líneas se agregan completas y el snapshot se reemplaza de forma atómica.
+        """
+        with self._mutex:
+            self._refresh()
+            return self.version
+
+    def points(self):
+        """Lista actual de puntos (fijos + incidentes)."""
+        with self._locked():
+            self._refresh()
+            return self._static + list(self._by_id.values())
+
+    def add(self, point):
+        """Agrega un punto con el siguiente id_map y devuelve ese id."""
+        with self._locked():
+            self._refresh()
+            new_id = self._next_id
+            self._append({'op': 'add', 'point': dict(point, id_map=new_id)})
+            if self.pending_ops >= self.compact_threshold:
+                self._compact()
+            return new_id
+
+    def remove(self, id_map):
+        """Elimina un punto por id_map. Devuelve False si no existía."""
+        return bool(self.remove_many([id_map]))
+
+    def remove_many(self, ids):
+        """Elimina varios puntos con una sola escritura al log. Devuelve los ids que existían."""
+        with self._locked():
+            self._refresh()
+            removed = [id_map for id_map in dict.fromkeys(ids) if id_map in self._by_id]
+            if removed:
+                self._append(*({'op': 'remove', 'id_map': id_map} for id_map in removed))
+                if self.pending_ops >= self.compact_threshold:
+                    self._compact()
+            return removed
+
+    def compact(self, force=False):
+        """Reescribe el snapshot con el estado actual (si hay operaciones pendientes). Devuelve si compactó."""
+        with self._locked():
+            self._refresh()
+            if not self.pending_ops and not force:
+                return False
+            self._compact()
+            return True
+
+    def _compact(self):
+        points = self._static + list(self._by_id.values())
+        self._atomic_write(self.snapshot_path, json.dumps(points, ensure_ascii=False, separators=(',', ':')))
+        # El log nuevo arranca solo con la secuencia, para que los ids sigan siendo monótonos
+        # aunque se haya borrado el punto con el id más alto
+        seq_line = _dumps({'op': 'seq', 'next_id': self._next_id}) + '\n'
+        self._atomic_write(self.log_path, seq_line)
+
+        self._snapshot_signature = self._signature(self.snapshot_path)
+        self._log_offset = len(seq_line.encode('utf-8'))
+        self.pending_ops = 0
+
+    @staticmethod
+    def _atomic_write(path, content):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+
+def get_poi_store():
+    """Store de la aplicación actual. Rutas configurables con POI_SNAPSHOT_PATH / POI_LOG_PATH."""
+    app = current_app._get_current_object()
+    store = app.extensions.get('poi_store')
+    if store is None:
+        snapshot_path = app.config.get('POI_SNAPSHOT_PATH') or \
+            os.path.join(app.root_path, 'static', 'data', 'puntos_interes.json')
+        log_path = app.config.get('POI_LOG_PATH') or \
+            os.path.join(app.root_path, 'data', 'puntos_interes.log')
+        store = app.extensions.setdefault('poi_store', PoiStore(snapshot_path, log_path))
+    return store
@@ -0,0 +1,53 @@
+from sqlalchemy import inspect
+from sqlalchemy.orm import make_transient_to_detached
+from models.db import db
+from models.users_models import User
+from utils.cache import TTLCache
+
+# Tiempo máximo que un usuario cacheado se considera válido (segundos).
+# Los cambios de rol/estado invalidan la entrada explícitamente en este proceso; en los otros workers
+# el TTL es el único límite (ver invalidate_principal).
+PRINCIPAL_CACHE_TTL = 60
+PRINCIPAL_CACHE_MAXSIZE = 2048
+
+# Caché compartida por los decoradores token_required y el user_loader de Flask-Login.
+# Guarda un "snapshot" con las columnas del usuario (no la instancia ORM, que pertenece a una sesión).
+principal_cache = TTLCache(maxsize=PRINCIPAL_CACHE_MAXSIZE, ttl=PRINCIPAL_CACHE_TTL)
+
+
+def _snapshot(user):
+    """Copia los valores de las columnas del usuario a un dict plano."""
+    return {attr.key: getattr(user, attr.key) for attr in inspect(User).column_attrs}
+
+
+def get_principal(user_id):
+    """
+    Devuelve el User para user_id adjunto a la sesión actual.
+    En un acierto de caché NO consulta la BD: reconstruye la instancia desde el snapshot
+    y la incorpora a la sesión con merge(load=False), así las vistas pueden modificarla y hacer commit.
+    """
+    if not user_id:
+        return None
+    user_id = str(user_id)
+
+    snapshot = principal_cache.get(user_id)
+    if snapshot is None:
+        user = db.session.get(User, user_id)
+        if user is None:
+            return None
+        principal_cache.set(user_id, _snapshot(user))
+        return user
+
+    user = User(**snapshot)
+    make_transient_to_detached(user)
+    return db.session.merge(user, load=False)
+
+
+def invalidate_principal(user_id):
+    """
+    Descarta la entrada de un usuario (llamar después de cambiar rol, estado, perfil o borrarlo).
+    Solo alcanza a la caché de este proceso: con varios workers, los demás siguen usando el usuario
+    anterior (p. ej. un admin degradado o una cuenta desactivada) hasta que vence PRINCIPAL_CACHE_TTL.
+    """
+    if user_id:
+        principal_cache.invalidate(str(user_id))
@@ -0,0 +1,83 @@
+from datetime import datetime
+import numpy as np
+
+# Días que se guardan por paso (Hoy + 3 días)
+DIAS_PRONOSTICO = 4
+
+
+def resumir_pronosticos(payloads, dias=DIAS_PRONOSTICO):
+    """
+    Resumen diario (Min/Max, viento promedio y descripción más común) de muchas respuestas
+    5 Day / 3 Hour Forecast a la vez: un arreglo por campo para todas las mediciones
+    y reducciones agrupadas por (respuesta, día) en lugar de un bucle de dicts por medición.
+    Devuelve una lista por payload, con el mismo contenido que _procesar_datos_pronostico.
+    """
+    payloads = list(payloads)
+    items = [(p, item) for p, data in enumerate(payloads) for item in data['list']]
+    if not items:
+        return [[] for _ in payloads]
+
+    # 1. Empaquetar los campos (lo único que recorre las mediciones en Python)
+    origen = np.fromiter((p for p, _ in items), dtype=np.int64, count=len(items))
+    dts = np.fromiter((item['dt'] for _, item in items), dtype=np.int64, count=len(items))
+    temps_py = [item['main']['temp'] for _, item in items]
+    temps = np.asarray(temps_py, dtype=np.float64)
+    viento = np.asarray([item['wind']['speed'] for _, item in items], dtype=np.float64)
+    codigos = {}
+    desc = np.fromiter((codigos.setdefault(item['weather'][0]['description'], len(codigos)) for _, item in items),
+                       dtype=np.int64, count=len(items))
+    descripciones = list(codigos)
+
+    # 2. Día local de cada medición: los dt se repiten entre ubicaciones (franjas de 3 h),
+    # así que la conversión de zona horaria se hace una vez por dt distinto
+    dts_unicos, dt_idx = np.unique(dts, return_inverse=True)
+    fechas_unicas = [datetime.fromtimestamp(int(dt)).date() for dt in dts_unicos]
+    ordinales = np.fromiter((f.toordinal() for f in fechas_unicas), dtype=np.int64, count=len(fechas_unicas))
+
+    # 3. Grupos (payload, día), numerados en orden de aparición como el dict original
+    claves = origen * 1_000_000 + ordinales[dt_idx]
+    _claves, primera, grupo = np.unique(claves, return_index=True, return_inverse=True)
+    orden = np.argsort(primera, kind='stable')
+    rango = np.empty_like(orden)
+    rango[orden] = np.arange(len(orden))
+    grupo = rango[grupo]
+    primera = primera[orden]
+    n_grupos = len(orden)
+
+    # 4. Reducciones agrupadas
+    # Min/Max: primera medición con el valor extremo de cada grupo (se conserva el valor original)
+    por_min = np.lexsort((temps, grupo))
+    por_max = np.lexsort((-temps, grupo))
+    inicio_grupo = np.searchsorted(grupo[por_min], np.arange(n_grupos))
+    idx_min = por_min[inicio_grupo]
+    idx_max = por_max[inicio_grupo]
+
+    # Viento: bincount suma en el orden de las mediciones (mismo redondeo que la suma en Python)
+    cantidad = np.bincount(grupo, minlength=n_grupos)
+    viento_avg = np.bincount(grupo, weights=viento, minlength=n_grupos) / cantidad
+
+    # Descripción más común; ante un empate, la que apareció primero en el día
+    par = grupo * len(descripciones) + desc
+    pares, primera_par, veces = np.unique(par, return_index=True, return_counts=True)
+    grupo_par = pares // len(descripciones)
+    elegido = np.lexsort((primera_par, -veces, grupo_par))
+    moda = np.full(n_grupos, -1, dtype=np.int64)
+    primeros = elegido[np.r_[True, grupo_par[elegido][1:] != grupo_par[elegido][:-1]]]
+    moda[grupo_par[primeros]] = pares[primeros] % len(descripciones)
+
+    # 5. Filas por payload (los primeros `dias` días de cada uno)
+    resultados = [[] for _ in payloads]
+    for g in range(n_grupos):
+        filas = resultados[origen[primera[g]]]
+        if len(filas) >= dias:
+            continue
+        filas.append({
+            'fecha_pronostico': fechas_unicas[dt_idx[primera[g]]],
+            'temp_min': round(temps_py[idx_min[g]], 1),
+            'temp_max': round(temps_py[idx_max[g]], 1),
+            'descripcion': descripciones[moda[g]].capitalize(),
+            'viento_velocidad_kmh': round(float(viento_avg[g]) * 3.6, 1),  # Convierte m/s a km/h
+            'viento_direccion': 'Oeste',  # La API gratuita no lo resume por día: se simula
+            'visibilidad_metros': 10000
+        })
+    return resultados
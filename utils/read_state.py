@@ -0,0 +1,159 @@
+from datetime import datetime
+from sqlalchemy import select, func, update
+from models.db import db
+from models.messages_models import Message, AlertReadState, AlertSequence, AlertTombstone, MessageRead
+
+ALERT_FILTER = Message.message_type == 'alert'
+
+
+def get_watermark(user_id):
+    """Secuencia de la última alerta vista por el usuario (0 si nunca marcó ninguna)."""
+    state = db.session.get(AlertReadState, user_id)
+    return state.last_seen_seq if state is not None else 0
+
+
+def latest_alert_seq():
+    """Secuencia de la última alerta creada (0 si no hay ninguna): una lectura por clave primaria."""
+    state = db.session.get(AlertSequence, 1)
+    return state.last_seq if state is not None else 0
+
+
+def is_alert_read(message, watermark, read_ids):
+    """Una alerta está leída si quedó bajo la marca de agua o está en el conjunto de excepciones."""
+    if message.alert_seq is not None and message.alert_seq <= watermark:
+        return True
+    return message.id in read_ids
+
+
+def read_message_ids(user_id, message_ids):
+    """Ids (de la lista dada) que el usuario marcó como leídos individualmente."""
+    if not message_ids:
+        return set()
+    return set(db.session.execute(
+        select(MessageRead.message_id).where(
+            MessageRead.user_id == user_id, MessageRead.message_id.in_(message_ids)
+        )
+    ).scalars())
+
+
+def unread_alert_count(user_id):
+    """
+    Alertas no leídas = última secuencia - marca de agua - excepciones leídas - alertas borradas
+    después de la marca. Las tres primeras son lecturas por clave primaria (no dependen de cuántas
+    alertas haya); las borradas son un rango del índice de alert_tombstones, vacío salvo que se
+    hayan borrado alertas que el usuario todavía no vio.
+    """
+    state = db.session.get(AlertReadState, user_id)
+    watermark = state.last_seen_seq if state is not None else 0
+    exceptions = state.alert_exceptions if state is not None else 0
+    deleted = db.session.execute(
+        select(func.count()).select_from(AlertTombstone).where(AlertTombstone.seq > watermark)
+    ).scalar()
+    return max(0, latest_alert_seq() - watermark - exceptions - deleted)
+
+
+def _read_state(user_id):
+    state = db.session.get(AlertReadState, user_id)
+    if state is None:
+        state = AlertReadState(user_id=user_id, last_seen_seq=0, alert_exceptions=0, read_version=0)
+        db.session.add(state)
+    return state
+
+
+def inbox_versions(user_id):
+    """(read_version del usuario, deleted_version global): dos lecturas por clave primaria para el ETag."""
+    state = db.session.get(AlertReadState, user_id)
+    sequence = db.session.get(AlertSequence, 1)
+    return (state.read_version if state is not None else 0,
+            sequence.deleted_version if sequence is not None else 0)
+
+
+def bump_read_version(user_id):
+    """Invalida el ETag del buzón del usuario (leyó o borró algo). No hace commit."""
+    state = _read_state(user_id)
+    state.read_version = (state.read_version or 0) + 1
+
+
+def bump_deleted_version():
+    """Invalida el ETag del buzón de todos (se borraron mensajes compartidos). No hace commit."""
+    sequence = db.session.get(AlertSequence, 1)
+    if sequence is None:
+        db.session.add(AlertSequence(id=1, last_seq=0, deleted_version=1))
+    else:
+        sequence.deleted_version = AlertSequence.deleted_version + 1
+
+
+def mark_alert_read(user_id, message):
+    """Marca una alerta puntual. Solo agrega una excepción si es más nueva que la marca de agua. No hace commit."""
+    if not is_alert_read(message, get_watermark(user_id), set()) and _record_read(user_id, message.id):
+        state = _read_state(user_id)
+        state.alert_exceptions = (state.alert_exceptions or 0) + 1
+        state.read_version = (state.read_version or 0) + 1
+
+
+def mark_group_message_read(user_id, message):
+    """Registra la lectura de un mensaje de grupo por uno de sus miembros. No hace commit."""
+    if _record_read(user_id, message.id):
+        bump_read_version(user_id)
+
+
+def _record_read(user_id, message_id):
+    """Agrega la lectura si no estaba. Devuelve True si la agregó."""
+    if db.session.get(MessageRead, (user_id, message_id)) is None:
+        db.session.add(MessageRead(user_id=user_id, message_id=message_id))
+        return True
+    return False
+
+
+def advance_watermark(user_id, up_to=None):
+    """
+    Marca como leídas todas las alertas hasta up_to (un Message) o hasta la más reciente.
+    Nunca retrocede la marca. Elimina las excepciones que quedan cubiertas. No hace commit.
+    Devuelve (timestamp, id) de la última alerta vista.
+    """
+    if up_to is None:
+        up_to = Message.query.filter(ALERT_FILTER).order_by(Message.alert_seq.desc()).first()
+
+    state = db.session.get(AlertReadState, user_id)
+    if up_to is None or (state is not None and state.last_seen_seq >= up_to.alert_seq):
+        return (state.last_seen_timestamp, state.last_seen_id) if state is not None else (None, None)
+
+    state = _read_state(user_id)
+    state.last_seen_seq = up_to.alert_seq
+    state.last_seen_timestamp = up_to.timestamp
+    state.last_seen_id = up_to.id
+    state.read_version = (state.read_version or 0) + 1
+    state.updated_at = datetime.utcnow()
+
+    covered = select(Message.id).where(ALERT_FILTER, Message.alert_seq <= up_to.alert_seq)
+    removed = MessageRead.query.filter(
+        MessageRead.user_id == user_id, MessageRead.message_id.in_(covered)
+    ).delete(synchronize_session=False)
+    state.alert_exceptions = max(0, (state.alert_exceptions or 0) - removed)
+    return up_to.timestamp, up_to.id
+
+
+def forget_alerts(message_ids):
+    """
+    Antes de borrar mensajes (ids o un SELECT de ids): las alertas entre ellos dejan su secuencia
+    en alert_tombstones y se descuentan de las excepciones de quienes las habían leído fuera de orden.
+    Invalida el ETag del buzón de todos (deleted_version) y devuelve True si había alertas.
+    No borra los mensajes ni sus lecturas. No hace commit.
+    """
+    alerts = select(Message.alert_seq, Message.id).where(ALERT_FILTER, Message.id.in_(message_ids))
+    rows = db.session.execute(alerts).all()
+    if not rows:
+        return False
+    alert_ids = [row.id for row in rows]
+    readers = db.session.execute(
+        select(MessageRead.user_id, func.count()).where(MessageRead.message_id.in_(alert_ids))
+        .group_by(MessageRead.user_id)
+    ).all()
+    for reader_id, count in readers:
+        db.session.execute(
+            update(AlertReadState).where(AlertReadState.user_id == reader_id)
+            .values(alert_exceptions=AlertReadState.alert_exceptions - count)
+        )
+    db.session.add_all(AlertTombstone(seq=row.alert_seq) for row in rows if row.alert_seq is not None)
+    bump_deleted_version()
+    return True
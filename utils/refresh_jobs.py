@@ -0,0 +1,142 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+
+# Refrescos manuales que corren a la vez (cada uno es una llamada al proveedor + un upsert).
+# Se configura con REFRESH_MAX_WORKERS.
+REFRESH_MAX_WORKERS = 2
+# Jobs terminados que se conservan para consultar su estado (los más viejos se descartan)
+REFRESH_JOBS_RETAINED = 256
+
+# Estados de un job
+PENDIENTE = 'pendiente'
+EN_CURSO = 'en_curso'
+COMPLETADO = 'completado'
+ERROR = 'error'
+
+
+def _ahora():
+    return time.strftime('%Y-%m-%dT%H:%M:%S')
+
+
+class RefreshJobs:
+    """
+    Cola de refrescos de pronóstico en segundo plano, con un job en vuelo por paso (single-flight):
+    los pedidos que llegan mientras hay un job pendiente o en curso para el mismo paso se suman a ese job
+    en lugar de llamar otra vez al proveedor. Cada job corre `fn(paso_id)` dentro del contexto de la app
+    y guarda su estado, tiempos y resultado para el endpoint de consulta.
+    """
+
+    def __init__(self, app, max_workers=REFRESH_MAX_WORKERS, retained=REFRESH_JOBS_RETAINED):
+        self._app = app
+        self.retained = retained
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='refresco')
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()   # job_id -> job (dict)
+        self._en_vuelo = {}          # paso_id -> job_id
+        self._terminados = {}        # job_id -> threading.Event
+
+    def submit(self, paso_id, fn):
+        """Encola el refresco del paso (o se suma al que ya está en vuelo). Devuelve (job, nuevo)."""
+        paso_id = str(paso_id)
+        with self._lock:
+            job_id = self._en_vuelo.get(paso_id)
+            if job_id is not None:
+                job = self._jobs[job_id]
+                job['solicitudes'] += 1
+                return dict(job), False
+
+            job = {
+                'id': uuid.uuid4().hex,
+                'paso_id': paso_id,
+                'estado': PENDIENTE,
+                'solicitudes': 1,
+                'creado': _ahora(),
+                'iniciado': None,
+                'finalizado': None,
+                'duracion_ms': None,
+                'resultado': None,
+                'error': None,
+            }
+            self._jobs[job['id']] = job
+            self._en_vuelo[paso_id] = job['id']
+            self._terminados[job['id']] = threading.Event()
+            self._descartar_viejos()
+            snapshot = dict(job)
+        self._executor.submit(self._run, job['id'], paso_id, fn)
+        return snapshot, True
+
+    def _descartar_viejos(self):
+        """Descarta los jobs terminados más viejos por encima de `retained`. Requiere self._lock."""
+        sobrantes = len(self._jobs) - self.retained
+        for job_id in list(self._jobs):
+            if sobrantes <= 0:
+                break
+            if self._jobs[job_id]['estado'] in (COMPLETADO, ERROR):
+                del self._jobs[job_id]
+                self._terminados.pop(job_id, None)
+                sobrantes -= 1
+
+    def _update(self, job_id, **campos):
+        with self._lock:
+            self._jobs[job_id].update(campos)
+
+    def _run(self, job_id, paso_id, fn):
+        self._update(job_id, estado=EN_CURSO, iniciado=_ahora())
+        inicio = time.perf_counter()
+        try:
+            with self._app.app_context():
+                resultado = fn(paso_id)
+            estado = ERROR if isinstance(resultado, dict) and 'error' in resultado else COMPLETADO
+            campos = {'estado': estado, 'resultado': resultado}
+        except Exception as e:
+            self._app.logger.error(f"Error en el refresco de pronóstico del paso {paso_id}: {e}")
+            campos = {'estado': ERROR, 'error': str(e)}
+        with self._lock:
+            self._jobs[job_id].update(campos, finalizado=_ahora(),
+                                      duracion_ms=round((time.perf_counter() - inicio) * 1000, 1))
+            # A partir de acá un pedido nuevo para el paso crea otro job
+            if self._en_vuelo.get(paso_id) == job_id:
+                del self._en_vuelo[paso_id]
+            terminado = self._terminados.get(job_id)
+        if terminado is not None:
+            terminado.set()
+
+    def get(self, job_id):
+        """Copia del estado del job, o None si no existe (o ya se descartó)."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def wait(self, job_id, timeout=None):
+        """Espera a que el job termine (scripts y tests). Devuelve su estado final o None."""
+        with self._lock:
+            terminado = self._terminados.get(job_id)
+        if terminado is not None:
+            terminado.wait(timeout)
+        return self.get(job_id)
+
+    def stats(self):
+        with self._lock:
+            por_estado = {}
+            for job in self._jobs.values():
+                por_estado[job['estado']] = por_estado.get(job['estado'], 0) + 1
+            return {
+                "en_vuelo": len(self._en_vuelo),
+                "por_estado": por_estado,
+                "solicitudes_sumadas": sum(job['solicitudes'] - 1 for job in self._jobs.values()),
+            }
+
+
+def get_refresh_jobs():
+    """Cola de refrescos de la aplicación actual (hilos configurables con REFRESH_MAX_WORKERS)."""
+    app = current_app._get_current_object()
+    jobs = app.extensions.get('refresh_jobs')
+    if jobs is None:
+        jobs = app.extensions.setdefault('refresh_jobs', RefreshJobs(
+            app, max_workers=app.config.get('REFRESH_MAX_WORKERS', REFRESH_MAX_WORKERS)
+        ))
+    return jobs
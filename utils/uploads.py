@@ -0,0 +1,126 @@
+import hashlib
+import os
+import tempfile
+from flask import Request, current_app
+from werkzeug.exceptions import RequestEntityTooLarge, UnsupportedMediaType
+
+# Límite por defecto de una foto de incidente (bytes); se configura con INCIDENT_PHOTO_MAX_BYTES
+DEFAULT_PHOTO_MAX_BYTES = 8 * 1024 * 1024
+
+# Firmas ("magic bytes") de los formatos de imagen aceptados -> extensión con la que se guarda
+IMAGE_SIGNATURES = (
+    (b'\xff\xd8\xff', 'jpg'),
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+)
+# Bytes necesarios para decidir el formato (WEBP: "RIFF" + tamaño + "WEBP")
+SNIFF_BYTES = 12
+
+
+def sniff_image_extension(head):
+    """Extensión según los primeros bytes del archivo, o None si no es una imagen aceptada."""
+    for signature, extension in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return extension
+    if len(head) >= SNIFF_BYTES and head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'webp'
+    return None
+
+
+class HashingUploadStream:
+    """
+    Destino de un archivo subido mientras Werkzeug parsea el multipart.
+    Cada bloque se escribe directo a un archivo temporal en disco, se suma al SHA-256
+    y se cuentan los bytes: al superar el límite (413) o si los primeros bytes no son
+    de una imagen (415) se aborta sin leer el resto del cuerpo.
+    """
+
+    def __init__(self, directory, max_bytes):
+        os.makedirs(directory, exist_ok=True)
+        self._file = tempfile.NamedTemporaryFile(dir=directory, prefix='.upload-', delete=False)
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.extension = None
+        self._head = b''
+        self._sha256 = hashlib.sha256()
+        self._stored = False
+
+    def write(self, chunk):
+        self.size += len(chunk)
+        if self.size > self.max_bytes:
+            raise RequestEntityTooLarge(f"La foto supera el máximo de {self.max_bytes} bytes.")
+        if self.extension is None:
+            self._head += chunk[:SNIFF_BYTES]
+            if len(self._head) >= SNIFF_BYTES:
+                self._sniff()
+        self._sha256.update(chunk)
+        return self._file.write(chunk)
+
+    def _sniff(self):
+        self.extension = sniff_image_extension(self._head)
+        if self.extension is None:
+            raise UnsupportedMediaType("El archivo no es una imagen JPEG, PNG, GIF o WEBP.")
+
+    @property
+    def hexdigest(self):
+        return self._sha256.hexdigest()
+
+    def store(self, directory):
+        """
+        Mueve el archivo a su ruta por contenido: <directorio>/ab/<sha256>.<ext>.
+        Si ya existe una foto idéntica se reutiliza (deduplicación). Devuelve (ruta_relativa, era_duplicado).
+        """
+        if self.extension is None:
+            self._sniff()  # Archivos más cortos que SNIFF_BYTES
+        self._file.flush()
+
+        digest = self.hexdigest
+        relative_path = f"{digest[:2]}/{digest}.{self.extension}"
+        final_path = os.path.join(directory, digest[:2], f"{digest}.{self.extension}")
+        duplicate = os.path.exists(final_path)
+        if not duplicate:
+            os.makedirs(os.path.dirname(final_path), exist_ok=True)
+            self._file.close()
+            os.replace(self._file.name, final_path)  # Atómico: misma carpeta/sistema de archivos
+            self._stored = True
+        return relative_path, duplicate
+
+    def close(self):
+        """Al terminar la request se borra el temporal si no se guardó (error, duplicado o abortado)."""
+        self._file.close()
+        if not self._stored:
+            try:
+                os.unlink(self._file.name)
+            except FileNotFoundError:
+                pass
+
+    def __getattr__(self, name):
+        # read/seek/tell/etc. del archivo temporal (FileStorage delega en el stream)
+        return getattr(self._file, name)
+
+
+class UploadRequest(Request):
+    """
+    Request de la app: en los endpoints de fotos de incidentes (upload_endpoints) los archivos subidos
+    se escriben en disco con hash y límite mientras llegan. El resto de las rutas usa el stream por
+    defecto de Werkzeug, sin el límite ni la validación de imagen.
+    """
+
+    upload_endpoints = frozenset({'handle_report_submission'})  # POST /api/report
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if self.endpoint not in self.upload_endpoints:
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+        stream = HashingUploadStream(
+            current_app.config['UPLOAD_FOLDER'],
+            current_app.config.get('INCIDENT_PHOTO_MAX_BYTES', DEFAULT_PHOTO_MAX_BYTES)
+        )
+        # Se registran aparte: si el parseo se aborta (413/415) no llegan a request.files
+        self.__dict__.setdefault('_upload_streams', []).append(stream)
+        return stream
+
+    def close(self):
+        super().close()
+        for stream in self.__dict__.pop('_upload_streams', []):
+            stream.close()
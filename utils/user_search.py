@@ -0,0 +1,124 @@
+from sqlalchemy import select, func, case, or_, and_, insert, literal, union_all
+from models.db import db
+from models.users_models import User
+from models.user_search_models import UserSearchGram
+
+GRAM_SIZE = 3
+# Relleno al final del texto: así toda subcadena de 1 o 2 caracteres es prefijo de algún trigrama
+GRAM_PAD = '$' * (GRAM_SIZE - 1)
+# Mayor carácter Unicode: cota superior de los rangos de prefijo
+MAX_CHAR = chr(0x10FFFF)
+# Por encima de este número de usuarios un trigrama se considera "común" y no conviene usar el índice
+POSTING_CAP = 2000
+
+
+def text_grams(text):
+    """Trigramas (con relleno final) de un texto en minúsculas."""
+    text = (text or '').lower() + GRAM_PAD
+    return {text[i:i + GRAM_SIZE] for i in range(len(text) - GRAM_SIZE + 1)}
+
+
+def user_grams(username, email):
+    return text_grams(username) | text_grams(email)
+
+
+def index_user(user):
+    """
+    (Re)indexa un usuario. No hace commit: se llama dentro de la misma transacción
+    que crea o modifica al usuario (el usuario ya debe tener id, hacer flush antes si es nuevo).
+    """
+    unindex_user(user.id)
+    grams = user_grams(user.username, user.email)
+    if grams:
+        db.session.execute(insert(UserSearchGram), [{'gram': g, 'user_id': user.id} for g in grams])
+
+
+def unindex_user(user_id):
+    """Elimina los trigramas de un usuario (antes de borrarlo o reindexarlo)."""
+    UserSearchGram.query.filter(UserSearchGram.user_id == user_id).delete(synchronize_session=False)
+
+
+def _gram_range(prefix):
+    """Condición de rango (usa el índice) para los trigramas que empiezan por prefix."""
+    return and_(UserSearchGram.gram >= prefix, UserSearchGram.gram < prefix + MAX_CHAR)
+
+
+def _posting_sizes(conditions):
+    """
+    Tamaño (acotado a POSTING_CAP) de la lista de usuarios de cada condición, en una sola consulta.
+    Cada conteo recorre como máximo POSTING_CAP entradas del índice.
+    """
+    probes = [
+        select(literal(i).label('i'),
+               select(func.count()).select_from(
+                   select(UserSearchGram.user_id).where(cond).limit(POSTING_CAP).subquery()
+               ).scalar_subquery().label('n'))
+        for i, cond in enumerate(conditions)
+    ]
+    rows = db.session.execute(union_all(*probes)).all()
+    return {row.i: row.n for row in rows}
+
+
+def search_condition(term):
+    """
+    Condición para filtrar User por subcadena de username o email usando el índice de trigramas.
+
+    Se elige el trigrama más selectivo del término (o el rango de prefijo si tiene 1-2 caracteres)
+    y sus usuarios son los candidatos; el ILIKE final solo verifica ese subconjunto.
+    Si hasta el trigrama más raro es muy común (>= POSTING_CAP usuarios), el índice no ayuda:
+    se usa directamente el ILIKE, que con LIMIT encuentra coincidencias enseguida.
+    """
+    term_lower = term.lower()
+    verify = or_(
+        User.username.icontains(term, autoescape=True),
+        User.email.icontains(term, autoescape=True)
+    )
+
+    if len(term_lower) >= GRAM_SIZE:
+        grams = sorted({term_lower[i:i + GRAM_SIZE] for i in range(len(term_lower) - GRAM_SIZE + 1)})
+        conditions = [UserSearchGram.gram == g for g in grams]
+    else:
+        conditions = [_gram_range(term_lower)]
+
+    sizes = _posting_sizes(conditions)
+    best = min(sizes, key=sizes.get)
+    if sizes[best] >= POSTING_CAP:
+        return verify
+
+    candidates = select(UserSearchGram.user_id).where(conditions[best])
+    return and_(User.id.in_(candidates), verify)
+
+
+def relevance_order(term):
+    """Ranking: username exacto, prefijo de username, prefijo de email y luego el resto."""
+    term_lower = term.lower()
+    username = func.lower(User.username)
+    email = func.lower(User.email)
+    return case(
+        (username == term_lower, 0),
+        (username.startswith(term_lower, autoescape=True), 1),
+        (email.startswith(term_lower, autoescape=True), 2),
+        else_=3
+    )
+
+
+def rebuild_search_index(batch_size=1000):
+    """Reconstruye el índice completo (backfill o reparación). Hace commit al final."""
+    UserSearchGram.query.delete(synchronize_session=False)
+    last_id = ''
+    while True:
+        rows = db.session.execute(
+            select(User.id, User.username, User.email)
+            .where(User.id > last_id)
+            .order_by(User.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        db.session.execute(insert(UserSearchGram), [
+            {'gram': g, 'user_id': row.id}
+            for row in rows
+            for g in user_grams(row.username, row.email)
+        ])
+        last_id = rows[-1].id
+    db.session.commit()
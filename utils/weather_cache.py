@@ -0,0 +1,230 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+
+# Vigencia de una respuesta del proveedor (segundos) para los refrescos manuales y los reinicios:
+# dentro de esa ventana se usa la copia guardada en lugar de llamar al proveedor. El job programado
+# (cada 10 minutos) no depende de esta vigencia: descarga siempre (get_or_fetch con refresh=True)
+# y solo usa la copia si el proveedor falla. Se configura con WEATHER_CACHE_TTL.
+WEATHER_CACHE_TTL = 600
+# Pasada la vigencia, durante esta ventana se sirve la copia vieja y se revalida en segundo plano
+# (stale-while-revalidate). Se configura con WEATHER_CACHE_STALE.
+WEATHER_CACHE_STALE = 600
+# Si el proveedor falla, se sirve la última copia con hasta esta antigüedad (stale-if-error).
+# Se configura con WEATHER_CACHE_STALE_IF_ERROR.
+WEATHER_CACHE_STALE_IF_ERROR = 6 * 3600
+WEATHER_CACHE_MAXSIZE = 512
+
+# Origen de cada respuesta servida
+FRESCO = 'fresco'                # Copia vigente (memoria o disco)
+VIEJO = 'viejo'                  # Copia vencida servida mientras se revalida
+VIEJO_POR_ERROR = 'viejo_por_error'
+DESCARGADO = 'descargado'        # Llamada al proveedor
+
+
+def weather_cache_key(lat, lon, units='metric', lang='es'):
+    """Clave de una respuesta: coordenadas redondeadas (celda de la grilla), unidades e idioma."""
+    return f"{round(lat, 4):.4f},{round(lon, 4):.4f}:{units}:{lang}"
+
+
+def _run_in_thread(fn):
+    threading.Thread(target=fn, name='clima-revalidar', daemon=True).start()
+
+
+class WeatherCache:
+    """
+    Caché de respuestas del proveedor de clima en dos niveles: LRU en memoria y un archivo JSON por clave
+    en disco (sobrevive a reinicios). Cada entrada guarda la hora de descarga (reloj de pared, para que
+    siga valiendo después de reiniciar), así una misma copia puede estar vigente, vieja o vencida:
+
+    - vigente (edad < ttl): se sirve sin llamar al proveedor.
+    - vieja (edad < ttl + stale): se sirve y se revalida en segundo plano, una sola descarga por clave.
+    - vencida: se descarga en el momento; si el proveedor falla y la copia tiene menos de
+      stale_if_error, se sirve igual (serve-stale-on-error).
+    """
+
+    def __init__(self, directory, ttl=WEATHER_CACHE_TTL, stale=WEATHER_CACHE_STALE,
+                 stale_if_error=WEATHER_CACHE_STALE_IF_ERROR, maxsize=WEATHER_CACHE_MAXSIZE,
+                 clock=time.time, run_async=_run_in_thread):
+        self.directory = directory
+        self.ttl = ttl
+        self.stale = stale
+        self.stale_if_error = stale_if_error
+        self.maxsize = maxsize
+        self._clock = clock
+        self._run_async = run_async
+        os.makedirs(directory, exist_ok=True)
+
+        self._memory = OrderedDict()  # clave -> (descargado_en, data)
+        self._lock = threading.Lock()
+        self._revalidando = set()
+        self.counters = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "forced_refreshes": 0,
+            "stale_served": 0,
+            "stale_on_error": 0,
+            "revalidations": 0,
+            "upstream_calls": 0,
+            "upstream_errors": 0,
+        }
+
+    # ----------------- Almacenamiento -----------------
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.json')
+
+    def _remember(self, key, entry):
+        """Guarda la entrada en memoria (LRU). Requiere self._lock."""
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+
+    def _lookup(self, key):
+        """Entrada (descargado_en, data) desde memoria o disco, y el nivel donde se encontró."""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                return entry, 'memory'
+        try:
+            with open(self._path(key), encoding='utf-8') as f:
+                stored = json.load(f)
+            entry = (stored['fetched_at'], stored['data'])
+        except (OSError, ValueError, KeyError):
+            return None, None
+        with self._lock:
+            self._remember(key, entry)
+        return entry, 'disk'
+
+    def _store(self, key, data):
+        """Guarda en memoria y en disco (temporal + rename: nunca queda un JSON a medio escribir)."""
+        entry = (self._clock(), data)
+        with self._lock:
+            self._remember(key, entry)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({"key": key, "fetched_at": entry[0], "data": data}, f, separators=(',', ':'))
+            os.replace(tmp_path, self._path(key))
+        except OSError:
+            # Sin disco la caché sigue funcionando en memoria
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    # ----------------- Lectura -----------------
+
+    def _download(self, key, loader):
+        self._count("upstream_calls")
+        try:
+            data = loader()
+        except Exception:
+            self._count("upstream_errors")
+            raise
+        self._store(key, data)
+        return data
+
+    def _revalidate(self, key, loader):
+        """Descarga en segundo plano, una sola vez por clave aunque lleguen varios pedidos."""
+        with self._lock:
+            if key in self._revalidando:
+                return
+            self._revalidando.add(key)
+            self.counters["revalidations"] += 1
+
+        def run():
+            try:
+                self._download(key, loader)
+            except Exception:
+                pass  # Se sigue sirviendo la copia vieja; el próximo pedido vuelve a intentar
+            finally:
+                with self._lock:
+                    self._revalidando.discard(key)
+
+        self._run_async(run)
+
+    def get_or_fetch(self, key, loader, refresh=False):
+        """
+        Devuelve (data, origen) para la clave; `loader()` descarga del proveedor cuando hace falta.
+        Con refresh=True (job programado) se descarga siempre, en el momento, y la copia guardada
+        solo se usa si la descarga falla (stale-if-error).
+        Si la descarga falla y no hay copia utilizable, propaga la excepción del loader.
+        """
+        entry, nivel = self._lookup(key)
+        if refresh:
+            self._count("forced_refreshes")
+        elif entry is not None:
+            fetched_at, data = entry
+            edad = self._clock() - fetched_at
+            if edad < self.ttl:
+                self._count("memory_hits" if nivel == 'memory' else "disk_hits")
+                return data, FRESCO
+            if edad < self.ttl + self.stale:
+                self._count("stale_served")
+                self._revalidate(key, loader)
+                return data, VIEJO
+
+        if not refresh:
+            self._count("misses")
+        try:
+            return self._download(key, loader), DESCARGADO
+        except Exception:
+            if entry is not None and self._clock() - entry[0] < self.stale_if_error:
+                self._count("stale_on_error")
+                return entry[1], VIEJO_POR_ERROR
+            raise
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        for name in os.listdir(self.directory):
+            if name.endswith('.json'):
+                os.unlink(os.path.join(self.directory, name))
+
+    def stats(self):
+        """Resumen de uso para el endpoint de monitoreo (cada respuesta servida sin descargar ahorra cuota)."""
+        with self._lock:
+            c = dict(self.counters)
+            size = len(self._memory)
+        servidas_sin_llamar = c["memory_hits"] + c["disk_hits"] + c["stale_served"] + c["stale_on_error"]
+        pedidos = servidas_sin_llamar + c["misses"] + c["forced_refreshes"]
+        return dict(
+            c,
+            memory_size=size,
+            maxsize=self.maxsize,
+            ttl_seconds=self.ttl,
+            stale_seconds=self.stale,
+            stale_if_error_seconds=self.stale_if_error,
+            requests=pedidos,
+            hit_ratio=round(servidas_sin_llamar / pedidos, 4) if pedidos else 0.0,
+            upstream_calls_saved=servidas_sin_llamar,
+        )
+
+
+def get_weather_cache():
+    """
+    Caché de la aplicación actual. Directorio configurable con WEATHER_CACHE_DIR; vigencias con
+    WEATHER_CACHE_TTL / WEATHER_CACHE_STALE / WEATHER_CACHE_STALE_IF_ERROR.
+    """
+    app = current_app._get_current_object()
+    cache = app.extensions.get('weather_cache')
+    if cache is None:
+        directory = app.config.get('WEATHER_CACHE_DIR') or os.path.join(app.root_path, 'data', 'weather_cache')
+        cache = app.extensions.setdefault('weather_cache', WeatherCache(
+            directory,
+            ttl=app.config.get('WEATHER_CACHE_TTL', WEATHER_CACHE_TTL),
+            stale=app.config.get('WEATHER_CACHE_STALE', WEATHER_CACHE_STALE),
+            stale_if_error=app.config.get('WEATHER_CACHE_STALE_IF_ERROR', WEATHER_CACHE_STALE_IF_ERROR),
+        ))
+    return cache
@@ -0,0 +1,99 @@
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from utils.circuit_breaker import breakers, CircuitOpenError
+from utils.weather_cache import weather_cache_key
+
+FORECAST_URL = "http://api.openweathermap.org/data/2.5/forecast"
+
+# Pedidos simultáneos al proveedor (conexiones keep-alive del pool); se configura con WEATHER_MAX_WORKERS
+WEATHER_MAX_WORKERS = 4
+WEATHER_TIMEOUT = 10
+
+# Celda de la grilla del proveedor en grados (~5 km): pasos en la misma celda comparten una llamada.
+# Se configura con WEATHER_GRID_DEG.
+WEATHER_GRID_DEG = 0.05
+
+# Circuito del proveedor (utils.circuit_breaker): con el circuito abierto las descargas fallan al instante
+WEATHER_BREAKER = 'openweather'
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_weather_session():
+    """
+    Sesión HTTP compartida con el proveedor: reutiliza conexiones (keep-alive) entre llamadas y jobs,
+    y reintenta con backoff los errores transitorios (429 y 5xx), respetando Retry-After.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                retry = Retry(total=3, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504),
+                              allowed_methods=frozenset(['GET']), respect_retry_after_header=True)
+                adapter = HTTPAdapter(max_retries=retry, pool_connections=2, pool_maxsize=WEATHER_MAX_WORKERS)
+                session = requests.Session()
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                _session = session
+    return _session
+
+
+def grid_cell(lat, lon, grid_deg=WEATHER_GRID_DEG):
+    """
+    Coordenadas redondeadas al centro de la celda de la grilla: clave de deduplicación y
+    coordenadas con las que se consulta al proveedor (mismo pronóstico para toda la celda).
+    """
+    def snap(value):
+        return round((math.floor(value / grid_deg) + 0.5) * grid_deg, 6)
+    return snap(lat), snap(lon)
+
+
+def fetch_forecast(lat, lon, api_key, units='metric', lang='es', timeout=WEATHER_TIMEOUT):
+    """Descarga el pronóstico 5 días / 3 horas; devuelve el JSON o lanza RequestException."""
+    resp = get_weather_session().get(FORECAST_URL, timeout=timeout, params={
+        'lat': lat, 'lon': lon, 'appid': api_key, 'units': units, 'lang': lang
+    })
+    resp.raise_for_status() # Lanza un error para códigos de estado 4xx/5xx
+    return resp.json()
+
+
+def fetch_forecasts(cells, api_key, max_workers=WEATHER_MAX_WORKERS, timeout=WEATHER_TIMEOUT, cache=None,
+                    refresh=False):
+    """
+    Descarga en paralelo (pool acotado) el pronóstico de cada celda.
+    Con `cache` (WeatherCache) las celdas con una copia vigente o vieja no llaman al proveedor;
+    con refresh=True se descarga igual y la copia solo se usa si el proveedor falla.
+    Las descargas pasan por el circuito del proveedor: si está abierto fallan sin esperar el timeout
+    y la caché sirve la última copia buena.
+    Devuelve {celda: (data | None, error | None, ms)}.
+    """
+    breaker = breakers.get(WEATHER_BREAKER)
+
+    def download(cell):
+        return breaker.call(fetch_forecast, cell[0], cell[1], api_key, timeout=timeout)
+
+    def fetch(cell):
+        inicio = time.perf_counter()
+        try:
+            if cache is None:
+                data = download(cell)
+            else:
+                data, _origen = cache.get_or_fetch(weather_cache_key(*cell), lambda: download(cell),
+                                                   refresh=refresh)
+            error = None
+        except (requests.exceptions.RequestException, ValueError, CircuitOpenError) as e:
+            data, error = None, str(e)
+        return cell, (data, error, round((time.perf_counter() - inicio) * 1000, 1))
+
+    cells = list(cells)
+    if not cells:
+        return {}
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(cells))),
+                            thread_name_prefix='clima') as pool:
+        return dict(pool.map(fetch, cells))